@@ -0,0 +1,190 @@
+"""
+Индекс занятости аудиторий в памяти для быстрых проверок доступности
+"""
+
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class RoomIntervals:
+    """Отсортированный по началу список интервалов занятости одной аудитории"""
+
+    def __init__(self):
+        self.intervals = []  # (start_min, end_min, booking_id), по возрастанию start_min
+        self.starts = []
+        self.max_duration = 0
+
+    def add(self, start: int, end: int, booking_id: int):
+        item = (start, end, booking_id)
+        pos = bisect.bisect_left(self.intervals, item)
+        self.intervals.insert(pos, item)
+        self.starts.insert(pos, start)
+        self.max_duration = max(self.max_duration, end - start)
+
+    def remove(self, start: int, end: int, booking_id: int) -> bool:
+        item = (start, end, booking_id)
+        pos = bisect.bisect_left(self.intervals, item)
+        if pos < len(self.intervals) and self.intervals[pos] == item:
+            del self.intervals[pos]
+            del self.starts[pos]
+            return True
+        return False
+
+    def overlapping(self, start: int, end: int) -> List[Tuple[int, int, int]]:
+        """Интервалы, пересекающиеся с [start, end)"""
+        # Пересечься могут только интервалы, начавшиеся не раньше start - max_duration
+        lo = bisect.bisect_right(self.starts, start - self.max_duration)
+        hi = bisect.bisect_left(self.starts, end)
+        return [item for item in self.intervals[lo:hi] if item[1] > start]
+
+
+class AvailabilityIndex:
+    """Интервалы подтвержденных бронирований по аудиториям в пределах окна.
+
+    Окно — от начала вчерашнего дня до window_days вперед; оно загружается
+    одним запросом при первом обращении и перезагружается раз в сутки.
+    DatabaseManager поддерживает индекс в актуальном состоянии при создании
+    и удалении бронирований. Запросы за пределами окна индекс не обслуживает
+    (возвращает None), и вызывающий код проверяет их через SQL.
+    """
+
+    def __init__(self, loader: Callable[[int, int], Iterable[Dict]], window_days: int):
+        self._loader = loader
+        self.window_days = window_days
+        self._lock = threading.RLock()
+        self._rooms = {}
+        self._bookings = {}  # booking_id -> (room_id, start_min, end_min)
+        self.window_start = None
+        self.window_end = None
+
+    def _ensure_loaded(self):
+        now_min = int(time.time()) // 60
+        if self.window_start is not None and now_min - self.window_start < 2 * 24 * 60:
+            return
+        self.load(now_min)
+
+    def load(self, now_min: Optional[int] = None):
+        """Загрузить интервалы для окна бронирования"""
+        if now_min is None:
+            now_min = int(time.time()) // 60
+        window_start = now_min - now_min % (24 * 60) - 24 * 60
+        window_end = now_min + self.window_days * 24 * 60
+        # Держим блокировку на время загрузки, чтобы не потерять add()/remove(),
+        # пришедшие между чтением из БД и подменой данных
+        with self._lock:
+            rooms = {}
+            bookings = {}
+            for row in self._loader(window_start, window_end) or []:
+                rooms.setdefault(row['room_id'], RoomIntervals()).add(row['start_min'], row['end_min'], row['id'])
+                bookings[row['id']] = (row['room_id'], row['start_min'], row['end_min'])
+            self._rooms = rooms
+            self._bookings = bookings
+            self.window_start = window_start
+            self.window_end = window_end
+
+    def covers(self, start: int, end: int) -> bool:
+        """Попадает ли интервал целиком в загруженное окно"""
+        with self._lock:
+            self._ensure_loaded()
+            return self.window_start <= start and end <= self.window_end
+
+    def add(self, booking_id: int, room_id: int, start: int, end: int):
+        """Учесть новое подтвержденное бронирование"""
+        with self._lock:
+            if self.window_start is None or end <= self.window_start or start >= self.window_end:
+                return
+            if booking_id in self._bookings:
+                return
+            self._rooms.setdefault(room_id, RoomIntervals()).add(start, end, booking_id)
+            self._bookings[booking_id] = (room_id, start, end)
+
+    def remove(self, booking_id: int):
+        """Убрать бронирование (удалено или больше не подтверждено)"""
+        with self._lock:
+            entry = self._bookings.pop(booking_id, None)
+            if entry:
+                room_id, start, end = entry
+                self._rooms[room_id].remove(start, end, booking_id)
+
+    def conflicts(self, room_id: int, start: int, end: int) -> Optional[List[Tuple[int, int, int]]]:
+        """Пересекающиеся бронирования или None, если интервал вне окна"""
+        with self._lock:
+            self._ensure_loaded()
+            if start < self.window_start or end > self.window_end:
+                return None
+            room = self._rooms.get(room_id)
+            return room.overlapping(start, end) if room else []
+
+    def is_free(self, room_id: int, start: int, end: int) -> Optional[bool]:
+        """Свободна ли аудитория или None, если интервал вне окна"""
+        conflicts = self.conflicts(room_id, start, end)
+        return None if conflicts is None else not conflicts
+
+    def day_intervals(self, start: int, end: int) -> Optional[Dict[int, List[Tuple[int, int]]]]:
+        """Интервалы всех аудиторий, пересекающиеся с [start, end), или None вне окна"""
+        with self._lock:
+            self._ensure_loaded()
+            if start < self.window_start or end > self.window_end:
+                return None
+            return {
+                room_id: [(s, e) for s, e, _ in room.overlapping(start, end)]
+                for room_id, room in self._rooms.items()
+            }
+
+    def are_free(self, room_id: int, slots: List[Tuple[int, int]]) -> List[Optional[bool]]:
+        """Пакетная проверка списка интервалов одной аудитории"""
+        with self._lock:
+            self._ensure_loaded()
+            room = self._rooms.get(room_id)
+            result = []
+            for start, end in slots:
+                if start < self.window_start or end > self.window_end:
+                    result.append(None)
+                else:
+                    result.append(not room.overlapping(start, end) if room else True)
+            return result
+
+
+def occupancy_bitmap(intervals: Iterable[Tuple[int, int]], day_start: int, step: int, slots: int) -> int:
+    """Битовая карта занятости дня: бит k — занят слот [day_start + k*step, +step)"""
+    bits = 0
+    for start, end in intervals:
+        first = max(0, (start - day_start) // step)
+        last = min(slots, -(-(end - day_start) // step))
+        if first < last:
+            bits |= ((1 << (last - first)) - 1) << first
+    return bits
+
+
+def free_run_starts(busy: int, slots: int, length: int) -> int:
+    """Битовая маска слотов, с которых начинается length свободных слотов подряд.
+
+    Вместо перебора окон используется удвоение: run_{a+b} = run_a & (run_a >> b)
+    при b <= a, поэтому нужно O(log length) операций над целым числом дня.
+    """
+    run = ~busy & ((1 << slots) - 1)
+    covered = 1
+    while covered < length and run:
+        shift = min(covered, length - covered)
+        run &= run >> shift
+        covered += shift
+    return run
+
+
+def bit_runs(bits: int) -> List[Tuple[int, int]]:
+    """Непрерывные группы установленных битов: [(первый, последний), ...]"""
+    runs = []
+    position = 0
+    while bits:
+        # пропускаем нули
+        zeros = (bits & -bits).bit_length() - 1
+        bits >>= zeros
+        position += zeros
+        # считаем единицы
+        ones = (~bits & (bits + 1)).bit_length() - 1
+        runs.append((position, position + ones - 1))
+        bits >>= ones
+        position += ones
+    return runs
@@ -0,0 +1,55 @@
+"""
+Бенчмарк клавиатуры календаря: построение заново против кэша.
+
+«До» — клавиатура строится на каждый показ (_build_calendar, как было
+до кэша); «после» — create_calendar с кэшем по месяцу и отметкам.
+Набор показов — 12 месяцев вперед с отметками занятости, по кругу,
+как при листании календаря разными пользователями.
+
+Запуск: python benchmarks/bench_calendar.py
+"""
+
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_widget import TelegramCalendar
+
+ROUNDS = 2000
+
+
+def make_views():
+    today = date.today()
+    views = []
+    for offset in range(12):
+        year, month = divmod(today.month - 1 + offset, 12)
+        year, month = today.year + year, month + 1
+        marks = {date(year, month, day): 'partial' if day % 3 else 'full' for day in range(1, 28, 4)}
+        views.append((year, month, marks))
+    return views
+
+
+def per_view_us(show, views) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for year, month, marks in views:
+            show(year, month, marks)
+    return (time.perf_counter() - started) / (ROUNDS * len(views)) * 1e6
+
+
+def main():
+    views = make_views()
+    calendar = TelegramCalendar()
+    today = date.today()
+    before = per_view_us(lambda year, month, marks: calendar._build_calendar(year, month, today, None, marks), views)
+    after = per_view_us(lambda year, month, marks: calendar.create_calendar(year, month, day_marks=marks), views)
+    print(f"Показов: {ROUNDS * len(views)} ({len(views)} месяцев по кругу)")
+    print(f"До (построение на каждый показ): {before:.1f} мкс/клавиатура")
+    print(f"После (кэш клавиатур):           {after:.1f} мкс/клавиатура, {calendar.cache_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Бенчмарк пропускной способности: много пользователей присылают обновления
+одновременно, обработка каждого ждет сеть/БД.
+
+«До» — последовательная обработка (Application без concurrent_updates);
+«после» — KeyedUpdateProcessor с настройками из config.py.
+
+Запуск: python benchmarks/bench_concurrency.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:TEST')
+
+from telegram import Update
+from telegram.ext import SimpleUpdateProcessor
+
+import config
+from concurrency import KeyedUpdateProcessor
+
+USERS = 200
+UPDATES_PER_USER = 5
+# Время обработки одного обновления: запрос к БД и ответ в Telegram
+HANDLER_LATENCY = 0.02
+
+
+def make_update(user_id: int, number: int) -> Update:
+    now = int(datetime.now().timestamp())
+    return Update.de_json({'update_id': number, 'message': {
+        'message_id': number, 'date': now, 'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'Тест'}, 'text': str(number)}}, None)
+
+
+async def handle():
+    await asyncio.sleep(HANDLER_LATENCY)
+
+
+async def run(processor) -> float:
+    # Обновления приходят вперемешку, как из getUpdates
+    updates = [make_update(user_id, number)
+               for number in range(UPDATES_PER_USER) for user_id in range(1, USERS + 1)]
+    started = time.perf_counter()
+    if processor.max_concurrent_updates == 1:
+        for update in updates:
+            await processor.process_update(update, handle())
+    else:
+        await asyncio.gather(*(processor.process_update(update, handle()) for update in updates))
+    return len(updates) / (time.perf_counter() - started)
+
+
+def main():
+    total = USERS * UPDATES_PER_USER
+    print(f"Пользователей: {USERS}, обновлений: {total}, обработка: {HANDLER_LATENCY * 1000:.0f} мс")
+    sequential = asyncio.run(run(SimpleUpdateProcessor(1)))
+    print(f"До (по одному): {sequential:.0f} обновлений/с")
+    concurrent = asyncio.run(run(KeyedUpdateProcessor()))
+    print(f"После (KeyedUpdateProcessor, {config.UPDATE_WORKERS} одновременно): {concurrent:.0f} обновлений/с")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Бенчмарк подключений к SQLite: подключение на каждый запрос против пула.
+
+«До» — sqlite3.connect, PRAGMA foreign_keys и закрытие на каждый запрос,
+как было в DatabaseManager до ConnectionPool; «после» — долгоживущие
+подключения пула в режиме WAL. База — временная копия схемы.
+
+Запуск: python benchmarks/bench_pool.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:TEST')
+
+from database_sqlite import DatabaseManager
+
+ITERATIONS = 5000
+SELECT = "SELECT * FROM rooms WHERE id = ?"
+UPDATE = "UPDATE rooms SET description = ? WHERE id = ?"
+
+
+def per_connect(db_path: str, sql: str, params: tuple, write: bool) -> float:
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        cursor = conn.execute(sql, params)
+        if write:
+            conn.commit()
+        else:
+            cursor.fetchone()
+        conn.close()
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+def pooled(db: DatabaseManager, sql: str, params: tuple, write: bool) -> float:
+    pool = db._pool
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        if write:
+            with pool.writer() as conn:
+                conn.execute(sql, params)
+        else:
+            with pool.reader() as conn:
+                conn.execute(sql, params).fetchone()
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'bench.db')
+        db = DatabaseManager(db_path)
+        room_id = db.get_all_rooms()[0]['id']
+        print(f"Повторов: {ITERATIONS}")
+        for name, sql, params, write in [
+            ('SELECT аудитории', SELECT, (room_id,), False),
+            ('UPDATE аудитории', UPDATE, ('bench', room_id), True),
+        ]:
+            before = per_connect(db_path, sql, params, write)
+            after = pooled(db, sql, params, write)
+            print(f"{name}: подключение на запрос {before:.1f} мкс, пул {after:.1f} мкс")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Бенчмарк маршрутизации: стоимость выбора обработчика для одного обновления.
+
+«До» — цепочка MessageHandler(filters.Regex)/CallbackQueryHandler(pattern)
+в том порядке, в каком они регистрировались в bot.py; «после» — один Router
+(словарь текстов меню и префиксное дерево callback_data).
+
+Запуск: python benchmarks/bench_routing.py
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.ext import CallbackQueryHandler, CommandHandler, MessageHandler, filters
+
+from routing import Router
+
+ROUNDS = 20000
+
+MENU_TEXTS = ['🗂 Аудитории', '📅 Мои брони', '📋 Активные брони', 'ℹ️ Помощь', '🔎 Найти свободную', '🛠 Админ-панель']
+
+
+async def noop(update, context):
+    pass
+
+
+def regex_chain():
+    """Обработчики в порядке регистрации до появления Router"""
+    chain = [CommandHandler('start', noop)]
+    chain += [MessageHandler(filters.Regex(f'^{text}$'), noop) for text in MENU_TEXTS]
+    chain.append(MessageHandler(filters.TEXT & ~filters.COMMAND, noop))
+    for pattern in [
+        '^admin_add_room$', '^admin_user_contacts$', '^admin_booking_delete_menu$', '^admin_edit_rooms$',
+        '^admin_(all_bookings$|bookings_page_)', '^admin_(all_users$|users_page_)', '^admin_blackouts$',
+        '^admin_blackout_add$', r'^admin_blackout_del_\d+$', '^admin_edit_floor_', '^admin_edit_room_',
+        '^admin_edit_field_', r'^admin_confirm_delete_(\d+|r\d+_\d+)$',
+    ]:
+        chain.append(CallbackQueryHandler(noop, pattern=pattern))
+    # Последним шел handle_other_callbacks с каскадом startswith
+    chain.append(CallbackQueryHandler(noop))
+    return chain
+
+
+def router_chain():
+    router = Router(text_fallback=noop, callback_fallback=noop)
+    for text in MENU_TEXTS:
+        router.on_text(text, noop)
+    for prefix, signature in [
+        ('admin_add_room', ''), ('admin_user_contacts', ''), ('admin_booking_delete_menu', ''),
+        ('admin_edit_rooms', ''), ('admin_all_bookings', ''), ('admin_bookings_page_', 'wii'),
+        ('admin_all_users', ''), ('admin_users_page_', 'wwi'), ('admin_blackouts', ''),
+        ('admin_blackout_add', ''), ('admin_blackout_del_', 'i'), ('admin_edit_floor_', 'i?i'),
+        ('admin_edit_room_', 'i'), ('admin_edit_field_', 'w'), ('admin_confirm_delete_', 'i'),
+        ('admin_confirm_delete_r', 'ii'), ('admin_confirm_delete_room_', 'i'), ('back_to_admin', ''),
+        ('cal_', 's'), ('recurrence_', 's'), ('search_rooms', ''), ('floor_', 'i?i'), ('room_', 'i'),
+        ('back_to_floors', ''), ('back_to_calendar', ''), ('back_to_main', ''),
+    ]:
+        router.on_callback(prefix, noop, signature)
+    return [CommandHandler('start', noop), router]
+
+
+def make_updates():
+    user = {'id': 1, 'is_bot': False, 'first_name': 'Тест'}
+    chat = {'id': 1, 'type': 'private'}
+    now = int(datetime.now().timestamp())
+
+    def message(text):
+        return Update.de_json({'update_id': 1, 'message': {
+            'message_id': 1, 'date': now, 'chat': chat, 'from': user, 'text': text}}, None)
+
+    def callback(data):
+        return Update.de_json({'update_id': 1, 'callback_query': {
+            'id': '1', 'from': user, 'chat_instance': '1', 'data': data,
+            'message': {'message_id': 1, 'date': now, 'chat': chat, 'text': 'меню'}}}, None)
+
+    return [
+        message('🗂 Аудитории'), message('🛠 Админ-панель'), message('произвольный текст'),
+        callback('floor_3_1'), callback('room_12'), callback('cal_day_2030_3_14'),
+        callback('admin_edit_field_name'), callback('admin_confirm_delete_r12_345'),
+        callback('admin_users_page_next_ivanov_42'), callback('back_to_main'),
+    ]
+
+
+def per_update_us(chain, updates) -> float:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for update in updates:
+            for handler in chain:
+                if handler.check_update(update) not in (None, False):
+                    break
+    return (time.perf_counter() - started) / (ROUNDS * len(updates)) * 1e6
+
+
+def main():
+    updates = make_updates()
+    before = regex_chain()
+    after = router_chain()
+    print(f"Обновлений в наборе: {len(updates)}, повторов: {ROUNDS}")
+    print(f"До (цепочка из {len(before)} обработчиков): {per_update_us(before, updates):.2f} мкс/обновление")
+    print(f"После (Router, {len(after)} обработчика):   {per_update_us(after, updates):.2f} мкс/обновление")
+
+
+if __name__ == '__main__':
+    main()
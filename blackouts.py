@@ -0,0 +1,106 @@
+"""
+Периоды закрытия здания и аудиторий (праздники, ремонт, техобслуживание)
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from availability import RoomIntervals
+
+
+class BlackoutSet:
+    """Периоды закрытия в памяти, отсортированные по началу.
+
+    Закрытие с room_id=None действует на все здание, остальные — на одну
+    аудиторию. Все строки загружаются одним запросом при первом обращении
+    и раскладываются по RoomIntervals, поэтому поиск пересечений — бинарный
+    поиск, O(log n + k). DatabaseManager обновляет набор после фиксации
+    транзакций; version растет при каждом изменении.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Dict]]):
+        self._loader = loader
+        self._lock = threading.RLock()
+        self._rooms = None  # room_id (None — здание) -> RoomIntervals
+        self._blackouts = {}  # id -> {'id', 'room_id', 'start_min', 'end_min', 'reason'}
+        self.version = 0
+
+    def _ensure_loaded(self) -> Dict[Optional[int], RoomIntervals]:
+        # Загружаем под блокировкой, чтобы не потерять add(), пришедший во время чтения
+        with self._lock:
+            if self._rooms is None:
+                self._rooms = {}
+                self._blackouts = {}
+                for row in self._loader() or []:
+                    self._insert(dict(row))
+                self.version += 1
+            return self._rooms
+
+    def _insert(self, blackout: Dict):
+        self._blackouts[blackout['id']] = blackout
+        self._rooms.setdefault(blackout['room_id'], RoomIntervals()).add(
+            blackout['start_min'], blackout['end_min'], blackout['id']
+        )
+
+    def reload(self):
+        """Сбросить набор: он будет перечитан при следующем обращении"""
+        with self._lock:
+            self._rooms = None
+            self.version += 1
+
+    def add(self, blackout: Dict):
+        """Учесть новое закрытие"""
+        with self._lock:
+            if self._rooms is not None and blackout['id'] not in self._blackouts:
+                self._insert(dict(blackout))
+            self.version += 1
+
+    def remove(self, blackout_id: int):
+        """Убрать закрытие"""
+        with self._lock:
+            blackout = self._blackouts.pop(blackout_id, None)
+            if blackout and self._rooms is not None:
+                self._rooms[blackout['room_id']].remove(blackout['start_min'], blackout['end_min'], blackout_id)
+            self.version += 1
+
+    def get(self, blackout_id: int) -> Optional[Dict]:
+        """Закрытие по ID"""
+        with self._lock:
+            self._ensure_loaded()
+            blackout = self._blackouts.get(blackout_id)
+            return dict(blackout) if blackout else None
+
+    def all(self, since: Optional[int] = None) -> List[Dict]:
+        """Все закрытия (при необходимости — заканчивающиеся после since) по началу"""
+        with self._lock:
+            self._ensure_loaded()
+            return sorted(
+                (dict(b) for b in self._blackouts.values() if since is None or b['end_min'] > since),
+                key=lambda b: (b['start_min'], b['id'])
+            )
+
+    def overlapping(self, room_id: Optional[int], start: int, end: int) -> List[Dict]:
+        """Закрытия здания и аудитории, пересекающиеся с [start, end)"""
+        with self._lock:
+            rooms = self._ensure_loaded()
+            keys = (None,) if room_id is None else (None, room_id)
+            items = []
+            for key in keys:
+                if key in rooms:
+                    items.extend(rooms[key].overlapping(start, end))
+            return [dict(self._blackouts[blackout_id]) for _, _, blackout_id in sorted(items)]
+
+    def is_closed(self, room_id: Optional[int], start: int, end: int) -> bool:
+        """Пересекается ли [start, end) хотя бы с одним закрытием"""
+        return bool(self.overlapping(room_id, start, end))
+
+    def covers(self, room_id: Optional[int], start: int, end: int) -> bool:
+        """Закрыт ли весь интервал [start, end) (объединением закрытий)"""
+        position = start
+        for blackout in self.overlapping(room_id, start, end):
+            if blackout['start_min'] > position:
+                return False
+            position = max(position, blackout['end_min'])
+            if position >= end:
+                return True
+        return position >= end
@@ -5,7 +5,9 @@ DAR Telegram Bot - Бот для бронирования аудиторий
 
 import asyncio
 import logging
+import signal
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -27,13 +29,16 @@ from handlers import (
     CONFIRMING_BOOKING,
     ADMIN_PASSWORD,
     ENTERING_MANUAL_DATE,
-    # Admin states
-    ADMIN_MAIN, ADMIN_ADDING_ROOM_FLOOR, ADMIN_ADDING_ROOM_NUMBER,
-    ADMIN_ADDING_ROOM_NAME, ADMIN_ADDING_ROOM_CAPACITY, ADMIN_ADDING_ROOM_EQUIPMENT,
-    ADMIN_ADDING_ROOM_DESCRIPTION, ADMIN_SELECT_CONTACTS_DATE, ADMIN_SELECT_DELETE_DATE,
-    ADMIN_EDIT_SELECT_FLOOR, ADMIN_EDIT_SELECT_ROOM, ADMIN_EDIT_SELECT_FIELD, ADMIN_EDIT_SET_NEW_VALUE
 )
 import config
+from database_sqlite import DatabaseManager
+from concurrency import KeyedUpdateProcessor
+from delivery import OutboundRateLimiter
+from maintenance import MaintenanceJob
+from persistence import SQLitePersistence
+from reminders import ReminderScheduler
+from routing import Router
+from webserver import BotServer
 
 # Настройка логирования
 logging.basicConfig(
@@ -42,58 +47,94 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+async def run(application: Application, db: DatabaseManager):
+    """Запустить бота вместе с HTTP-сервером и работать до SIGINT/SIGTERM.
+
+    В режиме webhook обновления приходят на встроенный сервер; если вебхук
+    не настроен или Telegram его не принял, бот получает обновления через polling.
+    Там же работает планировщик напоминаний о бронях.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: остановка по KeyboardInterrupt
+            pass
+
+    server = BotServer(application, db)
+    reminders = ReminderScheduler(application.bot, db)
+    async with application:
+        await application.start()
+        await server.start()
+        await reminders.start()
+        try:
+            if config.BOT_MODE == 'webhook':
+                if not config.WEBHOOK_URL:
+                    logger.warning("⚠️ WEBHOOK_URL не задан: бот работает через polling")
+                else:
+                    try:
+                        await application.bot.set_webhook(
+                            url=config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH,
+                            secret_token=config.WEBHOOK_SECRET or None,
+                            allowed_updates=Update.ALL_TYPES,
+                        )
+                        server.webhook_enabled = True
+                        logger.info("🔗 Вебхук установлен")
+                    except TelegramError as e:
+                        logger.error(f"❌ Не удалось установить вебхук: {e}. Переключаюсь на polling")
+            if not server.webhook_enabled:
+                # start_polling сам снимает ранее установленный вебхук
+                await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            server.ready = True
+            logger.info("✅ Бот готов к работе!")
+            await stop.wait()
+        finally:
+            server.ready = False
+            await reminders.stop()
+            if application.updater.running:
+                await application.updater.stop()
+            await application.stop()
+            await server.stop()
+
+
 def main():
     """Основная функция"""
-    # Создаем приложение
-    application = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
-    
-    # Создаем ЕДИНЫЙ экземпляр обработчиков
-    handlers = Handlers()
+    # Единое подключение к БД на весь процесс: миграции схемы применяются здесь один раз
+    db = DatabaseManager(config.DATABASE_PATH)
 
-    # Вложенный ConversationHandler для админ-панели
-    admin_conv_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex('^🛠 Админ-панель$'), handlers.show_admin_panel)],
-        states={
-            ADMIN_MAIN: [
-                CallbackQueryHandler(handlers.admin_add_room_start, pattern='^admin_add_room$'),
-                CallbackQueryHandler(handlers.admin_contacts_start, pattern='^admin_user_contacts$'),
-                CallbackQueryHandler(handlers.admin_delete_booking_start, pattern='^admin_booking_delete_menu$'),
-                CallbackQueryHandler(handlers.admin_edit_room_start, pattern='^admin_edit_rooms$'),
-                CallbackQueryHandler(handlers.admin_confirm_delete_booking, pattern='^admin_confirm_delete_')
-            ],
-            ADMIN_ADDING_ROOM_FLOOR: [CallbackQueryHandler(handlers.admin_add_room_get_floor, pattern='^admin_add_floor_')],
-            ADMIN_ADDING_ROOM_NUMBER: [MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.admin_add_room_get_number)],
-            ADMIN_ADDING_ROOM_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.admin_add_room_get_name)],
-            ADMIN_ADDING_ROOM_CAPACITY: [MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.admin_add_room_get_capacity)],
-            ADMIN_ADDING_ROOM_EQUIPMENT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.admin_add_room_get_equipment)],
-            ADMIN_ADDING_ROOM_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.admin_add_room_finish)],
-            ADMIN_SELECT_CONTACTS_DATE: [CallbackQueryHandler(handlers.handle_calendar_callback, pattern='^cal_')],
-            ADMIN_SELECT_DELETE_DATE: [CallbackQueryHandler(handlers.handle_calendar_callback, pattern='^cal_')],
-            ADMIN_EDIT_SELECT_FLOOR: [CallbackQueryHandler(handlers.admin_edit_select_floor, pattern='^admin_edit_floor_')],
-            ADMIN_EDIT_SELECT_ROOM: [CallbackQueryHandler(handlers.admin_edit_select_room, pattern='^admin_edit_room_')],
-            ADMIN_EDIT_SELECT_FIELD: [CallbackQueryHandler(handlers.admin_edit_select_field, pattern='^admin_edit_field_')],
-            ADMIN_EDIT_SET_NEW_VALUE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.admin_edit_set_new_value)],
-        },
-        fallbacks=[
-            CallbackQueryHandler(handlers.exit_admin_panel, pattern='^exit_admin$'),
-            CallbackQueryHandler(handlers.show_admin_panel, pattern='^back_to_admin$'),
-            CallbackQueryHandler(handlers.show_admin_panel, pattern='^cal_cancel$'),
-            MessageHandler(filters.Regex('^🛠 Админ-панель$'), handlers.show_admin_panel),
-        ],
-        map_to_parent={
-            ConversationHandler.END: ConversationHandler.END
-        }
+    # Создаем приложение; состояние диалогов переживает перезапуск бота
+    application = (
+        Application.builder()
+        .token(config.TELEGRAM_BOT_TOKEN)
+        .persistence(SQLitePersistence(db))
+        # Разные пользователи — параллельно, обновления одного пользователя — по очереди
+        .concurrent_updates(KeyedUpdateProcessor())
+        # Исходящие сообщения — через очередь с учетом лимитов Telegram
+        .rate_limiter(OutboundRateLimiter())
+        .build()
     )
 
+    # Создаем ЕДИНЫЙ экземпляр обработчиков
+    handlers = Handlers(db)
+
     # ConversationHandler для процесса бронирования
     booking_conv_handler = ConversationHandler(
         entry_points=[
             MessageHandler(filters.Regex('^📅 Забронировать$'), handlers.start_booking),
-            CallbackQueryHandler(handlers.start_booking_from_room_details, pattern='^book_room_details_')
+            CallbackQueryHandler(handlers.start_booking_from_room_details, pattern='^book_room_details_'),
+            CallbackQueryHandler(handlers.start_booking_from_free_slot, pattern='^free_slot_')
         ],
         states={
             CHOOSING_FLOOR: [CallbackQueryHandler(handlers.show_floor_rooms_for_booking, pattern='^book_floor_')],
-            CHOOSING_ROOM: [CallbackQueryHandler(handlers.start_booking_from_room, pattern='^book_room_')],
+            CHOOSING_ROOM: [
+                CallbackQueryHandler(handlers.start_booking_from_room, pattern='^book_room_'),
+                # Листание аудиторий этажа и возврат к этажам
+                CallbackQueryHandler(handlers.show_floor_rooms_for_booking, pattern='^book_floor_'),
+                CallbackQueryHandler(handlers.back_to_booking_floors, pattern='^back_to_booking_floors$'),
+            ],
             ENTERING_FULL_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.enter_full_name)],
             ENTERING_PURPOSE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.enter_purpose)],
             SELECTING_DATE: [
@@ -117,41 +158,73 @@ def main():
             MessageHandler(filters.Regex('^📅 Мои брони$'), handlers.show_my_bookings_and_cancel),
             MessageHandler(filters.Regex('^📋 Активные брони$'), handlers.show_all_active_bookings_calendar_and_cancel),
             MessageHandler(filters.Regex('^ℹ️ Помощь$'), handlers.show_help_and_cancel),
+            MessageHandler(filters.Regex('^🔎 Найти свободную$'), handlers.start_free_search_and_cancel),
             MessageHandler(filters.Regex('^🛠 Админ-панель$'), handlers.show_admin_panel_and_cancel),
         ],
+        name='booking',
+        persistent=True,
     )
 
     application.add_handler(booking_conv_handler)
-    
-    # Обычные обработчики
     application.add_handler(CommandHandler("start", handlers.start))
-    application.add_handler(MessageHandler(filters.Regex('^🗂 Аудитории$'), handlers.show_rooms))
-    application.add_handler(MessageHandler(filters.Regex('^📅 Мои брони$'), handlers.show_my_bookings))
-    application.add_handler(MessageHandler(filters.Regex('^📋 Активные брони$'), handlers.show_all_active_bookings_calendar))
-    application.add_handler(MessageHandler(filters.Regex('^ℹ️ Помощь$'), handlers.show_help))
-    
-    # Админ-панель через обычные обработчики (без ConversationHandler)
-    application.add_handler(MessageHandler(filters.Regex('^🛠 Админ-панель$'), handlers.show_admin_panel))
-    # Единый обработчик текстов для пароля и редактирования
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.handle_text_global))
+
+    # Остальные обновления — через одну таблицу маршрутов: текст кнопки меню
+    # ищется в словаре, callback_data — по префиксному дереву (см. routing.py).
+    # Идет после ConversationHandler, чтобы не перехватывать его callback'и
+    router = Router(text_fallback=handlers.handle_text_global,
+                    callback_fallback=handlers.handle_other_callbacks)
+    router.on_text('🗂 Аудитории', handlers.show_rooms)
+    router.on_text('📅 Мои брони', handlers.show_my_bookings)
+    router.on_text('📋 Активные брони', handlers.show_all_active_bookings_calendar)
+    router.on_text('ℹ️ Помощь', handlers.show_help)
+    router.on_text('🔎 Найти свободную', handlers.start_free_search)
+    router.on_text('🛠 Админ-панель', handlers.show_admin_panel)
+
     # Колбэки админки
-    application.add_handler(CallbackQueryHandler(handlers.admin_add_room_start, pattern='^admin_add_room$'))
-    application.add_handler(CallbackQueryHandler(handlers.admin_contacts_start, pattern='^admin_user_contacts$'))
-    application.add_handler(CallbackQueryHandler(handlers.admin_delete_booking_start, pattern='^admin_booking_delete_menu$'))
-    application.add_handler(CallbackQueryHandler(handlers.admin_edit_room_start, pattern='^admin_edit_rooms$'))
-    application.add_handler(CallbackQueryHandler(handlers.admin_edit_select_floor, pattern='^admin_edit_floor_'))
-    application.add_handler(CallbackQueryHandler(handlers.admin_edit_select_room, pattern='^admin_edit_room_'))
-    application.add_handler(CallbackQueryHandler(handlers.admin_edit_select_field, pattern='^admin_edit_field_'))
-    application.add_handler(CallbackQueryHandler(handlers.admin_confirm_delete_booking, pattern='^admin_confirm_delete_'))
-    
-    # Важно: этот обработчик должен идти после ConversationHandler, чтобы не перехватывать его callback'и
-    application.add_handler(CallbackQueryHandler(handlers.handle_other_callbacks))
+    router.on_callback('admin_add_room', handlers.admin_add_room_start)
+    router.on_callback('admin_user_contacts', handlers.admin_contacts_start)
+    router.on_callback('admin_booking_delete_menu', handlers.admin_delete_booking_start)
+    router.on_callback('admin_edit_rooms', handlers.admin_edit_room_start)
+    router.on_callback('admin_all_bookings', handlers.admin_show_all_bookings)
+    router.on_callback('admin_bookings_page_', handlers.admin_show_all_bookings, 'wii')
+    router.on_callback('admin_all_users', handlers.admin_show_all_users)
+    router.on_callback('admin_users_page_', handlers.admin_show_all_users, 'wwi')
+    router.on_callback('admin_blackouts', handlers.admin_show_blackouts)
+    router.on_callback('admin_blackout_add', handlers.admin_blackout_add_start)
+    router.on_callback('admin_blackout_del_', handlers.admin_delete_blackout, 'i')
+    router.on_callback('admin_broadcast', handlers.admin_broadcast_start)
+    router.on_callback('admin_edit_floor_', handlers.admin_edit_select_floor, 'i?i')
+    router.on_callback('admin_edit_room_', handlers.admin_edit_select_room, 'i')
+    router.on_callback('admin_edit_field_', handlers.admin_edit_select_field, 'w')
+    # Бронь: ID или ключ вхождения r<правило>_<минуты>; у удаления аудитории
+    # префикс длиннее, поэтому его callback_data не попадает в маршрут брони
+    router.on_callback('admin_confirm_delete_', handlers.admin_confirm_delete_booking, 'i')
+    router.on_callback('admin_confirm_delete_r', handlers.admin_confirm_delete_booking, 'ii')
+    router.on_callback('admin_delete_room_', handlers.admin_delete_room, 'i')
+    router.on_callback('admin_delete_room', handlers.show_admin_panel)
+    router.on_callback('admin_confirm_delete_room_', handlers.admin_confirm_delete_room, 'i')
+    router.on_callback('back_to_admin', handlers.show_admin_panel)
+
+    # Календарь, поиск и просмотр аудиторий
+    router.on_callback('cal_', handlers.handle_calendar_callback, 's')
+    router.on_callback('recurrence_', handlers.handle_recurrence_callback, 's')
+    router.on_callback('search_rooms', handlers.start_room_search)
+    router.on_callback('floor_', handlers.show_floor_rooms, 'i?i')
+    router.on_callback('room_', handlers.show_room_details, 'i')
+    router.on_callback('back_to_floors', handlers.back_to_floors)
+    router.on_callback('back_to_calendar', handlers.back_to_calendar)
+    router.on_callback('back_to_main', handlers.back_to_main)
+    application.add_handler(router)
+
+    # Ночное обслуживание БД (требует python-telegram-bot[job-queue])
+    if application.job_queue:
+        MaintenanceJob(db).schedule(application.job_queue)
+    else:
+        logger.warning("⚠️ JobQueue недоступна: обслуживание БД не запланировано")
 
     # Запуск бота
     logger.info("🚀 DAR Telegram Bot запускается...")
-    logger.info("✅ Бот готов к работе!")
-    
-    application.run_polling()
+    asyncio.run(run(application, db))
 
 if __name__ == '__main__':
     try:
@@ -0,0 +1,229 @@
+"""
+Кэши в памяти процесса поверх DatabaseManager
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class RoomCatalog:
+    """Справочник активных аудиторий в памяти.
+
+    Загружается один раз и индексируется по id, этажу и номеру аудитории.
+    При изменении аудиторий DatabaseManager вызывает reload(): новый снимок
+    строится целиком и подменяется одной операцией, поэтому читатели из
+    других потоков всегда видят согласованные данные.
+    """
+
+    def __init__(self, loader: Callable[[], List[Dict]]):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+
+    def _build_snapshot(self, rooms: List[Dict]) -> Dict:
+        by_id = {}
+        by_floor = {}
+        by_number = {}
+        for room in rooms:
+            by_id[room['id']] = room
+            by_floor.setdefault(room['floor'], []).append(room)
+            by_number[str(room['room_number'])] = room
+        return {
+            'all': rooms,
+            'by_id': by_id,
+            'by_floor': by_floor,
+            'by_number': by_number,
+            'floors': sorted(by_floor),
+        }
+
+    def _get_snapshot(self) -> Dict:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self.misses += 1
+                self._snapshot = self._build_snapshot(self._loader() or [])
+                self.version += 1
+            else:
+                self.hits += 1
+            return self._snapshot
+
+    def reload(self):
+        """Перечитать справочник из БД и атомарно подменить снимок"""
+        with self._lock:
+            self.misses += 1
+            self._snapshot = self._build_snapshot(self._loader() or [])
+            self.version += 1
+
+    def invalidate(self):
+        """Сбросить снимок: он будет загружен при следующем обращении"""
+        with self._lock:
+            self._snapshot = None
+
+    def current_version(self) -> int:
+        """Версия актуального снимка (загружает его при необходимости)"""
+        self._get_snapshot()
+        return self.version
+
+    def get(self, room_id: int) -> Optional[Dict]:
+        """Аудитория по ID"""
+        room = self._get_snapshot()['by_id'].get(room_id)
+        return dict(room) if room else None
+
+    def get_by_number(self, room_number) -> Optional[Dict]:
+        """Аудитория по номеру"""
+        room = self._get_snapshot()['by_number'].get(str(room_number))
+        return dict(room) if room else None
+
+    def by_floor(self, floor: int) -> List[Dict]:
+        """Аудитории на этаже"""
+        return [dict(room) for room in self._get_snapshot()['by_floor'].get(floor, [])]
+
+    def all(self) -> List[Dict]:
+        """Все аудитории (по этажу и номеру)"""
+        return [dict(room) for room in self._get_snapshot()['all']]
+
+    def floors(self) -> List[int]:
+        """Этажи, на которых есть аудитории"""
+        return list(self._get_snapshot()['floors'])
+
+    def stats(self) -> Dict:
+        """Счетчики попаданий/промахов кэша"""
+        snapshot = self._snapshot
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'version': self.version,
+            'rooms': len(snapshot['all']) if snapshot else 0,
+        }
+
+
+class UserCache:
+    """Ограниченный LRU-кэш пользователей с временем жизни записей.
+
+    Хранит не более max_size строк таблицы users; самые давно
+    использованные вытесняются первыми, устаревшие (старше ttl секунд)
+    перечитываются из БД.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[Dict]:
+        """Пользователь из кэша или None при промахе"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None:
+                expires_at, user = entry
+                if expires_at > now:
+                    self._data.move_to_end(user_id)
+                    self.hits += 1
+                    return dict(user)
+                del self._data[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, user_id: int, user: Dict):
+        """Положить строку пользователя в кэш"""
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl, dict(user))
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Удалить пользователя из кэша"""
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        """Очистить кэш"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        """Счетчики попаданий/промахов кэша"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'max_size': self.max_size,
+        }
+
+
+class MonthOccupancyCache:
+    """Отметки занятости дней месяца ('full'/'partial') по (аудитория, год, месяц).
+
+    room_id=None — занятость по всему зданию. При промахе loader считает
+    отметки сразу за три месяца (предыдущий, запрошенный и следующий),
+    поэтому переход календаря на соседний месяц обслуживается из кэша.
+    Записи бронирований сбрасывают затронутые месяцы через invalidate().
+    """
+
+    def __init__(self, loader: Callable[[Optional[int], int, int], Dict[Tuple[int, int], Dict[date, str]]],
+                 max_size: int = 1024):
+        self._loader = loader
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Увеличивается при каждом сбросе: результат загрузки, начатой до
+        # записи, не должен попасть в кэш после ее инвалидации
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, room_id: Optional[int], year: int, month: int) -> Dict[date, str]:
+        """Отметки занятости дней месяца"""
+        key = (room_id, year, month)
+        with self._lock:
+            marks = self._data.get(key)
+            if marks is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return marks
+            self.misses += 1
+            generation = self._generation
+        months = self._loader(room_id, year, month)
+        with self._lock:
+            if generation == self._generation:
+                for (y, m), month_marks in months.items():
+                    self._data[(room_id, y, m)] = month_marks
+                    self._data.move_to_end((room_id, y, m))
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+        return months.get((year, month), {})
+
+    def invalidate(self, room_id: int, day: date):
+        """Сбросить месяц дня для аудитории и для здания в целом"""
+        with self._lock:
+            self._generation += 1
+            self._data.pop((room_id, day.year, day.month), None)
+            self._data.pop((None, day.year, day.month), None)
+
+    def clear(self):
+        """Сбросить все отметки"""
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        """Счетчики попаданий/промахов кэша"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+        }
@@ -4,14 +4,22 @@
 """
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from collections import OrderedDict
 from datetime import datetime, date, timedelta
-from typing import List, Optional, Callable
+from typing import Dict, Iterable, List, Optional, Callable
 import calendar as cal
 
 class TelegramCalendar:
-    """Календарь для выбора даты в Telegram боте"""
+    """Календарь для выбора даты в Telegram боте.
+
+    Готовые клавиатуры кэшируются по (год, месяц, выбранная дата, версия
+    заблокированных дат, сегодняшняя дата, отметки занятости): смена дня
+    и изменение заблокированных дат меняют ключ, а смена оформления
+    очищает кэш. InlineKeyboardMarkup неизменяем, поэтому один объект
+    можно отдавать разным пользователям.
+    """
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 256):
         self.month_names = [
             'Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн',
             'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек'
@@ -22,45 +30,102 @@ class TelegramCalendar:
         self.next_icon = '➡️'
         self.close_icon = '❌'
         self.today_icon = '📅'
-        self.locked_dates = []  # Список заблокированных дат
+        self.full_icon = '🔴'
+        self.partial_icon = '🟡'
+        self.locked_dates = frozenset()  # Заблокированные даты
+        self.locked_version = 0
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
         
     def set_month_names(self, names: List[str]):
         """Установить названия месяцев"""
         if len(names) == 12:
             self.month_names = names
+            self._cache.clear()
     
     def set_week_days(self, days: List[str]):
         """Установить названия дней недели"""
         if len(days) == 7:
             self.week_days = days
+            self._cache.clear()
     
     def set_select_icon(self, icon: str):
         """Установить иконку для выбранной даты"""
         self.select_icon = icon
+        self._cache.clear()
     
     def set_prev_icon(self, icon: str):
         """Установить иконку для кнопки 'Предыдущий месяц'"""
         self.prev_icon = icon
+        self._cache.clear()
     
     def set_next_icon(self, icon: str):
         """Установить иконку для кнопки 'Следующий месяц'"""
         self.next_icon = icon
+        self._cache.clear()
     
     def set_close_icon(self, icon: str):
         """Установить иконку для заблокированных дат"""
         self.close_icon = icon
+        self._cache.clear()
     
     def set_today_icon(self, icon: str):
         """Установить иконку для сегодняшней даты"""
         self.today_icon = icon
+        self._cache.clear()
+    
+    def set_busy_icons(self, full: str, partial: str):
+        """Установить иконки для полностью и частично занятых дат"""
+        self.full_icon = full
+        self.partial_icon = partial
+        self._cache.clear()
     
-    def set_locked_dates(self, dates: List[date]):
+    def set_locked_dates(self, dates: Iterable[date]):
         """Установить заблокированные даты"""
-        self.locked_dates = dates
+        dates = frozenset(dates)
+        if dates != self.locked_dates:
+            self.locked_dates = dates
+            self.locked_version += 1
     
-    def create_calendar(self, year: int, month: int, selected_date: Optional[date] = None) -> InlineKeyboardMarkup:
-        """Создать календарь для указанного месяца и года"""
+    def create_calendar(self, year: int, month: int, selected_date: Optional[date] = None,
+                        day_marks: Optional[Dict[date, str]] = None) -> InlineKeyboardMarkup:
+        """Создать календарь для указанного месяца и года.
+
+        day_marks — отметки занятости {date: 'full' | 'partial' | 'closed'};
+        закрытые дни выбрать нельзя, как и заблокированные.
+        """
         today = date.today()
+        key = (
+            year, month, selected_date, self.locked_version, today,
+            frozenset(day_marks.items()) if day_marks else None
+        )
+        markup = self._cache.get(key)
+        if markup is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return markup
+        self.misses += 1
+        markup = self._build_calendar(year, month, today, selected_date, day_marks)
+        self._cache[key] = markup
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return markup
+    
+    def cache_stats(self) -> Dict:
+        """Счетчики попаданий/промахов кэша клавиатур"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._cache),
+        }
+    
+    def _build_calendar(self, year: int, month: int, today: date, selected_date: Optional[date],
+                        day_marks: Optional[Dict[date, str]]) -> InlineKeyboardMarkup:
+        """Построить клавиатуру календаря без кэша"""
+        day_marks = day_marks or {}
+        mark_icons = {'full': self.full_icon, 'partial': self.partial_icon}
         
         # Заголовок календаря
         month_name = self.month_names[month - 1]
@@ -115,12 +180,18 @@ class TelegramCalendar:
                             f"{self.close_icon}{day}", 
                             callback_data="cal_none"
                         ))
-                    elif current_date in self.locked_dates:
-                        # Заблокированная дата
+                    elif current_date in self.locked_dates or day_marks.get(current_date) == 'closed':
+                        # Заблокированная или закрытая дата
                         week_row.append(InlineKeyboardButton(
                             f"{self.close_icon}{day}", 
                             callback_data="cal_none"
                         ))
+                    elif current_date in day_marks:
+                        # Занятая (полностью или частично) дата
+                        week_row.append(InlineKeyboardButton(
+                            f"{mark_icons[day_marks[current_date]]}{day}", 
+                            callback_data=f"cal_select_{year}_{month}_{day}"
+                        ))
                     elif current_date == today:
                         # Сегодняшняя дата
                         week_row.append(InlineKeyboardButton(
@@ -221,3 +292,4 @@ booking_calendar.set_prev_icon('⬅️')
 booking_calendar.set_next_icon('➡️')
 booking_calendar.set_close_icon('❌')
 booking_calendar.set_today_icon('📅')
+booking_calendar.set_busy_icons('🔴', '🟡')
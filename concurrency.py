@@ -0,0 +1,124 @@
+"""
+Параллельная обработка обновлений с сохранением порядка для каждого пользователя
+"""
+
+import asyncio
+import inspect
+import logging
+from typing import Any, Awaitable, Dict, Hashable, List, Optional
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import BaseUpdateProcessor
+
+import config
+
+logger = logging.getLogger(__name__)
+
+BUSY_TEXT = "⏳ Слишком много запросов подряд, подождите немного и повторите."
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """Обработчик обновлений для ApplicationBuilder.concurrent_updates().
+
+    Обновления разных пользователей обрабатываются параллельно, не более
+    max_workers одновременно. Обновления одного пользователя (или чата,
+    если пользователя нет) идут строго по очереди в порядке поступления:
+    состояние ConversationHandler и user_data меняются так же, как при
+    последовательной обработке.
+
+    Обновление сначала ждет своей очереди по ключу и только потом занимает
+    рабочий слот, поэтому серия сообщений одного пользователя не держит
+    слоты, пока ждет. max_pending ограничивает число обновлений, которые
+    обрабатываются или стоят в очереди своего ключа; остальные ждут
+    (задачи для них создает Application). max_pending_per_key ограничивает
+    очередь одного ключа: обновления сверх нее отбрасываются (на нажатие
+    кнопки бот отвечает, что занят), поэтому один пользователь, присылающий
+    поток сообщений, не займет общую очередь.
+    """
+
+    __slots__ = ('max_workers', 'max_pending_per_key', 'dropped', '_workers', '_keys')
+
+    def __init__(self, max_workers: int = config.UPDATE_WORKERS, max_pending: int = config.UPDATE_MAX_PENDING,
+                 max_pending_per_key: int = config.UPDATE_MAX_PENDING_PER_USER):
+        super().__init__(max(max_pending, max_workers))
+        self.max_workers = max_workers
+        self.max_pending_per_key = max(max_pending_per_key, 1)
+        self.dropped = 0
+        self._workers = asyncio.Semaphore(max_workers)
+        # ключ -> [блокировка, число обновлений с этим ключом в работе или в очереди,
+        #         отбрасывались ли обновления с тех пор, как очередь ключа появилась]
+        self._keys: Dict[Hashable, List] = {}
+
+    @staticmethod
+    def update_key(update: object) -> Optional[Hashable]:
+        """Ключ очереди обновления: пользователь, иначе чат; None — без очереди"""
+        if isinstance(update, Update):
+            if update.effective_user:
+                return 'user', update.effective_user.id
+            if update.effective_chat:
+                return 'chat', update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        key = self.update_key(update)
+        if key is None:
+            async with self._workers:
+                await coroutine
+            return
+        entry = self._keys.get(key)
+        if entry is None:
+            entry = self._keys[key] = [asyncio.Lock(), 0, False]
+        elif entry[1] >= self.max_pending_per_key:
+            # Очередь пользователя переполнена: обновление не обрабатываем
+            self.dropped += 1
+            first = not entry[2]
+            if first:
+                entry[2] = True
+                logger.warning(f"⚠️ Очередь обновлений {key} переполнена, лишние обновления отбрасываются")
+            if inspect.iscoroutine(coroutine):
+                coroutine.close()
+            await self._reject(update, first)
+            return
+        entry[1] += 1
+        try:
+            # asyncio.Lock будит ожидающих в порядке очереди
+            async with entry[0]:
+                async with self._workers:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._keys[key]
+
+    @staticmethod
+    async def _reject(update: object, first: bool):
+        """Сообщить пользователю, что обновление отброшено.
+
+        На callback-запрос отвечаем всегда, иначе кнопка «зависает»;
+        на сообщения — один раз за серию, чтобы не отвечать флудом на флуд.
+        """
+        if not isinstance(update, Update):
+            return
+        try:
+            if update.callback_query:
+                await update.callback_query.answer(BUSY_TEXT)
+            elif first and update.effective_message:
+                await update.effective_message.reply_text(BUSY_TEXT)
+        except TelegramError as e:
+            logger.warning(f"⚠️ Не удалось ответить на отброшенное обновление: {e}")
+
+    def stats(self) -> Dict:
+        """Число пользователей/чатов с обновлениями в работе или в очереди, отброшенные обновления"""
+        return {
+            'max_workers': self.max_workers,
+            'active_keys': len(self._keys),
+            'queued': sum(entry[1] for entry in self._keys.values()),
+            'dropped': self.dropped,
+        }
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
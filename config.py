@@ -9,6 +9,65 @@ TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
 # SQLite Database Configuration
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'dar_bot.db')
+# Пул подключений: количество подключений-читателей и настройки SQLite
+DATABASE_READERS = int(os.getenv('DATABASE_READERS', '4'))
+DATABASE_SYNCHRONOUS = os.getenv('DATABASE_SYNCHRONOUS', 'NORMAL')
+DATABASE_CACHE_SIZE_KB = int(os.getenv('DATABASE_CACHE_SIZE_KB', '16384'))
+DATABASE_MMAP_SIZE = int(os.getenv('DATABASE_MMAP_SIZE', str(64 * 1024 * 1024)))
+DATABASE_BUSY_TIMEOUT_MS = int(os.getenv('DATABASE_BUSY_TIMEOUT_MS', '5000'))
+# Кэш пользователей: максимальное число записей и время жизни (секунды)
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '600'))
+# Окно (в днях вперед), для которого занятость аудиторий держится в памяти
+AVAILABILITY_WINDOW_DAYS = int(os.getenv('AVAILABILITY_WINDOW_DAYS', '400'))
+# Рабочие часы здания и шаг сетки (минуты) для поиска свободных аудиторий
+WORKDAY_START = os.getenv('WORKDAY_START', '08:00')
+WORKDAY_END = os.getenv('WORKDAY_END', '22:00')
+SEARCH_STEP_MINUTES = int(os.getenv('SEARCH_STEP_MINUTES', '15'))
+# Обслуживание БД: срок хранения прошедших броней (дни), размер пачки,
+# время ежедневного запуска (ЧЧ:ММ, местное) и сколько страниц освобождать (0 — все)
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', '90'))
+MAINTENANCE_BATCH_SIZE = int(os.getenv('MAINTENANCE_BATCH_SIZE', '1000'))
+MAINTENANCE_TIME = os.getenv('MAINTENANCE_TIME', '03:30')
+MAINTENANCE_VACUUM_PAGES = int(os.getenv('MAINTENANCE_VACUUM_PAGES', '0'))
+# Количество записей на странице списков в админ-панели
+ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', '10'))
+# Сколько аудиторий этажа показывать на одной странице меню
+KEYBOARD_PAGE_SIZE = int(os.getenv('KEYBOARD_PAGE_SIZE', '8'))
+# Как часто (секунды) изменения состояния диалогов записываются в БД
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '5'))
+# Параллельная обработка обновлений: число одновременно обрабатываемых
+# (обновления одного пользователя всегда идут по очереди), предел обновлений
+# в работе и в очередях пользователей, предел очереди одного пользователя
+# (обновления сверх него отбрасываются)
+UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', '16'))
+UPDATE_MAX_PENDING = int(os.getenv('UPDATE_MAX_PENDING', '1024'))
+UPDATE_MAX_PENDING_PER_USER = int(os.getenv('UPDATE_MAX_PENDING_PER_USER', '20'))
+# Исходящие сообщения: общий лимит (сообщений/с), лимит личного чата
+# (сообщений/с и сколько подряд), лимит группы (сообщений/с), повторы после 429
+OUTBOUND_RATE = float(os.getenv('OUTBOUND_RATE', '30'))
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))
+OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', '3'))
+OUTBOUND_GROUP_RATE = float(os.getenv('OUTBOUND_GROUP_RATE', str(20 / 60)))
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '3'))
+# Сколько получателей рассылки читать из БД за один раз
+BROADCAST_CHUNK_SIZE = int(os.getenv('BROADCAST_CHUNK_SIZE', '500'))
+# Напоминания о бронях: за сколько минут до начала (0 — отключены),
+# на сколько минут вперед и не больше скольких броней держать в памяти
+REMINDER_MINUTES = int(os.getenv('REMINDER_MINUTES', '30'))
+REMINDER_WINDOW_MINUTES = int(os.getenv('REMINDER_WINDOW_MINUTES', '360'))
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', '500'))
+# Режим получения обновлений: 'webhook' или 'polling'. Вебхук требует
+# публичного HTTPS-адреса WEBHOOK_URL; без него бот работает через polling
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+# Встроенный HTTP-сервер (вебхук, /healthz, /readyz)
+HTTP_HOST = os.getenv('HTTP_HOST', '0.0.0.0')
+HTTP_PORT = int(os.getenv('PORT', '8080'))
+# Максимальная задержка цикла событий (секунды), при которой /healthz отвечает OK
+HEALTH_MAX_LOOP_LAG = float(os.getenv('HEALTH_MAX_LOOP_LAG', '1.0'))
 
 # Admin Password
 ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'AdminDAR')
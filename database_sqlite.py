@@ -3,96 +3,524 @@
 Простая и надежная альтернатива Supabase
 """
 
+import asyncio
+import bisect
+import functools
 import sqlite3
 import json
-from typing import List, Dict, Optional
-from datetime import datetime, date, time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Optional, Tuple
+from datetime import datetime, date, time, timedelta
 import config
 import os
+import re
+import calendar as cal
+from cache import MonthOccupancyCache, RoomCatalog, UserCache
+from availability import AvailabilityIndex, occupancy_bitmap, free_run_starts, bit_runs
+from recurrence import CALENDAR_CYCLE_DAYS, FREQUENCIES, RecurrenceBook, RecurrenceRule
+from blackouts import BlackoutSet
+
+
+BOOKINGS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS bookings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        full_name TEXT NOT NULL,
+        purpose TEXT NOT NULL,
+        start_min INTEGER NOT NULL,
+        end_min INTEGER NOT NULL,
+        status TEXT DEFAULT 'pending',
+        recurrence_type TEXT DEFAULT 'none',
+        recurrence_until_min INTEGER NULL,
+        recurrence_group TEXT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (room_id) REFERENCES rooms (id)
+    )
+'''
+
+BOOKING_RULES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS booking_rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        full_name TEXT NOT NULL,
+        purpose TEXT NOT NULL,
+        start_min INTEGER NOT NULL,
+        duration_min INTEGER NOT NULL,
+        freq TEXT NOT NULL,
+        until_min INTEGER NULL,
+        count INTEGER NULL,
+        status TEXT DEFAULT 'confirmed',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (room_id) REFERENCES rooms (id)
+    )
+'''
+
+BOOKING_RULE_EXCEPTIONS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS booking_rule_exceptions (
+        rule_id INTEGER NOT NULL,
+        start_min INTEGER NOT NULL,
+        PRIMARY KEY (rule_id, start_min),
+        FOREIGN KEY (rule_id) REFERENCES booking_rules (id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+'''
+
+BOOKINGS_ARCHIVE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS bookings_archive (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        full_name TEXT NOT NULL,
+        purpose TEXT NOT NULL,
+        start_min INTEGER NOT NULL,
+        end_min INTEGER NOT NULL,
+        status TEXT,
+        recurrence_type TEXT,
+        recurrence_until_min INTEGER NULL,
+        recurrence_group TEXT NULL,
+        created_at TIMESTAMP,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+BLACKOUTS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS blackouts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room_id INTEGER NULL,
+        start_min INTEGER NOT NULL,
+        end_min INTEGER NOT NULL,
+        reason TEXT NOT NULL DEFAULT '',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        CHECK (end_min > start_min),
+        FOREIGN KEY (room_id) REFERENCES rooms (id)
+    )
+'''
+
+# Состояние диалогов бота: user_data/chat_data (kind = 'user'/'chat') и
+# состояния ConversationHandler'ов; значения хранятся в pickle
+PERSISTENCE_TABLES_SQL = (
+    '''
+    CREATE TABLE IF NOT EXISTS bot_state (
+        kind TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (kind, id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS conversation_states (
+        name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        state BLOB NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (name, key)
+    ) WITHOUT ROWID
+    ''',
+)
+
+# Колонки, переносимые из bookings в bookings_archive
+BOOKING_COLUMNS = (
+    'id, user_id, room_id, full_name, purpose, start_min, end_min, status, '
+    'recurrence_type, recurrence_until_min, recurrence_group, created_at'
+)
+
+
+def to_epoch_minutes(value: datetime) -> int:
+    """Локальное время → целое число минут от эпохи (UTC)"""
+    return int(value.timestamp()) // 60
+
+
+def from_epoch_minutes(value: int) -> datetime:
+    """Минуты от эпохи (UTC) → локальное время"""
+    return datetime.fromtimestamp(value * 60)
+
+
+def _booking_from_row(row) -> Dict:
+    """Преобразовать строку бронирования в словарь с datetime вместо минут"""
+    booking = dict(row)
+    if 'start_min' in booking:
+        booking['start_time'] = from_epoch_minutes(booking.pop('start_min'))
+    if 'end_min' in booking:
+        booking['end_time'] = from_epoch_minutes(booking.pop('end_min'))
+    if 'recurrence_until_min' in booking:
+        until = booking.pop('recurrence_until_min')
+        booking['recurrence_until'] = from_epoch_minutes(until) if until is not None else None
+    return booking
+
+
+def _occurrence_key(rule_id: int, start: datetime) -> str:
+    """Идентификатор вхождения правила: r<rule_id>_<минуты начала>"""
+    return f"r{rule_id}_{to_epoch_minutes(start)}"
+
+
+class ConnectionPool:
+    """Пул долгоживущих подключений к SQLite.
+
+    Журнал в режиме WAL позволяет читателям работать параллельно с писателем,
+    поэтому пул держит одно подключение для записи (под блокировкой) и
+    несколько подключений только для чтения.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, db_path: str, readers: int = config.DATABASE_READERS) -> 'ConnectionPool':
+        """Получить общий для процесса пул для указанного файла базы данных"""
+        key = os.path.abspath(db_path)
+        with cls._shared_lock:
+            pool = cls._shared.get(key)
+            if pool is None:
+                pool = cls(db_path, readers=readers)
+                cls._shared[key] = pool
+            return pool
+
+    def __init__(self, db_path: str, readers: int = config.DATABASE_READERS,
+                 synchronous: str = config.DATABASE_SYNCHRONOUS,
+                 cache_size_kb: int = config.DATABASE_CACHE_SIZE_KB,
+                 mmap_size: int = config.DATABASE_MMAP_SIZE,
+                 busy_timeout_ms: int = config.DATABASE_BUSY_TIMEOUT_MS):
+        self.db_path = db_path
+        self._pragmas = (
+            "PRAGMA journal_mode = WAL",
+            f"PRAGMA synchronous = {synchronous}",
+            f"PRAGMA cache_size = -{int(cache_size_kb)}",
+            f"PRAGMA mmap_size = {int(mmap_size)}",
+            f"PRAGMA busy_timeout = {int(busy_timeout_ms)}",
+            "PRAGMA temp_store = MEMORY",
+            "PRAGMA foreign_keys = ON",
+        )
+        self._writer = self._connect()
+        self._writer_lock = threading.Lock()
+        self._after_commit = []
+        self._readers = queue.Queue()
+        # Хотя бы один читатель: чтение никогда не ждет блокировку писателя
+        for _ in range(max(1, readers)):
+            self._readers.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открыть подключение и применить настройки"""
+        # isolation_level=None: транзакциями управляем сами (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        for pragma in self._pragmas:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Взять подключение для чтения из пула"""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Подключение для записи внутри транзакции BEGIN IMMEDIATE"""
+        with self._writer_lock:
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                self._after_commit.clear()
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+                # Колбэки выполняются под блокировкой писателя, сразу после фиксации
+                callbacks, self._after_commit = self._after_commit, []
+                for callback in callbacks:
+                    callback()
+
+    @contextmanager
+    def exclusive(self):
+        """Подключение писателя без транзакции (для VACUUM и подобных команд)"""
+        with self._writer_lock:
+            yield self._writer
+
+    def after_commit(self, callback):
+        """Выполнить callback после фиксации текущей транзакции писателя"""
+        self._after_commit.append(callback)
+
+    def close(self):
+        """Закрыть все подключения пула"""
+        with self._shared_lock:
+            key = os.path.abspath(self.db_path)
+            if self._shared.get(key) is self:
+                del self._shared[key]
+        with self._writer_lock:
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "dar_bot.db"):
+    def __init__(self, db_path: str = config.DATABASE_PATH, readers: int = config.DATABASE_READERS):
         """Инициализация подключения к SQLite базе данных"""
         self.db_path = db_path
+        self._pool = ConnectionPool.shared(db_path, readers=readers)
         self.init_database()
+        # Справочник аудиторий в памяти; обновляется при каждом изменении аудиторий
+        self.rooms = RoomCatalog(self._load_rooms)
+        # Кэш пользователей и флагов администратора
+        self.users = UserCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+        # Интервалы занятости аудиторий на окно бронирования
+        self.availability = AvailabilityIndex(self._load_booking_intervals, config.AVAILABILITY_WINDOW_DAYS)
+        # Правила повторяющихся бронирований; вхождения разворачиваются по запросу
+        self.recurrences = RecurrenceBook(self._load_recurrence_rules)
+        # Отметки занятости дней для календаря; сбрасываются при записи бронирований
+        self.occupancy = MonthOccupancyCache(self._load_month_occupancy)
+        # Закрытия здания и аудиторий (праздники, ремонт)
+        self.blackouts = BlackoutSet(self._load_blackouts)
+        # Подписчики на изменения бронирований (планировщик напоминаний)
+        self.booking_listeners: List[Callable[[Optional[int]], None]] = []
+    
+    def close(self):
+        """Закрыть подключения к базе данных"""
+        self._pool.close()
     
     def init_database(self):
-        """Создание таблиц базы данных"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Применить к базе данных недостающие миграции схемы.
+
+        Номер последней примененной миграции хранится в PRAGMA user_version,
+        поэтому при повторных запусках выполняется одно чтение прагмы.
+        """
+        migrations = self._migrations()
+        latest = migrations[-1][0]
+        with self._pool.reader() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= latest:
+                return
+        with self._pool.writer() as conn:
             cursor = conn.cursor()
-            
-            # Создаем таблицу пользователей
+            # Перепроверяем под блокировкой писателя: миграции мог применить другой процесс
+            current = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for version, migrate in migrations:
+                if version <= current:
+                    continue
+                migrate(cursor)
+                # PRAGMA не поддерживает параметры; version — целое из списка миграций
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
+                print(f"✅ Применена миграция схемы БД №{version}")
+
+    def _migrations(self) -> List[Tuple[int, object]]:
+        """Миграции схемы по возрастанию версии. Новые шаги добавляются только в конец."""
+        return [
+            (1, self._migration_base_schema),
+            (2, self._migration_indexes),
+            (3, self._migration_no_overlap_trigger),
+            (4, self._add_sample_data),
+            (5, self._migration_booking_rules),
+            (6, self._migration_bookings_archive),
+            (7, self._migration_users_created_at),
+            (8, self._migration_rooms_fts),
+            (9, self._migration_blackouts),
+            (10, self._migration_bot_state),
+            (11, self._migration_no_overlap_update_trigger),
+        ]
+
+    def _migration_base_schema(self, cursor):
+        """Таблицы пользователей, аудиторий и бронирований"""
+        # Создаем таблицу пользователей
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                last_name TEXT,
+                is_admin BOOLEAN DEFAULT FALSE
+            )
+        ''')
+        
+        # Создаем таблицу аудиторий
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rooms (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_number TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL,
+                floor INTEGER NOT NULL,
+                capacity INTEGER,
+                equipment TEXT,
+                description TEXT,
+                is_active BOOLEAN DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Создаем таблицу бронирований
+        cursor.execute(BOOKINGS_TABLE_SQL)
+        # Базы, созданные до введения версий схемы, хранят время ISO-строками
+        booking_columns = {row['name'] for row in cursor.execute("PRAGMA table_info(bookings)")}
+        if 'start_time' in booking_columns:
+            legacy_columns = (
+                ('recurrence_type', "ALTER TABLE bookings ADD COLUMN recurrence_type TEXT DEFAULT 'none'"),
+                ('recurrence_until', "ALTER TABLE bookings ADD COLUMN recurrence_until TIMESTAMP NULL"),
+                ('recurrence_group', "ALTER TABLE bookings ADD COLUMN recurrence_group TEXT NULL"),
+            )
+            for column, ddl in legacy_columns:
+                if column not in booking_columns:
+                    cursor.execute(ddl)
+            self._migrate_bookings_to_epoch_minutes(cursor)
+
+    def _migration_indexes(self, cursor):
+        """Индексы для выборок по этажам, времени и пользователям"""
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rooms_floor ON rooms(floor)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bookings_room_time ON bookings(room_id, start_min, end_min)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bookings_start ON bookings(start_min)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bookings_user ON bookings(user_id)')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_recurrence_group ON bookings(recurrence_group)")
+
+    def _migration_no_overlap_trigger(self, cursor):
+        """Защита от двойных бронирований на уровне БД"""
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_bookings_no_overlap
+            BEFORE INSERT ON bookings
+            WHEN NEW.status = 'confirmed'
+            BEGIN
+                SELECT RAISE(ABORT, 'booking_overlap')
+                WHERE EXISTS (
+                    SELECT 1 FROM bookings
+                    WHERE room_id = NEW.room_id AND status = 'confirmed'
+                    AND end_min > NEW.start_min AND start_min < NEW.end_min
+                );
+            END
+        ''')
+    
+    def _migration_booking_rules(self, cursor):
+        """Повторяющиеся бронирования в виде правил с исключениями"""
+        cursor.execute(BOOKING_RULES_TABLE_SQL)
+        cursor.execute(BOOKING_RULE_EXCEPTIONS_TABLE_SQL)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_rules_room ON booking_rules(room_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_rules_user ON booking_rules(user_id)")
+
+    def _migration_bookings_archive(self, cursor):
+        """Архив прошедших бронирований"""
+        cursor.execute(BOOKINGS_ARCHIVE_TABLE_SQL)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_archive_start ON bookings_archive(start_min)")
+
+    def _migration_users_created_at(self, cursor):
+        """Дата регистрации пользователя и индексы для постраничного вывода"""
+        user_columns = {row['name'] for row in cursor.execute("PRAGMA table_info(users)")}
+        if 'created_at' not in user_columns:
+            # ADD COLUMN не допускает DEFAULT CURRENT_TIMESTAMP: добавляем NULL и заполняем
+            cursor.execute("ALTER TABLE users ADD COLUMN created_at TIMESTAMP NULL")
+        cursor.execute('''
+            UPDATE users SET created_at = COALESCE(
+                (SELECT MIN(b.created_at) FROM bookings b WHERE b.user_id = users.id),
+                CURRENT_TIMESTAMP
+            )
+            WHERE created_at IS NULL
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at)")
+
+    def _migration_rooms_fts(self, cursor):
+        """Полнотекстовый индекс FTS5 по названию, оборудованию и описанию аудиторий"""
+        try:
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    is_admin BOOLEAN DEFAULT FALSE
+                CREATE VIRTUAL TABLE IF NOT EXISTS rooms_fts USING fts5(
+                    name, equipment, description,
+                    content='rooms', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
                 )
             ''')
-            
-            # Создаем таблицу аудиторий
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS rooms (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    room_number TEXT UNIQUE NOT NULL,
-                    name TEXT NOT NULL,
-                    floor INTEGER NOT NULL,
-                    capacity INTEGER,
-                    equipment TEXT,
-                    description TEXT,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        except sqlite3.OperationalError as e:
+            # SQLite собран без FTS5: поиск будет работать по справочнику в памяти
+            print(f"⚠️ FTS5 недоступен, полнотекстовый поиск аудиторий отключен: {e}")
+            return
+        # Внешнее содержимое: индекс синхронизируется с rooms триггерами
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_rooms_fts_insert AFTER INSERT ON rooms BEGIN
+                INSERT INTO rooms_fts(rowid, name, equipment, description)
+                VALUES (NEW.id, NEW.name, NEW.equipment, NEW.description);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_rooms_fts_delete AFTER DELETE ON rooms BEGIN
+                INSERT INTO rooms_fts(rooms_fts, rowid, name, equipment, description)
+                VALUES ('delete', OLD.id, OLD.name, OLD.equipment, OLD.description);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_rooms_fts_update AFTER UPDATE ON rooms BEGIN
+                INSERT INTO rooms_fts(rooms_fts, rowid, name, equipment, description)
+                VALUES ('delete', OLD.id, OLD.name, OLD.equipment, OLD.description);
+                INSERT INTO rooms_fts(rowid, name, equipment, description)
+                VALUES (NEW.id, NEW.name, NEW.equipment, NEW.description);
+            END
+        ''')
+        cursor.execute("INSERT INTO rooms_fts(rooms_fts) VALUES ('rebuild')")
+
+    def _migration_blackouts(self, cursor):
+        """Периоды закрытия здания и отдельных аудиторий"""
+        cursor.execute(BLACKOUTS_TABLE_SQL)
+
+    def _migration_bot_state(self, cursor):
+        """Сохраняемое состояние диалогов бота"""
+        for statement in PERSISTENCE_TABLES_SQL:
+            cursor.execute(statement)
+
+    def _migration_no_overlap_update_trigger(self, cursor):
+        """Защита от двойных бронирований при изменении статуса, времени или аудитории брони"""
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_bookings_no_overlap_update
+            BEFORE UPDATE OF status, start_min, end_min, room_id ON bookings
+            WHEN NEW.status = 'confirmed'
+            BEGIN
+                SELECT RAISE(ABORT, 'booking_overlap')
+                WHERE EXISTS (
+                    SELECT 1 FROM bookings
+                    WHERE room_id = NEW.room_id AND status = 'confirmed' AND id != NEW.id
+                    AND end_min > NEW.start_min AND start_min < NEW.end_min
+                );
+            END
+        ''')
+
+    def _migrate_bookings_to_epoch_minutes(self, cursor, batch_size: int = 1000):
+        """Перенести бронирования из ISO-строк в целочисленные минуты от эпохи (UTC)"""
+        cursor.execute("ALTER TABLE bookings RENAME TO bookings_legacy")
+        cursor.execute(BOOKINGS_TABLE_SQL)
+        legacy = cursor.connection.execute('''
+            SELECT id, user_id, room_id, full_name, purpose, start_time, end_time, status,
+                   recurrence_type, recurrence_until, recurrence_group, created_at
+            FROM bookings_legacy
+        ''')
+        moved = 0
+        while True:
+            rows = legacy.fetchmany(batch_size)
+            if not rows:
+                break
+            cursor.executemany('''
+                INSERT INTO bookings (
+                    id, user_id, room_id, full_name, purpose, start_min, end_min, status,
+                    recurrence_type, recurrence_until_min, recurrence_group, created_at
                 )
-            ''')
-            
-            # Создаем таблицу бронирований
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bookings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    room_id INTEGER NOT NULL,
-                    full_name TEXT NOT NULL,
-                    purpose TEXT NOT NULL,
-                    start_time TIMESTAMP NOT NULL,
-                    end_time TIMESTAMP NOT NULL,
-                    status TEXT DEFAULT 'pending',
-                    recurrence_type TEXT DEFAULT 'none',
-                    recurrence_until TIMESTAMP NULL,
-                    recurrence_group TEXT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (id),
-                    FOREIGN KEY (room_id) REFERENCES rooms (id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    row['id'], row['user_id'], row['room_id'], row['full_name'], row['purpose'],
+                    to_epoch_minutes(datetime.fromisoformat(row['start_time'])),
+                    to_epoch_minutes(datetime.fromisoformat(row['end_time'])),
+                    row['status'], row['recurrence_type'],
+                    to_epoch_minutes(datetime.fromisoformat(row['recurrence_until'])) if row['recurrence_until'] else None,
+                    row['recurrence_group'], row['created_at']
                 )
-            ''')
-            # Миграции для существующих БД (добавление колонок, если их нет)
-            try:
-                cursor.execute("ALTER TABLE bookings ADD COLUMN recurrence_type TEXT DEFAULT 'none'")
-            except Exception:
-                pass
-            try:
-                cursor.execute("ALTER TABLE bookings ADD COLUMN recurrence_until TIMESTAMP NULL")
-            except Exception:
-                pass
-            try:
-                cursor.execute("ALTER TABLE bookings ADD COLUMN recurrence_group TEXT NULL")
-            except Exception:
-                pass
-            
-            # Создаем индексы для оптимизации
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_rooms_floor ON rooms(floor)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_bookings_room_time ON bookings(room_id, start_time, end_time)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_bookings_user ON bookings(user_id)')
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_recurrence_group ON bookings(recurrence_group)")
-            
-            conn.commit()
-            
-            # Добавляем тестовые данные, если база пустая
-            self._add_sample_data(cursor)
-    
+                for row in rows
+            ])
+            moved += len(rows)
+        cursor.execute("DROP TABLE bookings_legacy")
+        print(f"✅ Бронирования переведены на минуты от эпохи: {moved}")
+
     def _add_sample_data(self, cursor):
-        """Добавление тестовых данных"""
+        """Добавление тестовых данных (однократно, если справочник аудиторий пуст)"""
         # Проверяем, есть ли уже данные
         cursor.execute('SELECT COUNT(*) FROM rooms')
         if cursor.fetchone()[0] > 0:
@@ -130,71 +558,160 @@ class DatabaseManager:
             VALUES (?, ?, ?, ?, ?, ?)
         ''', sample_rooms)
     
-    def _get_connection(self):
-        """Получить подключение к базе данных"""
-        conn = sqlite3.connect(self.db_path)
-        # Включаем проверку внешних ключей
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
-    
     def _execute_query(self, query: str, params: tuple = (), fetch_one: bool = False, fetch_all: bool = False):
         """Выполнить SQL запрос"""
         try:
-            with self._get_connection() as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                
-                if fetch_one:
-                    result = cursor.fetchone()
-                    return dict(result) if result else None
-                elif fetch_all:
+            # Чтение идет через пул читателей, запись — через единственного писателя
+            if fetch_one or fetch_all:
+                with self._pool.reader() as conn:
+                    cursor = conn.execute(query, params)
+                    if fetch_one:
+                        result = cursor.fetchone()
+                        return dict(result) if result else None
                     results = cursor.fetchall()
                     return [dict(row) for row in results] if results else []
-                else:
-                    return cursor.lastrowid
+            with self._pool.writer() as conn:
+                cursor = conn.execute(query, params)
+                return cursor.lastrowid
         except Exception as e:
             print(f"Ошибка выполнения запроса: {e}")
             return None if fetch_one or fetch_all else False
     
-    # Методы для работы с аудиториями
+    # Методы для работы с аудиториями (читаются из справочника в памяти)
+    def _load_rooms(self) -> List[Dict]:
+        """Загрузить активные аудитории для справочника"""
+        query = "SELECT * FROM rooms WHERE is_active = TRUE ORDER BY floor, room_number"
+        return self._execute_query(query, fetch_all=True)
+    
     def get_rooms_by_floor(self, floor: int) -> List[Dict]:
         """Получить все аудитории на определенном этаже"""
-        query = "SELECT * FROM rooms WHERE floor = ? AND is_active = TRUE ORDER BY room_number"
-        return self._execute_query(query, (floor,), fetch_all=True)
+        return self.rooms.by_floor(floor)
     
     def get_room_by_id(self, room_id: int) -> Optional[Dict]:
         """Получить аудиторию по ID"""
-        query = "SELECT * FROM rooms WHERE id = ? AND is_active = TRUE"
-        return self._execute_query(query, (room_id,), fetch_one=True)
+        return self.rooms.get(room_id)
+    
+    def get_room_by_number(self, room_number: str) -> Optional[Dict]:
+        """Получить аудиторию по номеру"""
+        return self.rooms.get_by_number(room_number)
     
     def get_all_rooms(self) -> List[Dict]:
         """Получить все аудитории"""
-        query = "SELECT * FROM rooms WHERE is_active = TRUE ORDER BY floor, room_number"
-        return self._execute_query(query, fetch_all=True)
+        return self.rooms.all()
+    
+    @staticmethod
+    def _fts_query(text: str) -> str:
+        """Запрос FTS5 из произвольного текста: префиксы слов через AND.
+
+        Окончания длинных слов отбрасываются, чтобы «проектором» находил
+        «проектор»; кавычки экранируют спецсимволы синтаксиса FTS5.
+        """
+        terms = []
+        for word in re.findall(r'\w+', text.lower()):
+            stem = word[:max(4, len(word) - 2)] if len(word) > 4 else word
+            terms.append(f'"{stem}"*')
+        return ' '.join(terms)
+
+    def search_rooms(self, text: str = '', min_capacity: Optional[int] = None, limit: int = 20) -> List[Dict]:
+        """Поиск аудиторий по тексту (название, оборудование, описание) и вместимости.
+
+        Текст ищется по индексу rooms_fts с ранжированием bm25 (совпадение
+        в названии весит больше, чем в оборудовании и описании).
+        """
+        match = self._fts_query(text or '')
+        if not match:
+            rooms = [r for r in self.rooms.all() if not min_capacity or (r.get('capacity') or 0) >= min_capacity]
+            return sorted(rooms, key=lambda r: r.get('capacity') or 0)[:limit]
+
+        query = '''
+            SELECT r.* FROM rooms_fts
+            JOIN rooms r ON r.id = rooms_fts.rowid
+            WHERE rooms_fts MATCH ? AND r.is_active = TRUE
+            AND (? IS NULL OR r.capacity >= ?)
+            ORDER BY bm25(rooms_fts, 10.0, 2.0, 1.0), r.capacity
+            LIMIT ?
+        '''
+        try:
+            with self._pool.reader() as conn:
+                rows = conn.execute(query, (match, min_capacity, min_capacity, limit)).fetchall()
+            return [dict(row) for row in rows]
+        except sqlite3.OperationalError:
+            # Нет FTS5: ищем подстроки по справочнику в памяти
+            words = [word[:max(4, len(word) - 2)] for word in re.findall(r'\w+', text.lower())]
+            return [
+                room for room in self.rooms.all()
+                if (not min_capacity or (room.get('capacity') or 0) >= min_capacity)
+                and all(
+                    word in f"{room['name']} {room.get('equipment') or ''} {room.get('description') or ''}".lower()
+                    for word in words
+                )
+            ][:limit]
+
+    def get_room_cache_stats(self) -> Dict:
+        """Статистика попаданий в справочник аудиторий"""
+        return self.rooms.stats()
     
     # --- ЕДИНЫЙ БЛОК ДЛЯ РАБОТЫ С ПОЛЬЗОВАТЕЛЯМИ ---
 
     def get_user_by_id(self, user_id: int):
         """Получает пользователя по ID (telegram_id)."""
+        db_user = self.users.get(user_id)
+        if db_user:
+            return db_user
         query = "SELECT * FROM users WHERE id = ?"
-        return self._execute_query(query, (user_id,), fetch_one=True)
+        db_user = self._execute_query(query, (user_id,), fetch_one=True)
+        if db_user:
+            self.users.put(user_id, db_user)
+        return db_user
+
+    def get_users_by_ids(self, user_ids) -> Dict[int, Dict]:
+        """Пользователи по списку ID: из кэша, недостающие — одним запросом"""
+        users = {}
+        missing = []
+        for user_id in set(user_ids):
+            db_user = self.users.get(user_id)
+            if db_user:
+                users[user_id] = db_user
+            else:
+                missing.append(user_id)
+        if missing:
+            placeholders = ', '.join('?' * len(missing))
+            rows = self._execute_query(
+                f"SELECT * FROM users WHERE id IN ({placeholders})", tuple(missing), fetch_all=True
+            ) or []
+            for row in rows:
+                self.users.put(row['id'], row)
+                users[row['id']] = dict(row)
+        return users
 
     def get_or_create_user(self, user):
         """Получает или создает пользователя в базе данных."""
-        db_user = self.get_user_by_id(user.id)
+        db_user = self.users.get(user.id)
         if db_user:
             return db_user
         
-        query = "INSERT OR IGNORE INTO users (id, username, first_name, last_name) VALUES (?, ?, ?, ?)"
+        # Промах кэша: вставляем пользователя, если его нет, и перечитываем строку
+        query = '''
+            INSERT OR IGNORE INTO users (id, username, first_name, last_name, created_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        '''
         self._execute_query(query, (user.id, user.username, user.first_name, user.last_name))
         return self.get_user_by_id(user.id)
 
+    def invalidate_user(self, user_id: int):
+        """Сбросить закэшированные данные пользователя"""
+        self.users.invalidate(user_id)
+
+    def get_user_cache_stats(self) -> Dict:
+        """Статистика попаданий в кэш пользователей"""
+        return self.users.stats()
+
     def check_admin_password(self, telegram_id: int, password: str) -> bool:
         """Проверить пароль администратора"""
         if password == config.ADMIN_PASSWORD:
             query = "UPDATE users SET is_admin = TRUE WHERE id = ?"
             self._execute_query(query, (telegram_id,))
+            self.invalidate_user(telegram_id)
             return self.is_user_admin(telegram_id)
         return False
     
@@ -207,17 +724,155 @@ class DatabaseManager:
     
     def get_bookings_for_date(self, selected_date: date) -> List[Dict]:
         """Получить все подтвержденные бронирования на определенную дату."""
-        start_of_day = datetime.combine(selected_date, time.min).isoformat()
-        end_of_day = datetime.combine(selected_date, time.max).isoformat()
+        start_of_day = to_epoch_minutes(datetime.combine(selected_date, time.min))
+        end_of_day = to_epoch_minutes(datetime.combine(selected_date + timedelta(days=1), time.min))
         query = """
             SELECT b.*, r.name as room_name
             FROM bookings b
             JOIN rooms r ON b.room_id = r.id
             WHERE b.status = 'confirmed' 
-            AND b.start_time BETWEEN ? AND ?
-            ORDER BY b.start_time
+            AND b.start_min >= ? AND b.start_min < ?
+            ORDER BY b.start_min
         """
-        return self._execute_query(query, (start_of_day, end_of_day), fetch_all=True)
+        bookings = self._execute_query(query, (start_of_day, end_of_day), fetch_all=True)
+        bookings = [_booking_from_row(b) for b in bookings] if bookings else []
+        for booking in self._day_occurrences(selected_date):
+            booking['room_name'] = self.rooms.get(booking['room_id'])['name']
+            bookings.append(booking)
+        bookings.sort(key=lambda b: b['start_time'])
+        return bookings
+
+    def get_day_schedule(self, selected_date: date) -> List[Dict]:
+        """Расписание на день одним запросом: брони вместе с данными аудитории и пользователя."""
+        start_of_day = to_epoch_minutes(datetime.combine(selected_date, time.min))
+        end_of_day = to_epoch_minutes(datetime.combine(selected_date + timedelta(days=1), time.min))
+        query = """
+            SELECT b.id, b.user_id, b.room_id, b.full_name, b.purpose, b.start_min, b.end_min,
+                   r.name as room_name, r.room_number,
+                   u.id IS NOT NULL as has_user, u.username, u.first_name, u.last_name
+            FROM bookings b
+            JOIN rooms r ON b.room_id = r.id
+            LEFT JOIN users u ON b.user_id = u.id
+            WHERE b.status = 'confirmed'
+            AND b.start_min >= ? AND b.start_min < ?
+            ORDER BY b.start_min, r.room_number
+        """
+        bookings = self._execute_query(query, (start_of_day, end_of_day), fetch_all=True)
+        bookings = [_booking_from_row(b) for b in bookings] if bookings else []
+        occurrences = self._day_occurrences(selected_date)
+        users = self.get_users_by_ids(booking['user_id'] for booking in occurrences)
+        for booking in occurrences:
+            room = self.rooms.get(booking['room_id'])
+            user = users.get(booking['user_id'], {})
+            booking.update({
+                'room_name': room['name'],
+                'room_number': room['room_number'],
+                'has_user': bool(user),
+                'username': user.get('username'),
+                'first_name': user.get('first_name'),
+                'last_name': user.get('last_name'),
+            })
+            bookings.append(booking)
+        bookings.sort(key=lambda b: (b['start_time'], str(b['room_number'])))
+        return bookings
+
+    # --- Повторяющиеся бронирования (правила) ---
+
+    def _load_recurrence_rules(self) -> List[RecurrenceRule]:
+        """Загрузить активные правила повторения вместе с исключениями"""
+        rows = self._execute_query(
+            "SELECT * FROM booking_rules WHERE status = 'confirmed'", fetch_all=True
+        ) or []
+        exceptions = {}
+        for row in self._execute_query(
+            "SELECT rule_id, start_min FROM booking_rule_exceptions", fetch_all=True
+        ) or []:
+            exceptions.setdefault(row['rule_id'], []).append(from_epoch_minutes(row['start_min']).date())
+        return [
+            RecurrenceRule(
+                row['id'], row['room_id'], row['user_id'],
+                first=from_epoch_minutes(row['start_min']),
+                duration=row['duration_min'],
+                freq=row['freq'],
+                until=from_epoch_minutes(row['until_min']).date() if row['until_min'] is not None else None,
+                count=row['count'],
+                exceptions=exceptions.get(row['id'], ()),
+                full_name=row['full_name'],
+                purpose=row['purpose'],
+            )
+            for row in rows
+        ]
+
+    def _occurrence_booking(self, rule: RecurrenceRule, start: datetime, end: datetime) -> Dict:
+        """Вхождение правила в виде словаря бронирования"""
+        return {
+            'id': _occurrence_key(rule.id, start),
+            'rule_id': rule.id,
+            'user_id': rule.user_id,
+            'room_id': rule.room_id,
+            'full_name': rule.full_name,
+            'purpose': rule.purpose,
+            'start_time': start,
+            'end_time': end,
+            'status': 'confirmed',
+            'recurrence_type': rule.freq,
+            'recurrence_until': datetime.combine(rule.until, time.min) if rule.until else None,
+            'recurrence_group': None,
+        }
+
+    def _day_occurrences(self, selected_date: date, room_id: Optional[int] = None) -> List[Dict]:
+        """Вхождения правил за день (только в активных аудиториях)"""
+        return [
+            self._occurrence_booking(rule, start, end)
+            for rule, start, end in self.recurrences.day(selected_date)
+            if (room_id is None or rule.room_id == room_id) and self.rooms.get(rule.room_id)
+        ]
+
+    def _bookings_changed(self, start_min: Optional[int] = None):
+        """Сообщить подписчикам об изменении брони с началом start_min (None — неизвестно/много)"""
+        for listener in self.booking_listeners:
+            try:
+                listener(start_min)
+            except Exception as e:
+                print(f"❌ Ошибка подписчика изменений бронирований: {e}")
+
+    def get_upcoming_bookings(self, from_min: int, to_min: int, limit: int) -> List[Dict]:
+        """Подтвержденные брони и вхождения правил с началом в [from_min, to_min) (минуты эпохи).
+
+        Не больше limit записей по возрастанию начала; у каждой есть start_min.
+        Брони читаются по индексу idx_bookings_start, вхождения — из RecurrenceBook.
+        """
+        rows = self._execute_query('''
+            SELECT b.id, b.user_id, b.room_id, b.purpose, b.start_min, b.end_min, r.name as room_name
+            FROM bookings b
+            JOIN rooms r ON b.room_id = r.id
+            WHERE b.start_min >= ? AND b.start_min < ? AND b.status = 'confirmed'
+            ORDER BY b.start_min, b.id
+            LIMIT ?
+        ''', (from_min, to_min, limit), fetch_all=True) or []
+        bookings = []
+        for row in rows:
+            booking = _booking_from_row(row)
+            booking['start_min'] = row['start_min']
+            bookings.append(booking)
+
+        day = from_epoch_minutes(from_min).date()
+        last_day = from_epoch_minutes(to_min - 1).date()
+        while day <= last_day:
+            for rule, start, end in self.recurrences.day(day):
+                start_min = to_epoch_minutes(start)
+                room = self.rooms.get(rule.room_id)
+                if room and from_min <= start_min < to_min:
+                    booking = self._occurrence_booking(rule, start, end)
+                    booking.update({'start_min': start_min, 'room_name': room['name']})
+                    bookings.append(booking)
+            day += timedelta(days=1)
+        bookings.sort(key=lambda b: (b['start_min'], str(b['id'])))
+        return bookings[:limit]
+
+    def get_recurrence_cache_stats(self) -> Dict:
+        """Статистика кэша вхождений повторяющихся бронирований"""
+        return self.recurrences.stats()
 
     # Методы для управления аудиториями (админ)
     def add_room(self, room_number: str, name: str, floor: int, capacity: int, 
@@ -228,6 +883,7 @@ class DatabaseManager:
             VALUES (?, ?, ?, ?, ?, ?, ?)
         '''
         room_id = self._execute_query(query, (room_number, name, floor, capacity, equipment, description, True))
+        self.rooms.reload()
         
         if room_id:
             return self.get_room_by_id(room_id)
@@ -237,7 +893,9 @@ class DatabaseManager:
     def delete_room(self, room_id: int) -> bool:
         """Удалить аудиторию (мягкое удаление)"""
         query = "UPDATE rooms SET is_active = FALSE WHERE id = ?"
-        return self._execute_query(query, (room_id,)) is not False
+        success = self._execute_query(query, (room_id,)) is not False
+        self.rooms.reload()
+        return success
     
     def get_all_users_with_bookings(self) -> List[Dict]:
         """Получить всех пользователей с их бронированиями"""
@@ -254,20 +912,91 @@ class DatabaseManager:
         '''
         return self._execute_query(query, fetch_all=True)
     
+    def _keyset_page(self, query: str, keys: Tuple[str, ...], params: tuple = (),
+                     cursor: Optional[tuple] = None, backward: bool = False, limit: int = 10) -> Dict:
+        """Страница выборки с курсором по ключу сортировки (от новых к старым).
+
+        query — SELECT ... WHERE ... без ORDER BY и LIMIT; keys — колонки
+        ключа (последняя — уникальный id), их значения должны быть в выборке
+        под теми же именами без префикса таблицы. cursor — ключ крайней строки
+        текущей страницы; backward=True — листать к более новым записям.
+        Возвращает {'items': [...], 'prev': курсор или None, 'next': курсор или None}.
+        """
+        if cursor is not None:
+            placeholders = ', '.join('?' * len(keys))
+            query += f" AND ({', '.join(keys)}) {'>' if backward else '<'} ({placeholders})"
+            params = tuple(params) + tuple(cursor)
+        direction = 'ASC' if backward else 'DESC'
+        query += f" ORDER BY {', '.join(f'{key} {direction}' for key in keys)} LIMIT ?"
+        rows = self._execute_query(query, tuple(params) + (limit + 1,), fetch_all=True) or []
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        names = [key.split('.')[-1] for key in keys]
+        first = tuple(rows[0][name] for name in names) if rows else None
+        last = tuple(rows[-1][name] for name in names) if rows else None
+        has_prev, has_next = (has_more, cursor is not None) if backward else (cursor is not None, has_more)
+        return {
+            'items': rows,
+            'prev': first if has_prev else None,
+            'next': last if has_next else None,
+        }
+
+    def get_users_page(self, cursor: Optional[Tuple[str, int]] = None, backward: bool = False,
+                       limit: int = 10) -> Dict:
+        """Страница пользователей с бронированиями, курсор — (created_at, id)"""
+        query = '''
+            SELECT u.*,
+                   (SELECT COUNT(*) FROM bookings b WHERE b.user_id = u.id) as booking_count,
+                   (SELECT GROUP_CONCAT(DISTINCT r.name) FROM bookings b
+                    JOIN rooms r ON b.room_id = r.id WHERE b.user_id = u.id) as booked_rooms
+            FROM users u
+            WHERE EXISTS (SELECT 1 FROM bookings b WHERE b.user_id = u.id)
+        '''
+        return self._keyset_page(query, ('u.created_at', 'u.id'), cursor=cursor, backward=backward, limit=limit)
+
+    def get_user_ids_after(self, after_id: int = 0, limit: int = 500) -> List[int]:
+        """ID пользователей больше after_id по возрастанию (порция для рассылки)"""
+        rows = self._execute_query(
+            "SELECT id FROM users WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit), fetch_all=True
+        )
+        return [row['id'] for row in rows or []]
+
+    def get_bookings_page(self, cursor: Optional[Tuple[int, int]] = None, backward: bool = False,
+                          limit: int = 10) -> Dict:
+        """Страница бронирований (поздние первыми), курсор — (start_min, id)"""
+        query = '''
+            SELECT b.*, r.name as room_name, r.room_number, u.first_name, u.last_name
+            FROM bookings b
+            JOIN rooms r ON b.room_id = r.id
+            LEFT JOIN users u ON b.user_id = u.id
+            WHERE 1 = 1
+        '''
+        page = self._keyset_page(query, ('b.start_min', 'b.id'), cursor=cursor, backward=backward, limit=limit)
+        page['items'] = [_booking_from_row(b) for b in page['items']]
+        return page
+
     def get_user_contact_info(self, user_id: int) -> Optional[Dict]:
         """Получить контактную информацию пользователя"""
         query = '''
             SELECT u.*, 
                    COUNT(b.id) as booking_count,
                    GROUP_CONCAT(DISTINCT r.name) as booked_rooms,
-                   GROUP_CONCAT(DISTINCT b.start_time) as booking_times
+                   GROUP_CONCAT(DISTINCT b.start_min) as booking_times
             FROM users u
             LEFT JOIN bookings b ON u.id = b.user_id
             LEFT JOIN rooms r ON b.room_id = r.id
             WHERE u.id = ?
             GROUP BY u.id
         '''
-        return self._execute_query(query, (user_id,), fetch_one=True)
+        info = self._execute_query(query, (user_id,), fetch_one=True)
+        if info and info.get('booking_times'):
+            info['booking_times'] = sorted(
+                from_epoch_minutes(int(value)) for value in str(info['booking_times']).split(',')
+            )
+        return info
     
     # Методы для работы с бронированиями
     def create_booking(self, user, room_id: int, full_name: str, 
@@ -289,24 +1018,40 @@ class DatabaseManager:
 
             query = '''
                 INSERT INTO bookings (
-                    user_id, room_id, full_name, purpose, start_time, end_time, status,
-                    recurrence_type, recurrence_until, recurrence_group
+                    user_id, room_id, full_name, purpose, start_min, end_min, status,
+                    recurrence_type, recurrence_until_min, recurrence_group
                 )
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             '''
             
-            booking_id = self._execute_query(query, (
-                db_user['id'],
-                room_id,
-                full_name,
-                purpose,
-                start_time.isoformat(),
-                end_time.isoformat(),
-                'confirmed',
-                recurrence_type,
-                recurrence_until.isoformat() if recurrence_until else None,
-                recurrence_group
-            ))
+            start_min, end_min = to_epoch_minutes(start_time), to_epoch_minutes(end_time)
+            with self._pool.writer() as conn:
+                # Проверяем под блокировкой записи, как book_slot: закрытие или правило,
+                # добавленные параллельно, не проскочат между проверкой и вставкой
+                if self.blackouts.is_closed(room_id, start_min, end_min):
+                    print(f"❌ Аудитория с ID {room_id} закрыта в это время")
+                    return {}
+                # Пересечения с обычными бронями отсекает триггер, с вхождениями правил — эта проверка
+                if self.recurrences.conflicts(room_id, start_time, end_time):
+                    print(f"❌ Аудитория с ID {room_id} занята повторяющимся бронированием")
+                    return {}
+                booking_id = conn.execute(query, (
+                    db_user['id'],
+                    room_id,
+                    full_name,
+                    purpose,
+                    start_min,
+                    end_min,
+                    'confirmed',
+                    recurrence_type,
+                    to_epoch_minutes(recurrence_until) if recurrence_until else None,
+                    recurrence_group
+                )).lastrowid
+                self._pool.after_commit(
+                    lambda: self.availability.add(booking_id, room_id, start_min, end_min)
+                )
+                self._pool.after_commit(lambda: self.occupancy.invalidate(room_id, start_time.date()))
+                self._pool.after_commit(lambda: self._bookings_changed(start_min))
             
             if booking_id:
                 print(f"✅ Бронирование создано с ID: {booking_id}")
@@ -318,6 +1063,264 @@ class DatabaseManager:
             print(f"❌ Ошибка при создании бронирования: {e}")
             return {}
     
+    def book_slot(self, user, room_id: int, full_name: str, purpose: str,
+                  start_time: datetime, end_time: datetime) -> Dict:
+        """Атомарно проверить пересечения и создать бронирование.
+
+        Проверка и вставка выполняются в одной транзакции BEGIN IMMEDIATE.
+        Возвращает словарь со статусом:
+        {'status': 'created', 'booking': {...}}
+        {'status': 'conflict', 'conflicts': [{'id', 'start_time', 'end_time', 'full_name'}, ...]}
+        (start_time/end_time в конфликтах — datetime)
+        {'status': 'closed', 'blackouts': [{'id', 'room_id', 'room_name', 'start_time', 'end_time', 'reason'}, ...]}
+        {'status': 'error', 'error': '...'}
+        """
+        db_user = self.get_or_create_user(user)
+        if not db_user:
+            return {'status': 'error', 'error': 'user_not_found'}
+        if not self.get_room_by_id(room_id):
+            return {'status': 'error', 'error': 'room_not_found'}
+
+        start_min, end_min = to_epoch_minutes(start_time), to_epoch_minutes(end_time)
+        blackouts = self.blackouts.overlapping(room_id, start_min, end_min)
+        if blackouts:
+            return {'status': 'closed', 'blackouts': [self._blackout_with_room(b) for b in blackouts]}
+        try:
+            with self._pool.writer() as conn:
+                conflicts = conn.execute('''
+                    SELECT id, start_min, end_min, full_name FROM bookings
+                    WHERE room_id = ? AND status = 'confirmed'
+                    AND end_min > ? AND start_min < ?
+                    ORDER BY start_min
+                ''', (room_id, start_min, end_min)).fetchall()
+                conflicts = [_booking_from_row(row) for row in conflicts]
+                conflicts += [
+                    {'id': _occurrence_key(rule.id, start), 'start_time': start, 'end_time': end,
+                     'full_name': rule.full_name}
+                    for rule, start, end in self.recurrences.conflicts(room_id, start_time, end_time)
+                ]
+                if conflicts:
+                    conflicts.sort(key=lambda c: c['start_time'])
+                    return {'status': 'conflict', 'conflicts': conflicts}
+
+                cursor = conn.execute('''
+                    INSERT INTO bookings (user_id, room_id, full_name, purpose, start_min, end_min, status)
+                    VALUES (?, ?, ?, ?, ?, ?, 'confirmed')
+                ''', (db_user['id'], room_id, full_name, purpose, start_min, end_min))
+                booking_id = cursor.lastrowid
+                self._pool.after_commit(
+                    lambda: self.availability.add(booking_id, room_id, start_min, end_min)
+                )
+                self._pool.after_commit(lambda: self.occupancy.invalidate(room_id, start_time.date()))
+                self._pool.after_commit(lambda: self._bookings_changed(start_min))
+        except sqlite3.IntegrityError as e:
+            # Сработал триггер trg_bookings_no_overlap (запись из другого процесса)
+            if 'booking_overlap' in str(e):
+                return {'status': 'conflict', 'conflicts': []}
+            print(f"❌ Ошибка при создании бронирования: {e}")
+            return {'status': 'error', 'error': str(e)}
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка при создании бронирования: {e}")
+            return {'status': 'error', 'error': str(e)}
+
+        return {'status': 'created', 'booking': self.get_booking_by_id(booking_id)}
+
+    def create_recurring_booking(self, user, room_id: int, full_name: str, purpose: str,
+                                 start_time: datetime, end_time: datetime, freq: str,
+                                 until: Optional[date] = None, count: Optional[int] = None) -> Dict:
+        """Создать повторяющееся бронирование одной строкой-правилом.
+
+        Вхождения (до until/count, у бессрочного правила — в пределах окна
+        бронирования) проверяются на пересечения с бронированиями, другими
+        правилами и закрытиями; такие даты сохраняются как исключения правила.
+        Бессрочное правило дальше окна сверяется целиком с бронированиями,
+        закрытиями и правилами (см. _rule_conflicts_after); если оно совпадет
+        с другим бессрочным правилом, то заканчивается накануне совпадения.
+        Возвращает {'rule_id': id или None, 'created': [date, ...],
+        'skipped': [date, ...], 'until': date или None}.
+        """
+        result = {'rule_id': None, 'created': [], 'skipped': [], 'until': until}
+        if freq not in FREQUENCIES or end_time <= start_time:
+            return result
+        db_user = self.get_or_create_user(user)
+        if not db_user:
+            print("❌ Не удалось получить/создать пользователя")
+            return result
+        if not self.get_room_by_id(room_id):
+            print(f"❌ Аудитория с ID {room_id} не найдена")
+            return result
+
+        duration = int((end_time - start_time).total_seconds()) // 60
+        rule = RecurrenceRule(
+            None, room_id, db_user['id'], start_time, duration, freq,
+            until=until, count=count, full_name=full_name, purpose=purpose
+        )
+        horizon = start_time.date() + timedelta(days=config.AVAILABILITY_WINDOW_DAYS)
+        days = rule.dates_between(start_time.date(), until or (date.max if count else horizon))
+        if not days:
+            return result
+        occurrences = [rule.occurrence(day) for day in days]
+        occurrences_min = [(to_epoch_minutes(start), to_epoch_minutes(end)) for start, end in occurrences]
+
+        # Если все вхождения попадают в окно индекса занятости, проверяем по нему без SQL
+        use_index = self.availability.covers(occurrences_min[0][0], occurrences_min[-1][1])
+        try:
+            with self._pool.writer() as conn:
+                if use_index:
+                    free = self.availability.are_free(room_id, occurrences_min)
+                else:
+                    busy = conn.execute('''
+                        SELECT start_min, end_min FROM bookings
+                        WHERE room_id = ? AND status = 'confirmed'
+                        AND end_min > ? AND start_min < ?
+                        ORDER BY start_min
+                    ''', (room_id, occurrences_min[0][0], occurrences_min[-1][1])).fetchall()
+                    busy_starts = [start for start, _ in busy]
+                    max_duration = max((end - start for start, end in busy), default=0)
+                    free = []
+                    for start, end in occurrences_min:
+                        # Пересечься могут только брони, начавшиеся не раньше start - max_duration
+                        lo = bisect.bisect_left(busy_starts, start - max_duration)
+                        hi = bisect.bisect_left(busy_starts, end)
+                        free.append(not any(busy_end > start for _, busy_end in busy[lo:hi]))
+
+                for day, (start, end), (start_min, end_min), is_free in zip(days, occurrences, occurrences_min, free):
+                    if (is_free is False or self.recurrences.conflicts(room_id, start, end)
+                            or self.blackouts.is_closed(room_id, start_min, end_min)):
+                        result['skipped'].append(day)
+                    else:
+                        result['created'].append(day)
+                if not result['created']:
+                    return result
+                if until is None and count is None:
+                    busy, stop = self._rule_conflicts_after(conn, rule, horizon)
+                    result['skipped'].extend(busy)
+                    if stop:
+                        rule.until = result['until'] = stop - timedelta(days=1)
+
+                rule.id = conn.execute('''
+                    INSERT INTO booking_rules (
+                        user_id, room_id, full_name, purpose, start_min, duration_min,
+                        freq, until_min, count, status
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'confirmed')
+                ''', (
+                    db_user['id'], room_id, full_name, purpose, to_epoch_minutes(start_time), duration,
+                    freq, to_epoch_minutes(datetime.combine(rule.until, time.min)) if rule.until else None, count
+                )).lastrowid
+                conn.executemany(
+                    "INSERT INTO booking_rule_exceptions (rule_id, start_min) VALUES (?, ?)",
+                    [(rule.id, to_epoch_minutes(rule.occurrence(day)[0])) for day in result['skipped']]
+                )
+                rule.exceptions.update(result['skipped'])
+                self._pool.after_commit(lambda: self.recurrences.add(rule))
+                # Правило затрагивает много месяцев: сбрасываем отметки целиком
+                self._pool.after_commit(self.occupancy.clear)
+                self._pool.after_commit(self._bookings_changed)
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка при создании повторяющегося бронирования: {e}")
+            return {'rule_id': None, 'created': [], 'skipped': days, 'until': until}
+
+        result['rule_id'] = rule.id
+        print(f"✅ Создано повторяющееся бронирование {rule.id}: вхождений {len(result['created'])}, "
+              f"пропущено {len(result['skipped'])}")
+        return result
+
+    def create_booking_series(self, user, room_id: int, full_name: str, purpose: str,
+                              occurrences: List[Tuple[datetime, datetime]],
+                              recurrence_type: str, recurrence_until: Optional[datetime] = None,
+                              recurrence_group: Optional[str] = None) -> Dict:
+        """Создать серию повторяющихся бронирований (прежний интерфейс).
+
+        Серия хранится одним правилом: первое вхождение и recurrence_type
+        задают правило, recurrence_until (или дата последнего вхождения) —
+        его срок, см. create_recurring_booking. Вхождения должны идти по
+        шагу recurrence_type; recurrence_group больше не используется.
+        Возвращает {'rule_id': id или None, 'created': [date, ...], 'skipped': [date, ...]}.
+        """
+        if not occurrences:
+            return {'rule_id': None, 'created': [], 'skipped': []}
+        start_time, end_time = min(occurrences)
+        until = recurrence_until.date() if recurrence_until else max(occurrences)[0].date()
+        result = self.create_recurring_booking(
+            user, room_id, full_name, purpose, start_time, end_time, recurrence_type, until=until
+        )
+        return {'rule_id': result['rule_id'], 'created': result['created'], 'skipped': result['skipped']}
+
+    def _rule_conflicts_after(self, conn, rule: RecurrenceRule, horizon: date) -> Tuple[List[date], Optional[date]]:
+        """Пересечения бессрочного правила после horizon, где вхождения не развертываются.
+
+        Каждое бронирование и закрытие аудитории после horizon сверяется
+        с правилом напрямую, правило с конечным сроком — по датам до его
+        конца. Возвращает (даты занятых вхождений, дата первого совпадения
+        с другим бессрочным правилом или None): такие совпадения
+        повторяются бесконечно, и исключениями их не описать.
+        """
+        since = horizon + timedelta(days=1)
+        since_min = to_epoch_minutes(datetime.combine(since, time.min))
+        intervals = [tuple(row) for row in conn.execute('''
+            SELECT start_min, end_min FROM bookings
+            WHERE room_id = ? AND status = 'confirmed' AND end_min > ?
+        ''', (rule.room_id, since_min)).fetchall()]
+        intervals += [
+            (blackout['start_min'], blackout['end_min'])
+            for blackout in self.blackouts.all(since_min)
+            if blackout['room_id'] in (None, rule.room_id)
+        ]
+        busy = set()
+        for start_min, end_min in intervals:
+            # Вхождение, начавшееся накануне, тоже может задеть интервал
+            first = max(since, from_epoch_minutes(start_min - rule.duration).date())
+            for day in rule.dates_between(first, from_epoch_minutes(end_min).date()):
+                start, end = rule.occurrence(day)
+                if to_epoch_minutes(start) < end_min and to_epoch_minutes(end) > start_min:
+                    busy.add(day)
+
+        stop = None
+        for other in self.recurrences.rules():
+            if other.room_id != rule.room_id:
+                continue
+            last = other.last_date()
+            if last is not None:
+                busy.update(rule.collisions(other, since, last))
+                continue
+            found = rule.collisions(other, since, since + timedelta(days=CALENDAR_CYCLE_DAYS), limit=1)
+            if found and (stop is None or found[0] < stop):
+                stop = found[0]
+        return sorted(day for day in busy if stop is None or day < stop), stop
+
+    def cancel_occurrence(self, rule_id: int, start_min: int) -> bool:
+        """Отменить одно вхождение повторяющегося бронирования"""
+        try:
+            with self._pool.writer() as conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO booking_rule_exceptions (rule_id, start_min) VALUES (?, ?)",
+                    (rule_id, start_min)
+                )
+                day = from_epoch_minutes(start_min).date()
+                rule = self.recurrences.get(rule_id)
+                self._pool.after_commit(lambda: self.recurrences.add_exception(rule_id, day))
+                if rule:
+                    self._pool.after_commit(lambda: self.occupancy.invalidate(rule.room_id, day))
+                self._pool.after_commit(lambda: self._bookings_changed(start_min))
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка выполнения запроса: {e}")
+            return False
+
+    def cancel_recurrence(self, rule_id: int) -> bool:
+        """Отменить повторяющееся бронирование целиком"""
+        try:
+            with self._pool.writer() as conn:
+                conn.execute("UPDATE booking_rules SET status = 'cancelled' WHERE id = ?", (rule_id,))
+                self._pool.after_commit(lambda: self.recurrences.remove(rule_id))
+                self._pool.after_commit(self.occupancy.clear)
+                self._pool.after_commit(self._bookings_changed)
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка выполнения запроса: {e}")
+            return False
+
     def get_booking_by_id(self, booking_id: int) -> Optional[Dict]:
         """Получить бронирование по ID"""
         query = '''
@@ -327,7 +1330,8 @@ class DatabaseManager:
             JOIN users u ON b.user_id = u.id
             WHERE b.id = ?
         '''
-        return self._execute_query(query, (booking_id,), fetch_one=True)
+        booking = self._execute_query(query, (booking_id,), fetch_one=True)
+        return _booking_from_row(booking) if booking else None
     
     def get_user_bookings(self, telegram_id: int) -> List[Dict]:
         """Получить бронирования пользователя (только предстоящие)"""
@@ -335,45 +1339,335 @@ class DatabaseManager:
         if not user:
             return []
         
-        now = datetime.now().isoformat()
+        now = to_epoch_minutes(datetime.now())
         query = '''
             SELECT b.*, r.name as room_name, r.room_number
             FROM bookings b
             JOIN rooms r ON b.room_id = r.id
-            WHERE b.user_id = ? AND b.start_time >= ? AND b.status = 'confirmed'
-            ORDER BY b.start_time
+            WHERE b.user_id = ? AND b.start_min >= ? AND b.status = 'confirmed'
+            ORDER BY b.start_min
         '''
-        return self._execute_query(query, (user['id'], now), fetch_all=True)
+        bookings = self._execute_query(query, (user['id'], now), fetch_all=True)
+        bookings = [_booking_from_row(b) for b in bookings] if bookings else []
+
+        # Вхождения правил разворачиваем только на окно бронирования вперед
+        now_dt = datetime.now()
+        horizon = now_dt.date() + timedelta(days=config.AVAILABILITY_WINDOW_DAYS)
+        for rule in self.recurrences.rules(user['id']):
+            room = self.rooms.get(rule.room_id)
+            if not room:
+                continue
+            for day in rule.dates_between(now_dt.date(), horizon):
+                start, end = rule.occurrence(day)
+                if start < now_dt:
+                    continue
+                booking = self._occurrence_booking(rule, start, end)
+                booking['room_name'] = room['name']
+                booking['room_number'] = room['room_number']
+                bookings.append(booking)
+        bookings.sort(key=lambda b: b['start_time'])
+        return bookings
     
     def get_room_bookings_by_date(self, room_id: int, booking_date: date) -> List[Dict]:
         """Получить все бронирования аудитории на определенную дату"""
-        start_of_day = datetime.combine(booking_date, time.min).isoformat()
-        end_of_day = datetime.combine(booking_date, time.max).isoformat()
+        start_of_day = to_epoch_minutes(datetime.combine(booking_date, time.min))
+        end_of_day = to_epoch_minutes(datetime.combine(booking_date + timedelta(days=1), time.min))
         
         query = '''
             SELECT b.*, u.first_name, u.last_name
             FROM bookings b
             JOIN users u ON b.user_id = u.id
-            WHERE b.room_id = ? AND b.start_time >= ? AND b.start_time <= ? AND b.status = 'confirmed'
-            ORDER BY b.start_time
+            WHERE b.room_id = ? AND b.start_min >= ? AND b.start_min < ? AND b.status = 'confirmed'
+            ORDER BY b.start_min
         '''
-        return self._execute_query(query, (room_id, start_of_day, end_of_day), fetch_all=True)
+        bookings = self._execute_query(query, (room_id, start_of_day, end_of_day), fetch_all=True)
+        bookings = [_booking_from_row(b) for b in bookings] if bookings else []
+        occurrences = self._day_occurrences(booking_date, room_id)
+        users = self.get_users_by_ids(booking['user_id'] for booking in occurrences)
+        for booking in occurrences:
+            user = users.get(booking['user_id'], {})
+            booking['first_name'] = user.get('first_name')
+            booking['last_name'] = user.get('last_name')
+            bookings.append(booking)
+        bookings.sort(key=lambda b: b['start_time'])
+        return bookings
     
+    def _load_booking_intervals(self, start_min: int, end_min: int) -> List[Dict]:
+        """Интервалы подтвержденных бронирований для индекса занятости"""
+        query = '''
+            SELECT id, room_id, start_min, end_min FROM bookings
+            WHERE status = 'confirmed' AND end_min > ? AND start_min < ?
+        '''
+        return self._execute_query(query, (start_min, end_min), fetch_all=True)
+
     def check_room_availability(self, room_id: int, start_time: datetime, end_time: datetime) -> bool:
         """Проверить доступность аудитории в указанное время"""
+        if self.blackouts.is_closed(room_id, to_epoch_minutes(start_time), to_epoch_minutes(end_time)):
+            return False
+        if self.recurrences.conflicts(room_id, start_time, end_time):
+            return False
+        is_free = self.availability.is_free(room_id, to_epoch_minutes(start_time), to_epoch_minutes(end_time))
+        if is_free is not None:
+            return is_free
+        
         query = '''
             SELECT COUNT(*) FROM bookings 
             WHERE room_id = ? AND status = 'confirmed' 
-            AND NOT (end_time <= ? OR start_time >= ?)
+            AND end_min > ? AND start_min < ?
         '''
         
         result = self._execute_query(query, (
             room_id, 
-            start_time.isoformat(), end_time.isoformat()
+            to_epoch_minutes(start_time), to_epoch_minutes(end_time)
         ), fetch_one=True)
         
         return result['COUNT(*)'] == 0 if result else True
     
+    def check_room_availability_many(self, room_id: int,
+                                     slots: List[Tuple[datetime, datetime]]) -> List[bool]:
+        """Проверить доступность аудитории сразу для списка интервалов"""
+        slots_min = [(to_epoch_minutes(start), to_epoch_minutes(end)) for start, end in slots]
+        result = self.availability.are_free(room_id, slots_min)
+        return [
+            is_free and not self.recurrences.conflicts(room_id, start, end)
+            and not self.blackouts.is_closed(room_id, start_min, end_min)
+            if is_free is not None else self.check_room_availability(room_id, start, end)
+            for is_free, (start, end), (start_min, end_min) in zip(result, slots, slots_min)
+        ]
+    
+    def _load_month_occupancy(self, room_id: Optional[int], year: int,
+                              month: int) -> Dict[Tuple[int, int], Dict[date, str]]:
+        """Отметки занятости за месяц и соседние месяцы одним GROUP BY.
+
+        День занят полностью ('full'), если суммарная длительность броней
+        не меньше рабочего дня (для здания — рабочего дня всех аудиторий).
+        Закрытия учитываются как занятость, а день, рабочее время которого
+        закрыто целиком, отмечается как 'closed'.
+        """
+        months = [divmod(year * 12 + month - 1 + shift, 12) for shift in (-1, 0, 1)]
+        months = [(y, m + 1) for y, m in months]
+        first_day = date(*months[0], 1)
+        last_day = date(*months[-1], cal.monthrange(*months[-1])[1])
+
+        query = '''
+            SELECT date(start_min * 60, 'unixepoch', 'localtime') AS day, SUM(end_min - start_min) AS busy
+            FROM bookings
+            WHERE status = 'confirmed' AND start_min >= ? AND start_min < ?
+        '''
+        params = [
+            to_epoch_minutes(datetime.combine(first_day, time.min)),
+            to_epoch_minutes(datetime.combine(last_day + timedelta(days=1), time.min)),
+        ]
+        if room_id is not None:
+            query += " AND room_id = ?"
+            params.append(room_id)
+        query += " GROUP BY day"
+        busy = {
+            date.fromisoformat(row['day']): row['busy']
+            for row in self._execute_query(query, tuple(params), fetch_all=True) or []
+        }
+
+        rooms_count = 1 if room_id is not None else max(1, len(self.rooms.all()))
+        workday_start = time.fromisoformat(config.WORKDAY_START)
+        workday_end = time.fromisoformat(config.WORKDAY_END)
+        closed = set()
+        day = first_day
+        while day <= last_day:
+            # Вхождения повторяющихся бронирований
+            for rule, start, end in self.recurrences.day(day):
+                if room_id is None or rule.room_id == room_id:
+                    busy[day] = busy.get(day, 0) + rule.duration
+            # Закрытия в рабочее время; закрытие здания занимает все аудитории
+            day_start = to_epoch_minutes(datetime.combine(day, workday_start))
+            day_end = to_epoch_minutes(datetime.combine(day, workday_end))
+            if self.blackouts.covers(room_id, day_start, day_end):
+                closed.add(day)
+            for blackout in self.blackouts.overlapping(room_id, day_start, day_end):
+                minutes = min(blackout['end_min'], day_end) - max(blackout['start_min'], day_start)
+                busy[day] = busy.get(day, 0) + minutes * (rooms_count if blackout['room_id'] is None else 1)
+            day += timedelta(days=1)
+
+        workday = (
+            datetime.combine(first_day, workday_end) - datetime.combine(first_day, workday_start)
+        ).seconds // 60
+        capacity = workday * rooms_count
+        result = {key: {} for key in months}
+        for day, minutes in busy.items():
+            if minutes > 0:
+                result[(day.year, day.month)][day] = 'full' if minutes >= capacity else 'partial'
+        for day in closed:
+            result[(day.year, day.month)][day] = 'closed'
+        return result
+
+    def get_month_occupancy(self, year: int, month: int, room_id: Optional[int] = None) -> Dict[date, str]:
+        """Отметки занятости дней месяца для календаря: {date: 'full'|'partial'|'closed'}"""
+        return self.occupancy.get(room_id, year, month)
+
+    def get_occupancy_cache_stats(self) -> Dict:
+        """Статистика кэша отметок занятости календаря"""
+        return self.occupancy.stats()
+
+    def find_free_rooms(self, day: date, duration_minutes: int, min_capacity: Optional[int] = None,
+                        not_before: Optional[time] = None) -> List[Dict]:
+        """Найти все аудитории и время начала, когда они свободны нужное время.
+
+        Занятость каждой аудитории за рабочий день строится как битовая карта
+        с шагом SEARCH_STEP_MINUTES; подходящие начала ищутся битовыми сдвигами.
+        Возвращает [{'room': {...}, 'windows': [(начало, конец), ...],
+        'first_start': datetime}, ...] — окна, в которые помещается бронь.
+        """
+        step = config.SEARCH_STEP_MINUTES
+        day_start = to_epoch_minutes(datetime.combine(day, time.fromisoformat(config.WORKDAY_START)))
+        day_end = to_epoch_minutes(datetime.combine(day, time.fromisoformat(config.WORKDAY_END)))
+        slots = (day_end - day_start) // step
+        length = -(-duration_minutes // step)
+        if duration_minutes <= 0 or length > slots:
+            return []
+
+        # Начала раньше now/not_before отсекаем маской
+        earliest = day_start
+        if not_before:
+            earliest = max(earliest, to_epoch_minutes(datetime.combine(day, not_before)))
+        earliest = max(earliest, to_epoch_minutes(datetime.now()))
+        first_slot = max(0, -(-(earliest - day_start) // step))
+        allowed = ((1 << slots) - 1) & ~((1 << first_slot) - 1)
+
+        busy_by_room = self.availability.day_intervals(day_start, day_end)
+        if busy_by_room is None:
+            busy_by_room = {}
+            rows = self._execute_query('''
+                SELECT room_id, start_min, end_min FROM bookings
+                WHERE status = 'confirmed' AND end_min > ? AND start_min < ?
+            ''', (day_start, day_end), fetch_all=True)
+            for row in rows or []:
+                busy_by_room.setdefault(row['room_id'], []).append((row['start_min'], row['end_min']))
+        for rule, start, end in self.recurrences.day(day):
+            busy_by_room.setdefault(rule.room_id, []).append((to_epoch_minutes(start), to_epoch_minutes(end)))
+
+        results = []
+        for room in self.rooms.all():
+            if min_capacity and (room.get('capacity') or 0) < min_capacity:
+                continue
+            intervals = list(busy_by_room.get(room['id'], ()))
+            intervals += [
+                (b['start_min'], b['end_min']) for b in self.blackouts.overlapping(room['id'], day_start, day_end)
+            ]
+            busy = occupancy_bitmap(intervals, day_start, step, slots)
+            starts = free_run_starts(busy, slots, length) & allowed
+            if not starts:
+                continue
+            windows = [
+                (from_epoch_minutes(day_start + first * step),
+                 from_epoch_minutes(day_start + (last + length) * step))
+                for first, last in bit_runs(starts)
+            ]
+            results.append({'room': room, 'windows': windows, 'first_start': windows[0][0]})
+        return results
+
+    # --- ЗАКРЫТИЯ ЗДАНИЯ И АУДИТОРИЙ ---
+
+    def _load_blackouts(self) -> List[Dict]:
+        """Все закрытия для набора в памяти"""
+        query = "SELECT id, room_id, start_min, end_min, reason FROM blackouts"
+        return self._execute_query(query, fetch_all=True)
+
+    def _blackout_with_room(self, blackout: Dict) -> Dict:
+        """Закрытие с datetime вместо минут и названием аудитории"""
+        blackout = _booking_from_row(blackout)
+        room = self.rooms.get(blackout['room_id']) if blackout['room_id'] is not None else None
+        blackout['room_name'] = room['name'] if room else None
+        return blackout
+
+    def add_blackout(self, start_time: datetime, end_time: datetime,
+                     room_id: Optional[int] = None, reason: str = '') -> Dict:
+        """Закрыть здание (room_id=None) или аудиторию на период [start_time, end_time).
+
+        Существующие брони не удаляются: их число возвращается в
+        'affected_bookings', чтобы администратор мог связаться с авторами.
+        """
+        if end_time <= start_time:
+            return {}
+        if room_id is not None and not self.get_room_by_id(room_id):
+            print(f"❌ Аудитория с ID {room_id} не найдена")
+            return {}
+        start_min, end_min = to_epoch_minutes(start_time), to_epoch_minutes(end_time)
+        try:
+            with self._pool.writer() as conn:
+                blackout_id = conn.execute(
+                    "INSERT INTO blackouts (room_id, start_min, end_min, reason) VALUES (?, ?, ?, ?)",
+                    (room_id, start_min, end_min, reason)
+                ).lastrowid
+                affected = conn.execute('''
+                    SELECT COUNT(*) FROM bookings
+                    WHERE status = 'confirmed' AND end_min > ? AND start_min < ?
+                    AND (? IS NULL OR room_id = ?)
+                ''', (start_min, end_min, room_id, room_id)).fetchone()[0]
+                blackout = {
+                    'id': blackout_id, 'room_id': room_id,
+                    'start_min': start_min, 'end_min': end_min, 'reason': reason,
+                }
+                self._pool.after_commit(lambda: self.blackouts.add(blackout))
+                self._pool.after_commit(self.occupancy.clear)
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка при добавлении закрытия: {e}")
+            return {}
+        print(f"✅ Добавлено закрытие {blackout_id}")
+        result = self._blackout_with_room(blackout)
+        result['affected_bookings'] = affected
+        return result
+
+    def delete_blackout(self, blackout_id: int) -> bool:
+        """Удалить закрытие"""
+        try:
+            with self._pool.writer() as conn:
+                conn.execute("DELETE FROM blackouts WHERE id = ?", (blackout_id,))
+                self._pool.after_commit(lambda: self.blackouts.remove(blackout_id))
+                self._pool.after_commit(self.occupancy.clear)
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка выполнения запроса: {e}")
+            return False
+
+    def get_blackouts(self, since: Optional[datetime] = None) -> List[Dict]:
+        """Закрытия, которые еще не закончились (или заканчиваются после since)"""
+        since_min = to_epoch_minutes(since or datetime.now())
+        return [self._blackout_with_room(b) for b in self.blackouts.all(since_min)]
+
+    def get_room_blackouts(self, room_id: Optional[int], start_time: datetime,
+                           end_time: datetime) -> List[Dict]:
+        """Закрытия здания и аудитории, пересекающиеся с интервалом"""
+        return [
+            self._blackout_with_room(b)
+            for b in self.blackouts.overlapping(room_id, to_epoch_minutes(start_time), to_epoch_minutes(end_time))
+        ]
+
+    def get_closed_dates(self, room_id: Optional[int] = None, first: Optional[date] = None,
+                         last: Optional[date] = None) -> frozenset:
+        """Дни, рабочее время которых закрыто целиком (по умолчанию — с сегодняшнего
+        дня до конца следующего года, как в календаре бронирования)"""
+        first = first or date.today()
+        last = last or date(first.year + 1, 12, 31)
+        workday_start = time.fromisoformat(config.WORKDAY_START)
+        workday_end = time.fromisoformat(config.WORKDAY_END)
+        closed = set()
+        # Перебираем только дни внутри закрытий, а не весь диапазон
+        for blackout in self.blackouts.overlapping(
+            room_id,
+            to_epoch_minutes(datetime.combine(first, time.min)),
+            to_epoch_minutes(datetime.combine(last + timedelta(days=1), time.min))
+        ):
+            day = max(first, from_epoch_minutes(blackout['start_min']).date())
+            end_day = min(last, from_epoch_minutes(blackout['end_min']).date())
+            while day <= end_day:
+                if day not in closed and self.blackouts.covers(
+                    room_id,
+                    to_epoch_minutes(datetime.combine(day, workday_start)),
+                    to_epoch_minutes(datetime.combine(day, workday_end))
+                ):
+                    closed.add(day)
+                day += timedelta(days=1)
+        return frozenset(closed)
+
     def get_all_bookings(self) -> List[Dict]:
         """Получить все бронирования (для админов)"""
         query = '''
@@ -383,19 +1677,61 @@ class DatabaseManager:
             JOIN users u ON b.user_id = u.id
             ORDER BY b.created_at DESC
         '''
-        return self._execute_query(query, fetch_all=True)
+        bookings = self._execute_query(query, fetch_all=True)
+        return [_booking_from_row(b) for b in bookings] if bookings else []
     
     def update_booking_status(self, booking_id: int, status: str) -> Dict:
         """Обновить статус бронирования"""
         query = "UPDATE bookings SET status = ? WHERE id = ?"
-        if self._execute_query(query, (status, booking_id)) is not False:
-            return self.get_booking_by_id(booking_id)
-        return {}
+        try:
+            with self._pool.writer() as conn:
+                row = conn.execute(
+                    "SELECT room_id, start_min, end_min FROM bookings WHERE id = ?", (booking_id,)
+                ).fetchone()
+                if row and status == 'confirmed' and self.recurrences.conflicts(
+                    row['room_id'], from_epoch_minutes(row['start_min']), from_epoch_minutes(row['end_min'])
+                ):
+                    print(f"❌ Бронирование {booking_id} пересекается с повторяющимся бронированием")
+                    return {}
+                # Пересечение с обычной бронью отклоняет триггер trg_bookings_no_overlap_update
+                conn.execute(query, (status, booking_id))
+
+                def reindex():
+                    self.availability.remove(booking_id)
+                    if row and status == 'confirmed':
+                        self.availability.add(booking_id, row['room_id'], row['start_min'], row['end_min'])
+                    if row:
+                        self.occupancy.invalidate(row['room_id'], from_epoch_minutes(row['start_min']).date())
+                        self._bookings_changed(row['start_min'])
+                self._pool.after_commit(reindex)
+        except sqlite3.Error as e:
+            print(f"Ошибка выполнения запроса: {e}")
+            return {}
+        return self.get_booking_by_id(booking_id)
 
-    def delete_booking(self, booking_id: int) -> bool:
-        """Удалить бронирование"""
+    def delete_booking(self, booking_id) -> bool:
+        """Удалить бронирование (или одно вхождение правила по ключу r<rule_id>_<минуты>)"""
+        if isinstance(booking_id, str) and booking_id.startswith('r'):
+            rule_id, start_min = booking_id[1:].split('_')
+            return self.cancel_occurrence(int(rule_id), int(start_min))
         query = "DELETE FROM bookings WHERE id = ?"
-        return self._execute_query(query, (booking_id,))
+        try:
+            with self._pool.writer() as conn:
+                row = conn.execute(
+                    "SELECT room_id, start_min FROM bookings WHERE id = ?", (booking_id,)
+                ).fetchone()
+                conn.execute(query, (booking_id,))
+
+                def unindex():
+                    self.availability.remove(booking_id)
+                    if row:
+                        self.occupancy.invalidate(row['room_id'], from_epoch_minutes(row['start_min']).date())
+                        self._bookings_changed(row['start_min'])
+                self._pool.after_commit(unindex)
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка выполнения запроса: {e}")
+            return False
 
     def update_room(self, room_id: int, **kwargs) -> bool:
         """Обновить данные аудитории"""
@@ -417,7 +1753,9 @@ class DatabaseManager:
         values.append(room_id)
         query = f"UPDATE rooms SET {', '.join(set_clauses)} WHERE id = ?"
         
-        return self._execute_query(query, tuple(values))
+        success = self._execute_query(query, tuple(values)) is not False
+        self.rooms.reload()
+        return success
     
     def create_room(self, room_number: str, name: str, floor: int, capacity: int = None, 
                    equipment: str = None, description: str = None) -> bool:
@@ -436,6 +1774,7 @@ class DatabaseManager:
                 equipment or '',
                 description or ''
             ))
+            self.rooms.reload()
             return room_id is not False
         except Exception as e:
             print(f"❌ Ошибка при создании аудитории: {e}")
@@ -447,18 +1786,166 @@ class DatabaseManager:
             return False
         try:
             query = f"UPDATE rooms SET {field} = ? WHERE id = ?"
-            self._execute_query(query, (value, room_id))
-            return True
+            success = self._execute_query(query, (value, room_id)) is not False
+            self.rooms.reload()
+            return success
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return False
 
+    # --- Обслуживание базы данных ---
+
+    def archive_bookings(self, before: datetime, batch_size: int = 1000) -> int:
+        """Перенести в архив бронирования, закончившиеся раньше before.
+
+        Строки переносятся пачками по batch_size, каждая пачка — отдельная
+        короткая транзакция, чтобы не задерживать запись бронирований.
+        Возвращает число перенесенных строк.
+        """
+        cutoff = to_epoch_minutes(before)
+        moved = 0
+        while True:
+            with self._pool.writer() as conn:
+                # start_min < cutoff позволяет использовать индекс по началу брони
+                rows = conn.execute(
+                    "SELECT id, room_id, start_min FROM bookings WHERE start_min < ? AND end_min < ? ORDER BY id LIMIT ?",
+                    (cutoff, cutoff, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                ids = [row['id'] for row in rows]
+                # Месяцы по аудиториям, отметки занятости которых больше не верны
+                months = {(row['room_id'], from_epoch_minutes(row['start_min']).date().replace(day=1)) for row in rows}
+                placeholders = ','.join('?' * len(ids))
+                conn.execute(
+                    f"INSERT OR REPLACE INTO bookings_archive ({BOOKING_COLUMNS}) "
+                    f"SELECT {BOOKING_COLUMNS} FROM bookings WHERE id IN ({placeholders})",
+                    ids
+                )
+                conn.execute(f"DELETE FROM bookings WHERE id IN ({placeholders})", ids)
+
+                def unindex(ids=ids, months=months):
+                    for booking_id in ids:
+                        self.availability.remove(booking_id)
+                    for room_id, month in months:
+                        self.occupancy.invalidate(room_id, month)
+                self._pool.after_commit(unindex)
+            moved += len(ids)
+            if len(ids) < batch_size:
+                break
+        return moved
+
+    def ping(self) -> bool:
+        """Проверить, что база данных отвечает на запросы"""
+        try:
+            with self._pool.reader() as conn:
+                conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            print(f"❌ База данных недоступна: {e}")
+            return False
+
+    def optimize_database(self):
+        """Обновить статистику планировщика запросов"""
+        with self._pool.exclusive() as conn:
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+
+    def incremental_vacuum(self, pages: int = 0) -> int:
+        """Вернуть системе свободные страницы файла БД; возвращает их число.
+
+        При первом запуске база переводится в режим auto_vacuum=INCREMENTAL,
+        что требует однократного полного VACUUM. pages=0 — освободить все.
+        """
+        with self._pool.exclusive() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # PRAGMA не поддерживает параметры; pages — целое число
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            return free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
     def get_floors(self):
         """Получает список всех этажей."""
+        return self.rooms.floors()
+
+    # --- Состояние диалогов бота ---
+    def load_bot_state(self, kind: str, item_id: int) -> Optional[bytes]:
+        """Сохраненные данные пользователя или чата (kind = 'user'/'chat')"""
+        row = self._execute_query(
+            "SELECT data FROM bot_state WHERE kind = ? AND id = ?", (kind, item_id), fetch_one=True
+        )
+        return row['data'] if row else None
+
+    def load_conversation_states(self, name: str) -> Dict[str, bytes]:
+        """Состояния диалогов ConversationHandler'а name: ключ → состояние"""
+        rows = self._execute_query(
+            "SELECT key, state FROM conversation_states WHERE name = ?", (name,), fetch_all=True
+        )
+        return {row['key']: row['state'] for row in rows or []}
+
+    def save_bot_state(self, data: Dict[Tuple[str, int], Optional[bytes]],
+                       conversations: Dict[Tuple[str, str], Optional[bytes]]) -> bool:
+        """Записать накопленные изменения состояния одной транзакцией.
+
+        data: (kind, id) → данные, conversations: (имя, ключ) → состояние;
+        None удаляет запись.
+        """
         try:
-            query = "SELECT DISTINCT floor FROM rooms ORDER BY floor"
-            result = self._execute_query(query, fetch_all=True)
-            return [row['floor'] for row in result] if result else []
+            with self._pool.writer() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO bot_state (kind, id, data, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                    [(kind, item_id, blob) for (kind, item_id), blob in data.items() if blob is not None]
+                )
+                conn.executemany(
+                    "DELETE FROM bot_state WHERE kind = ? AND id = ?",
+                    [key for key, blob in data.items() if blob is None]
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO conversation_states (name, key, state, updated_at) "
+                    "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                    [(name, key, state) for (name, key), state in conversations.items() if state is not None]
+                )
+                conn.executemany(
+                    "DELETE FROM conversation_states WHERE name = ? AND key = ?",
+                    [key for key, state in conversations.items() if state is None]
+                )
+            return True
         except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return []
\ No newline at end of file
+            print(f"❌ Ошибка при сохранении состояния диалогов: {e}")
+            return False
+
+
+class AsyncDatabaseManager:
+    """Асинхронный фасад над DatabaseManager.
+
+    Любой публичный метод DatabaseManager доступен как корутина:
+    ``await db.get_rooms_by_floor(2)``. Запрос выполняется в отдельном
+    пуле потоков, поэтому медленная запись не останавливает цикл событий.
+    """
+
+    def __init__(self, db: DatabaseManager, max_workers: Optional[int] = None):
+        self.sync = db
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.DATABASE_READERS + 1,
+            thread_name_prefix='db'
+        )
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.sync, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+
+        # Запоминаем обертку, чтобы не создавать ее при каждом обращении
+        setattr(self, name, call)
+        return call
+
+    def shutdown(self):
+        """Дождаться завершения запросов и остановить пул потоков"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,297 @@
+"""
+Исходящие сообщения: очередь с приоритетами и ограничением скорости, рассылка всем пользователям
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+
+from telegram.error import Forbidden, RetryAfter
+from telegram.ext import BaseRateLimiter, ExtBot
+
+import config
+from database_sqlite import AsyncDatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты отправки (меньше — раньше): ответы пользователю, уведомления, рассылки
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NOTIFY = 5
+PRIORITY_BROADCAST = 10
+
+# Методы Bot API с лимитами на число сообщений; остальные (answerCallbackQuery,
+# getUpdates, setWebhook, ...) отправляются без очереди
+_EDIT_ENDPOINTS = frozenset({'editMessageText', 'editMessageCaption', 'editMessageMedia', 'editMessageReplyMarkup'})
+
+
+def _is_limited(endpoint: str) -> bool:
+    return endpoint in _EDIT_ENDPOINTS or (
+        endpoint.startswith(('send', 'copyMessage', 'forwardMessage')) and endpoint != 'sendChatAction'
+    )
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity подряд"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Через сколько секунд появится токен (0 — уже есть)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Request:
+    __slots__ = ('priority', 'seq', 'chat_id', 'edit_key', 'callback', 'args', 'kwargs', 'future', 'attempts')
+
+    def __init__(self, priority, seq, chat_id, edit_key, callback, args, kwargs, future):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.edit_key = edit_key
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.attempts = 0
+
+    def __lt__(self, other: '_Request') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class OutboundRateLimiter(BaseRateLimiter[int]):
+    """Ограничитель исходящих запросов для ApplicationBuilder.rate_limiter().
+
+    Сообщения и правки ставятся в очередь с приоритетом (rate_limit_args
+    методов ExtBot, по умолчанию PRIORITY_INTERACTIVE) и отправляются одной
+    задачей с учетом общей корзины токенов (~30 сообщений/с) и корзины
+    каждого чата (личные чаты и группы — свои лимиты). Ответ 429 (RetryAfter)
+    приостанавливает всю отправку на указанное время, запрос повторяется.
+    Правка сообщения, которое уже ждет в очереди правки, заменяет ее
+    аргументы: уходит только последняя версия, оба вызова получают ее результат.
+    """
+
+    def __init__(self, rate: float = config.OUTBOUND_RATE,
+                 chat_rate: float = config.OUTBOUND_CHAT_RATE, chat_burst: int = config.OUTBOUND_CHAT_BURST,
+                 group_rate: float = config.OUTBOUND_GROUP_RATE, max_retries: int = config.OUTBOUND_MAX_RETRIES):
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._queue: List[_Request] = []
+        self._seq = itertools.count()
+        self._pending_edits: Dict[tuple, _Request] = {}
+        self._global: Optional[TokenBucket] = None
+        self._chats: Dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump: Optional[asyncio.Task] = None
+        self._sending = set()
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    async def initialize(self):
+        # ExtBot.initialize вызывается и Application, и Updater
+        if self._pump is not None:
+            return
+        loop = asyncio.get_running_loop()
+        # Без запаса на всплеск: в любом окне в 1 с уходит не больше rate сообщений
+        self._global = TokenBucket(self.rate, 1, loop.time())
+        self._wakeup = asyncio.Event()
+        self._pump = loop.create_task(self._run())
+
+    async def shutdown(self):
+        if self._pump:
+            self._pump.cancel()
+            try:
+                await self._pump
+            except asyncio.CancelledError:
+                pass
+            self._pump = None
+        for request in self._queue:
+            request.future.cancel()
+        self._queue.clear()
+        self._pending_edits.clear()
+
+    def stats(self) -> Dict:
+        """Счетчики отправленных, объединенных и повторенных запросов"""
+        return {
+            'queued': len(self._queue),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'retried': self.retried,
+        }
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        if not _is_limited(endpoint) or self._pump is None:
+            return await callback(*args, **kwargs)
+
+        chat_id = data.get('chat_id')
+        edit_key = None
+        if endpoint in _EDIT_ENDPOINTS and data.get('message_id') is not None:
+            edit_key = (endpoint, chat_id, data['message_id'])
+            waiting = self._pending_edits.get(edit_key)
+            if waiting is not None:
+                waiting.callback, waiting.args, waiting.kwargs = callback, args, kwargs
+                self.coalesced += 1
+                return await asyncio.shield(waiting.future)
+
+        priority = PRIORITY_INTERACTIVE if rate_limit_args is None else rate_limit_args
+        request = _Request(
+            priority, next(self._seq), chat_id, edit_key, callback, args, kwargs,
+            asyncio.get_running_loop().create_future()
+        )
+        if edit_key:
+            self._pending_edits[edit_key] = request
+        heapq.heappush(self._queue, request)
+        self._wakeup.set()
+        # shield: отмена одного из ожидающих не отменяет общую отправку
+        return await asyncio.shield(request.future)
+
+    def _chat_bucket(self, chat_id, now: float) -> Optional[TokenBucket]:
+        if not isinstance(chat_id, int):
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                # Забываем чаты, которые давно ничего не получали (их корзины полны)
+                self._chats = {key: b for key, b in self._chats.items() if not b.is_full(now)}
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_rate * 60, now)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _dispatch(self, now: float) -> Optional[float]:
+        """Запустить все, что позволяют лимиты; через сколько секунд проверить снова (None — очередь пуста)"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        delay = None
+        skipped = []
+        while self._queue:
+            wait = self._global.wait_time(now)
+            if wait > 0:
+                delay = wait
+                break
+            request = heapq.heappop(self._queue)
+            bucket = self._chat_bucket(request.chat_id, now)
+            chat_wait = bucket.wait_time(now) if bucket else 0.0
+            if chat_wait > 0:
+                # Чат исчерпал лимит — пропускаем его, не задерживая остальных
+                skipped.append(request)
+                delay = chat_wait if delay is None else min(delay, chat_wait)
+                continue
+            self._global.take(now)
+            if bucket:
+                bucket.take(now)
+            if request.edit_key and self._pending_edits.get(request.edit_key) is request:
+                del self._pending_edits[request.edit_key]
+            task = asyncio.get_running_loop().create_task(self._send(request))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+        for request in skipped:
+            heapq.heappush(self._queue, request)
+        return delay if self._queue else None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = self._dispatch(loop.time())
+            self._wakeup.clear()
+            if delay is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, request: _Request):
+        try:
+            result = await request.callback(*request.args, **request.kwargs)
+        except RetryAfter as e:
+            if request.attempts >= self.max_retries:
+                self._fail(request, e)
+                return
+            request.attempts += 1
+            self.retried += 1
+            loop = asyncio.get_running_loop()
+            self._paused_until = max(self._paused_until, loop.time() + float(e.retry_after))
+            logger.warning(f"⏳ Лимит Telegram: пауза отправки {e.retry_after} с")
+            heapq.heappush(self._queue, request)
+            self._wakeup.set()
+        except Exception as e:
+            self._fail(request, e)
+        else:
+            self.sent += 1
+            if not request.future.done():
+                request.future.set_result(result)
+
+    @staticmethod
+    def _fail(request: _Request, error: Exception):
+        if not request.future.done():
+            request.future.set_exception(error)
+
+
+async def broadcast(bot: ExtBot, db: AsyncDatabaseManager, text: str,
+                    chunk_size: int = config.BROADCAST_CHUNK_SIZE) -> Dict:
+    """Отправить text всем пользователям бота.
+
+    Получатели читаются из БД порциями по chunk_size (по возрастанию ID),
+    следующая порция запрашивается после отправки предыдущей, поэтому
+    в памяти одновременно не больше chunk_size адресатов. Сообщения идут
+    с приоритетом PRIORITY_BROADCAST и не задерживают ответы пользователям.
+    """
+    report = {'delivered': 0, 'blocked': 0, 'failed': 0}
+    after_id = 0
+    while True:
+        user_ids = await db.get_user_ids_after(after_id, chunk_size)
+        if not user_ids:
+            break
+        results = await asyncio.gather(
+            *(bot.send_message(user_id, text, rate_limit_args=PRIORITY_BROADCAST) for user_id in user_ids),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Forbidden):
+                # Пользователь заблокировал бота
+                report['blocked'] += 1
+            elif isinstance(result, Exception):
+                report['failed'] += 1
+            else:
+                report['delivered'] += 1
+        after_id = user_ids[-1]
+        if len(user_ids) < chunk_size:
+            break
+    return report
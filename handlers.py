@@ -1,10 +1,14 @@
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ConversationHandler, ContextTypes
 from datetime import datetime, date, timedelta
-from database_sqlite import DatabaseManager
+from database_sqlite import DatabaseManager, AsyncDatabaseManager
 from keyboards import Keyboards
 from calendar_widget import booking_calendar
+from delivery import broadcast
+from routing import parse_callback
+import config
 import locale
+import re
 from itertools import groupby
 import logging
 
@@ -12,7 +16,10 @@ import logging
 try:
     locale.setlocale(locale.LC_TIME, 'ru_RU.UTF-8')
 except locale.Error:
-    locale.setlocale(locale.LC_TIME, 'Russian_Russia.1251')
+    try:
+        locale.setlocale(locale.LC_TIME, 'Russian_Russia.1251')
+    except locale.Error:
+        logging.warning("⚠️ Русская локаль не установлена: даты форматируются в локали по умолчанию")
 
 
 (
@@ -32,13 +39,18 @@ except locale.Error:
 
 
 class Handlers:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: DatabaseManager = None):
+        # Один DatabaseManager на процесс; bot.py создает его и передает сюда
+        self.db = AsyncDatabaseManager(db or DatabaseManager())
+        # Меню этажей и аудиторий строятся из справочника аудиторий
+        Keyboards.bind_catalog(self.db.rooms)
+        # (версия закрытий, день), для которых заблокированы даты календаря
+        self._locked_dates_key = None
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         # Ensure the user exists in DB using the unified user management API
-        self.db.get_or_create_user(user)
+        await self.db.get_or_create_user(user)
         await update.message.reply_text(
             f"🎉 Добро пожаловать, {user.first_name}!\nВыберите раздел в меню:",
             reply_markup=Keyboards.get_main_menu()
@@ -60,13 +72,26 @@ class Handlers:
         )
         return CHOOSING_FLOOR
 
+    @staticmethod
+    def _callback_args(context: ContextTypes.DEFAULT_TYPE, data: str, prefix: str, signature: str) -> list:
+        """Аргументы callback_data: уже разобранные Router'ом или разбор data по маршруту"""
+        if context.args is not None:
+            return context.args
+        return parse_callback(data, prefix, signature) or []
+
+    @classmethod
+    def _floor_args(cls, context: ContextTypes.DEFAULT_TYPE, data: str, prefix: str):
+        """'<prefix><этаж>' или '<prefix><этаж>_<страница>' → (этаж, страница)"""
+        floor, page = (cls._callback_args(context, data, prefix, 'i?i') + [0])[:2]
+        return floor, page
+
     async def show_floor_rooms_for_booking(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
-        floor = int(query.data.split("_")[2])
+        floor, page = self._floor_args(context, query.data, 'book_floor_')
         context.user_data['booking_floor'] = floor
-        rooms = self.db.get_rooms_by_floor(floor)
-        if not rooms:
+        markup = Keyboards.get_booking_rooms_keyboard(floor, page)
+        if not markup:
             await query.edit_message_text(
                 f"❌ На {floor} этаже нет доступных аудиторий.",
                 reply_markup=Keyboards.get_booking_floors_keyboard()
@@ -74,15 +99,24 @@ class Handlers:
             return CHOOSING_FLOOR
         await query.edit_message_text(
             f"🏢 Выберите аудиторию на {floor} этаже:",
-            reply_markup=Keyboards.get_booking_rooms_keyboard(rooms, floor)
+            reply_markup=markup
         )
         return CHOOSING_ROOM
 
+    async def back_to_booking_floors(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        await query.edit_message_text(
+            "🏢 Выберите этаж для бронирования:",
+            reply_markup=Keyboards.get_booking_floors_keyboard()
+        )
+        return CHOOSING_FLOOR
+
     async def start_booking_from_room_details(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
         room_id = int(query.data.split("_")[3])
-        room = self.db.get_room_by_id(room_id)
+        room = await self.db.get_room_by_id(room_id)
         if not room:
             await query.edit_message_text("❌ Аудитория не найдена.")
             return ConversationHandler.END
@@ -98,11 +132,42 @@ class Handlers:
         )
         return ENTERING_FULL_NAME
     
+    async def start_booking_from_free_slot(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Начать бронирование с аудитории и времени, найденных поиском свободных аудиторий."""
+        query = update.callback_query
+        await query.answer()
+        # free_slot_<room_id>_<ГГГГММДД>_<ЧЧММ>_<длительность>
+        _, _, room_id, day, start, duration = query.data.split("_")
+        room = await self.db.get_room_by_id(int(room_id))
+        if not room:
+            await query.edit_message_text("❌ Аудитория не найдена.")
+            return ConversationHandler.END
+        for key in list(context.user_data.keys()):
+            if key.startswith('booking_'):
+                del context.user_data[key]
+        start_dt = datetime.strptime(f"{day}{start}", '%Y%m%d%H%M')
+        end_dt = start_dt + timedelta(minutes=int(duration))
+        if end_dt.date() != start_dt.date():
+            await query.edit_message_text("❌ Бронирование должно заканчиваться в тот же день.")
+            return ConversationHandler.END
+        context.user_data['booking_room_id'] = room['id']
+        context.user_data['booking_room'] = room
+        context.user_data['booking_date'] = start_dt.date()
+        context.user_data['booking_start_time'] = start_dt.time()
+        context.user_data['booking_end_time'] = end_dt.time()
+        await query.edit_message_text(
+            f"🏢 Выбрана аудитория: {room['name']}\n"
+            f"📅 {start_dt.strftime('%d.%m.%Y')} {start_dt.strftime('%H:%M')}-{end_dt.strftime('%H:%M')}\n\n"
+            "👤 Введите ваше ФИО:",
+            reply_markup=Keyboards.get_cancel_keyboard()
+        )
+        return ENTERING_FULL_NAME
+
     async def start_booking_from_room(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
         room_id = int(query.data.split("_")[2])
-        room = self.db.get_room_by_id(room_id)
+        room = await self.db.get_room_by_id(room_id)
         if not room:
             await query.edit_message_text("❌ Аудитория не найдена.")
             return CHOOSING_ROOM
@@ -122,9 +187,18 @@ class Handlers:
     
     async def enter_purpose(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data['booking_purpose'] = update.message.text.strip()
+        ud = context.user_data
+        if ud.get('booking_date') and ud.get('booking_start_time') and ud.get('booking_end_time'):
+            # Дата и время уже выбраны в поиске свободных аудиторий
+            await update.message.reply_text(
+                "🔁 Хотите повторять бронирование?",
+                reply_markup=Keyboards.get_recurrence_keyboard()
+            )
+            ud['booking_recurrence'] = 'none'
+            return SELECTING_DATE
         now = datetime.now()
-        calendar_markup = booking_calendar.create_calendar(year=now.year, month=now.month)
         context.user_data['calendar_context'] = 'booking_date'
+        calendar_markup = await self._calendar_markup(context, now.year, now.month)
         await update.message.reply_text("📅 Выберите дату мероприятия:", reply_markup=calendar_markup)
         return SELECTING_DATE
 
@@ -141,6 +215,11 @@ class Handlers:
             if booking_date < date.today():
                 await update.message.reply_text("❌ Нельзя бронировать на прошедшую дату. Введите дату еще раз:")
                 return ENTERING_MANUAL_DATE
+            if booking_date in await self.db.get_closed_dates(
+                context.user_data.get('booking_room_id'), booking_date, booking_date
+            ):
+                await update.message.reply_text("❌ В этот день аудитория закрыта. Введите другую дату:")
+                return ENTERING_MANUAL_DATE
             context.user_data['booking_date'] = booking_date
             await update.message.reply_text(f"📅 Выбрана дата: {booking_date.strftime('%d.%m.%Y')}\n\n🕐 Введите время начала (например: 14:30):")
             return ENTERING_START_TIME
@@ -228,7 +307,7 @@ class Handlers:
 
         # Убедимся, что пользователь есть в БД
         user = update.effective_user
-        self.db.get_or_create_user(user)
+        await self.db.get_or_create_user(user)
 
         # Собираем все данные из user_data
         ud = context.user_data
@@ -246,47 +325,41 @@ class Handlers:
             recurrence_until = ud.get('booking_recurrence_until')
 
             if recurrence != 'none' and recurrence_until:
-                group_id = f"{user.id}-{room_id}-{int(datetime.now().timestamp())}"
-                current_date = booking_date
-                created = 0
-                while current_date <= recurrence_until:
-                    s_dt = datetime.combine(current_date, start_time)
-                    e_dt = datetime.combine(current_date, end_time)
-                    if self.db.check_room_availability(room_id, s_dt, e_dt):
-                        self.db.create_booking(
-                            user,
-                            room_id,
-                            full_name,
-                            purpose,
-                            s_dt,
-                            e_dt,
-                            recurrence_type=recurrence,
-                            recurrence_until=datetime.combine(recurrence_until, end_time),
-                            recurrence_group=group_id
-                        )
-                        created += 1
-                    # шаг интервала
-                    if recurrence == 'weekly':
-                        current_date = date.fromordinal(current_date.toordinal() + 7)
-                    elif recurrence == 'biweekly':
-                        current_date = date.fromordinal(current_date.toordinal() + 14)
-                    elif recurrence == 'monthly':
-                        # переход на следующий месяц, безопасно ограничиваем днем 28
-                        year = current_date.year + (current_date.month // 12)
-                        month = (current_date.month % 12) + 1
-                        day = min(current_date.day, 28)
-                        current_date = date(year, month, day)
-                await query.edit_message_text(f"✅ Создано бронирований: {created}")
-            else:
-                self.db.create_booking(
+                result = await self.db.create_recurring_booking(
                     user,
-                    room_id, 
+                    room_id,
                     full_name,
                     purpose,
                     start_dt,
-                    end_dt
+                    end_dt,
+                    freq=recurrence,
+                    until=recurrence_until
                 )
-                await query.edit_message_text("✅ **Бронирование подтверждено!**", parse_mode='Markdown')
+                text = f"✅ Создано бронирований: {len(result['created'])}"
+                if result['skipped']:
+                    skipped = ", ".join(d.strftime('%d.%m.%Y') for d in result['skipped'])
+                    text += f"\n⚠️ Пропущены (аудитория занята или закрыта): {skipped}"
+                await query.edit_message_text(text)
+            else:
+                result = await self.db.book_slot(user, room_id, full_name, purpose, start_dt, end_dt)
+                if result['status'] == 'created':
+                    await query.edit_message_text("✅ **Бронирование подтверждено!**", parse_mode='Markdown')
+                elif result['status'] == 'conflict':
+                    text = "❌ Аудитория уже занята в это время."
+                    busy = [
+                        f"{c['start_time'].strftime('%H:%M')}-{c['end_time'].strftime('%H:%M')}"
+                        for c in result['conflicts']
+                    ]
+                    if busy:
+                        text += "\nЗанято: " + ", ".join(busy)
+                    await query.edit_message_text(text)
+                elif result['status'] == 'closed':
+                    text = "⛔ Аудитория закрыта в это время:\n" + "\n".join(
+                        self._format_blackout(b) for b in result['blackouts']
+                    )
+                    await query.edit_message_text(text)
+                else:
+                    await query.edit_message_text(f"❌ Ошибка при создании бронирования: {result.get('error')}")
         except Exception as e:
             await query.edit_message_text(f"❌ Ошибка при создании бронирования: {e}")
         finally:
@@ -300,7 +373,8 @@ class Handlers:
             'none': 'Единоразово',
             'weekly': 'Раз в неделю',
             'biweekly': 'Раз в 2 недели',
-            'monthly': 'Раз в месяц'
+            'monthly': 'Раз в месяц (то же число)',
+            'monthly_weekday': 'Раз в месяц (тот же день недели)'
         }
         base = mapping.get(rec_type, 'Единоразово')
         if rec_type != 'none' and until:
@@ -333,19 +407,12 @@ class Handlers:
         """Показать активные бронирования пользователя в новом формате."""
         logging.info("Entering show_my_bookings function")
         user_id = update.effective_user.id
-        bookings_raw = self.db.get_user_bookings(user_id)
-        logging.info(f"Got {len(bookings_raw)} bookings from DB for user {user_id}")
+        bookings = await self.db.get_user_bookings(user_id)
+        logging.info(f"Got {len(bookings)} bookings from DB for user {user_id}")
         
-        if not bookings_raw:
+        if not bookings:
             await update.message.reply_text("У вас нет активных бронирований.")
             return
-        
-        # Конвертируем строки в datetime объекты
-        bookings = []
-        for b in bookings_raw:
-            b['start_time'] = datetime.fromisoformat(b['start_time'])
-            b['end_time'] = datetime.fromisoformat(b['end_time'])
-            bookings.append(b)
 
         message = "📅 **Ваши бронирования:**\n\n"
         
@@ -373,9 +440,25 @@ class Handlers:
         now = datetime.now()
         await update.message.reply_text(
             "📅 Выберите дату для просмотра бронирований:",
-            reply_markup=booking_calendar.create_calendar(year=now.year, month=now.month)
+            reply_markup=await self._calendar_markup(context, now.year, now.month)
         )
 
+    async def _calendar_markup(self, context: ContextTypes.DEFAULT_TYPE, year: int, month: int):
+        """Календарь месяца с отметками занятости: для выбранной аудитории при
+        бронировании и по всему зданию при просмотре активных броней"""
+        # Дни, когда закрыто все здание, блокируются во всех календарях
+        locked_key = (self.db.blackouts.version, date.today())
+        if locked_key != self._locked_dates_key:
+            booking_calendar.set_locked_dates(await self.db.get_closed_dates())
+            self._locked_dates_key = locked_key
+        cal_ctx = context.user_data.get('calendar_context')
+        day_marks = None
+        if cal_ctx == 'booking_date' and context.user_data.get('booking_room_id'):
+            day_marks = await self.db.get_month_occupancy(year, month, context.user_data['booking_room_id'])
+        elif cal_ctx == 'active_bookings':
+            day_marks = await self.db.get_month_occupancy(year, month)
+        return booking_calendar.create_calendar(year=year, month=month, day_marks=day_marks)
+
     async def handle_calendar_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
@@ -387,7 +470,7 @@ class Handlers:
             year, month = (data['year'], data['month'])
             if action == 'prev': year, month = booking_calendar.get_prev_month(year, month)
             else: year, month = booking_calendar.get_next_month(year, month)
-            await query.edit_message_reply_markup(booking_calendar.create_calendar(year=year, month=month))
+            await query.edit_message_reply_markup(await self._calendar_markup(context, year, month))
             return SELECTING_DATE if cal_ctx == 'booking_date' else None
 
         if action == 'select':
@@ -399,6 +482,15 @@ class Handlers:
             elif cal_ctx == 'active_bookings':
                 await self.show_active_bookings_for_date(update, context, selected_date)
                 return None
+            elif cal_ctx == 'free_search':
+                context.user_data['free_search_date'] = selected_date
+                context.user_data['awaiting_free_search'] = True
+                await query.edit_message_text(
+                    f"📅 Дата: {selected_date.strftime('%d.%m.%Y')}\n\n"
+                    "⏱ Введите длительность в минутах. Через пробел можно указать "
+                    "минимальную вместимость и время «не раньше», например: 90 20 14:00"
+                )
+                return None
             elif cal_ctx == 'admin_contacts':
                 return await self.admin_show_contacts_for_date(update, context, selected_date)
             elif cal_ctx == 'admin_delete':
@@ -408,7 +500,7 @@ class Handlers:
                 if base_date and selected_date < base_date:
                     await query.edit_message_text(
                         "❌ Дата окончания не может быть раньше даты начала. Выберите другую дату:",
-                        reply_markup=booking_calendar.create_calendar(year=base_date.year, month=base_date.month)
+                        reply_markup=await self._calendar_markup(context, base_date.year, base_date.month)
                     )
                     return SELECTING_DATE
                 context.user_data['booking_recurrence_until'] = selected_date
@@ -426,15 +518,15 @@ class Handlers:
         return None
 
     async def handle_recurrence_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработка кнопок выбора повторения: recurrence_none|weekly|biweekly|monthly"""
+        """Обработка кнопок выбора повторения: recurrence_none|weekly|biweekly|monthly|monthly_weekday"""
         query = update.callback_query
         await query.answer()
         data = query.data
         if not data.startswith('recurrence_'):
             return
-        rec_type = data.split('_', 1)[1]  # none|weekly|biweekly|monthly
+        rec_type = data.split('_', 1)[1]  # none|weekly|biweekly|monthly|monthly_weekday
         # Нормализуем значения
-        if rec_type not in ['none', 'weekly', 'biweekly', 'monthly']:
+        if rec_type not in ['none', 'weekly', 'biweekly', 'monthly', 'monthly_weekday']:
             rec_type = 'none'
         context.user_data['booking_recurrence'] = rec_type
 
@@ -448,50 +540,46 @@ class Handlers:
         context.user_data['calendar_context'] = 'recurrence_until'
         await query.edit_message_text(
             "📅 Выберите дату окончания повторений (включительно):",
-            reply_markup=booking_calendar.create_calendar(year=now.year, month=now.month)
+            reply_markup=await self._calendar_markup(context, now.year, now.month)
         )
         return SELECTING_DATE
 
     async def show_active_bookings_for_date(self, update: Update, context: ContextTypes.DEFAULT_TYPE, selected_date):
         query = update.callback_query
-        bookings_raw = self.db.get_bookings_for_date(selected_date)
-        if not bookings_raw:
+        bookings = await self.db.get_day_schedule(selected_date)
+        if not bookings:
             text = f"📋 На {selected_date.strftime('%d.%m.%Y')} нет бронирований."
         else:
             text = f"📋 Бронирования на {selected_date.strftime('%d.%m.%Y')}:\n\n"
-            for b in bookings_raw:
-                room = self.db.get_room_by_id(b['room_id'])
-                user = self.db.get_user_by_id(b['user_id'])
-                start_time_dt = datetime.fromisoformat(b['start_time'])
-                end_time_dt = datetime.fromisoformat(b['end_time'])
+            for b in bookings:
+                start_time_dt = b['start_time']
+                end_time_dt = b['end_time']
                 
                 # Формируем имя пользователя
-                if user:
-                    first_name = user.get('first_name', '')
-                    last_name = user.get('last_name', '')
-                    user_full_name = f"{first_name} {last_name}".strip() or "Неизвестный"
+                if b['has_user']:
+                    user_full_name = f"{b['first_name'] or ''} {b['last_name'] or ''}".strip() or "Неизвестный"
                 else:
-                    user_full_name = b.get('full_name', 'Неизвестный')
+                    user_full_name = b.get('full_name') or 'Неизвестный'
                 
-                text += f"🏢 **{room.get('name', '?')}** ({start_time_dt.strftime('%H:%M')}-{end_time_dt.strftime('%H:%M')})\n"
+                text += f"🏢 **{b['room_name'] or '?'}** ({start_time_dt.strftime('%H:%M')}-{end_time_dt.strftime('%H:%M')})\n"
                 text += f"👤 {user_full_name}\n🎯 {b['purpose']}\n\n"
         await query.edit_message_text(text, reply_markup=Keyboards.get_back_to_calendar_keyboard(), parse_mode='Markdown')
 
     async def show_floor_rooms(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
-        floor = int(query.data.split('_')[1])
-        rooms = self.db.get_rooms_by_floor(floor)
-        if not rooms:
+        floor, page = self._floor_args(context, query.data, 'floor_')
+        markup = Keyboards.get_rooms_keyboard(floor, page)
+        if not markup:
             await query.edit_message_text(f"❌ На {floor} этаже нет аудиторий.", reply_markup=Keyboards.get_floors_keyboard())
             return
-        await query.edit_message_text(f"🏢 Аудитории на {floor} этаже:", reply_markup=Keyboards.get_rooms_keyboard(rooms, floor))
+        await query.edit_message_text(f"🏢 Аудитории на {floor} этаже:", reply_markup=markup)
 
     async def show_room_details(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
-        room_id = int(query.data.split('_')[1])
-        room = self.db.get_room_by_id(room_id)
+        room_id, = self._callback_args(context, query.data, 'room_', 'i')
+        room = await self.db.get_room_by_id(room_id)
         if not room:
             await query.edit_message_text("❌ Аудитория не найдена.")
             return
@@ -510,6 +598,7 @@ class Handlers:
             "Этот бот предназначен для бронирования аудиторий в здании DAR.\n\n"
             "Основные команды:\n"
             "📅 Забронировать - начать процесс бронирования аудитории.\n"
+            "🔎 Найти свободную - найти все аудитории, свободные в нужный день на нужное время.\n"
             "🗂 Аудитории - просмотр списка всех доступных аудиторий по этажам.\n"
             "📅 Мои брони - просмотр ваших активных бронирований.\n"
             "📋 Активные брони - просмотр всех активных бронирований в здании.\n"
@@ -521,47 +610,123 @@ class Handlers:
         )
         await update.message.reply_text(text=text)
 
+    async def start_room_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Поиск аудитории по оборудованию, описанию и вместимости"""
+        context.user_data['awaiting_room_search'] = True
+        await update.callback_query.edit_message_text(
+            "🔍 Что нужно в аудитории? Числом можно указать вместимость.\n"
+            "Например: проектор 30"
+        )
+
+    async def handle_room_search_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        context.user_data.pop('awaiting_room_search', None)
+        text = update.message.text
+        numbers = [int(n) for n in re.findall(r'\d+', text)]
+        min_capacity = max(numbers) if numbers else None
+        rooms = await self.db.search_rooms(re.sub(r'\d+', ' ', text), min_capacity)
+        if not rooms:
+            await update.message.reply_text(
+                "😔 Подходящих аудиторий не найдено.",
+                reply_markup=Keyboards.get_floors_keyboard()
+            )
+            return
+        await update.message.reply_text(
+            f"🔍 Найдено аудиторий: {len(rooms)}",
+            reply_markup=Keyboards.get_room_search_results_keyboard(rooms)
+        )
+
+    async def start_free_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Поиск свободных аудиторий: сначала выбираем дату."""
+        context.user_data['calendar_context'] = 'free_search'
+        context.user_data.pop('awaiting_free_search', None)
+        now = datetime.now()
+        await update.message.reply_text(
+            "🔎 Поиск свободных аудиторий\n\nВыберите дату:",
+            reply_markup=await self._calendar_markup(context, now.year, now.month)
+        )
+
+    async def handle_free_search_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Разобрать «длительность [вместимость] [ЧЧ:ММ]» и показать свободные аудитории."""
+        parts = update.message.text.split()
+        try:
+            duration = int(parts[0])
+            min_capacity = int(parts[1]) if len(parts) > 1 else None
+            not_before = datetime.strptime(parts[2], '%H:%M').time() if len(parts) > 2 else None
+            if duration <= 0:
+                raise ValueError
+        except (ValueError, IndexError):
+            await update.message.reply_text(
+                "❌ Неверный формат. Введите длительность в минутах, например: 90 или 90 20 14:00"
+            )
+            return
+        selected_date = context.user_data.get('free_search_date')
+        context.user_data.pop('awaiting_free_search', None)
+        results = await self.db.find_free_rooms(selected_date, duration, min_capacity, not_before)
+        if not results:
+            await update.message.reply_text(
+                f"😔 На {selected_date.strftime('%d.%m.%Y')} нет аудиторий, свободных {duration} мин подряд."
+            )
+            return
+        text = f"🔎 Свободно {selected_date.strftime('%d.%m.%Y')} на {duration} мин:\n\n"
+        for item in results:
+            windows = ", ".join(f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in item['windows'])
+            text += f"🏢 {item['room']['name']} ({item['room'].get('capacity') or '-'} чел.): {windows}\n"
+        text += "\nНажмите на аудиторию, чтобы забронировать ближайшее время:"
+        await update.message.reply_text(
+            text,
+            reply_markup=Keyboards.get_free_slots_keyboard(results, duration)
+        )
+
     async def handle_text_global(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Единый обработчик текстов: пароль админа или новое значение при редактировании."""
         # приоритет: пароль админа
         if context.user_data.get('awaiting_admin_password'):
             return await self.check_admin_password(update, context)
+        if context.user_data.get('awaiting_blackout'):
+            return await self.handle_blackout_input(update, context)
+        if context.user_data.get('awaiting_broadcast'):
+            return await self.handle_broadcast_input(update, context)
+        if context.user_data.get('awaiting_free_search'):
+            return await self.handle_free_search_input(update, context)
+        if context.user_data.get('awaiting_room_search'):
+            return await self.handle_room_search_input(update, context)
         # затем: редактирование аудиторий
         if context.user_data.get('admin_edit_in_progress') and context.user_data.get('admin_edit_field'):
             return await self.admin_edit_set_new_value(update, context)
         # иначе игнорируем
         return
-    async def handle_other_callbacks(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def back_to_floors(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
-        if query.data.startswith("cal_"):
-            await self.handle_calendar_callback(update, context)
-            return
-        if query.data.startswith('recurrence_'):
-            await self.handle_recurrence_callback(update, context)
-            return
         await query.answer()
-        if query.data.startswith("floor_"): await self.show_floor_rooms(update, context)
-        elif query.data.startswith("room_"): await self.show_room_details(update, context)
-        elif query.data == "back_to_floors": await query.edit_message_text("🏢 Выберите этаж:", reply_markup=Keyboards.get_floors_keyboard())
-        elif query.data == "back_to_calendar":
-            context.user_data['calendar_context'] = 'active_bookings'
-            now = datetime.now()
-            await query.edit_message_text(
-                "📅 Выберите дату для просмотра бронирований:",
-                reply_markup=booking_calendar.create_calendar(year=now.year, month=now.month)
-            )
-        elif query.data == "back_to_main":
-            await query.answer()
-            await query.delete_message()
-            await query.message.reply_text("🏠 Главное меню:", reply_markup=Keyboards.get_main_menu())
-        elif query.data == "back_to_admin":
-            await self.show_admin_panel(update, context)
+        await query.edit_message_text("🏢 Выберите этаж:", reply_markup=Keyboards.get_floors_keyboard())
+
+    async def back_to_calendar(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        context.user_data['calendar_context'] = 'active_bookings'
+        now = datetime.now()
+        await query.edit_message_text(
+            "📅 Выберите дату для просмотра бронирований:",
+            reply_markup=await self._calendar_markup(context, now.year, now.month)
+        )
+
+    async def back_to_main(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        await query.delete_message()
+        await query.message.reply_text("🏠 Главное меню:", reply_markup=Keyboards.get_main_menu())
+
+    async def handle_other_callbacks(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Callback без маршрута (устаревшие кнопки, «noop»): только снимаем индикатор загрузки"""
+        await update.callback_query.answer()
 
 
     async def show_admin_panel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать админ-панель или запросить пароль. Работает и с message, и с callback_query."""
         query = update.callback_query
         user = update.effective_user
+        # Возврат в панель отменяет незавершенный ввод текста рассылки
+        context.user_data.pop('awaiting_broadcast', None)
 
         async def reply(text, reply_markup):
             if query:
@@ -570,7 +735,7 @@ class Handlers:
             else:
                 await update.message.reply_text(text, reply_markup=reply_markup)
 
-        if self.db.is_user_admin(user.id):
+        if await self.db.is_user_admin(user.id):
             await reply(
                 "🛠 Админ-панель\n\nВыберите действие:",
                 reply_markup=Keyboards.get_admin_menu()
@@ -593,7 +758,7 @@ class Handlers:
         if not context.user_data.get('awaiting_admin_password'):
             return
 
-        if self.db.check_admin_password(user_id, password):
+        if await self.db.check_admin_password(user_id, password):
             await update.message.reply_text(
                 "✅ Доступ разрешен!",
                 reply_markup=Keyboards.get_admin_menu()
@@ -660,7 +825,7 @@ class Handlers:
 
     async def admin_add_room_finish(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         ud = context.user_data
-        success = self.db.create_room(
+        success = await self.db.create_room(
             room_number=ud['admin_add_number'],
             name=ud['admin_add_name'],
             floor=ud['admin_add_floor'],
@@ -687,33 +852,25 @@ class Handlers:
         now = datetime.now()
         await query.edit_message_text(
             "👥 Контакты пользователей\n\nВыберите дату для просмотра:",
-            reply_markup=booking_calendar.create_calendar(year=now.year, month=now.month)
+            reply_markup=await self._calendar_markup(context, now.year, now.month)
         )
         return ADMIN_SELECT_CONTACTS_DATE
     
     async def admin_show_contacts_for_date(self, update: Update, context: ContextTypes.DEFAULT_TYPE, selected_date):
         query = update.callback_query
-        bookings = self.db.get_bookings_for_date(selected_date)
+        bookings = await self.db.get_day_schedule(selected_date)
         
         if not bookings:
             text = f"На {selected_date.strftime('%d.%m.%Y')} нет бронирований."
         else:
             text = f"📋 Бронирования на {selected_date.strftime('%d.%m.%Y')}:\n\n"
             for b in bookings:
-                user = self.db.get_user_by_id(b['user_id'])
-                room = self.db.get_room_by_id(b['room_id'])
-                
-                username = f"@{user['username']}" if user and user.get('username') else "скрыт"
-                if user:
-                    first_name = user.get('first_name', '')
-                    last_name = user.get('last_name', '')
-                    user_full_name = f"{first_name} {last_name}".strip() or "Неизвестный"
-                else:
-                    user_full_name = "Неизвестный"
-                room_name = room.get('name', 'Неизвестная аудитория') if room else 'Неизвестная аудитория'
+                username = f"@{b['username']}" if b.get('username') else "скрыт"
+                user_full_name = f"{b['first_name'] or ''} {b['last_name'] or ''}".strip() or "Неизвестный"
+                room_name = b['room_name'] or 'Неизвестная аудитория'
                 
-                start_time_dt = datetime.fromisoformat(b['start_time'])
-                end_time_dt = datetime.fromisoformat(b['end_time'])
+                start_time_dt = b['start_time']
+                end_time_dt = b['end_time']
                 
                 start_time_str = start_time_dt.strftime('%H:%M')
                 end_time_str = end_time_dt.strftime('%H:%M')
@@ -725,6 +882,200 @@ class Handlers:
         await query.edit_message_text(text, reply_markup=Keyboards.get_back_to_admin_keyboard(), parse_mode='Markdown')
         return ADMIN_MAIN
 
+    # --- Списки бронирований и пользователей (постранично) ---
+    @classmethod
+    def _page_args(cls, context: ContextTypes.DEFAULT_TYPE, data: str, prefix: str, signature: str):
+        """'<prefix>_next_<ключ>_<id>' → (backward, (ключ, id)); без курсора — первая страница"""
+        args = cls._callback_args(context, data, prefix + '_', signature)
+        if not args:
+            return False, None
+        direction, key, row_id = args
+        return direction == 'prev', (key, row_id)
+
+    async def admin_show_all_bookings(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        if not await self.db.is_user_admin(update.effective_user.id):
+            return None
+        backward, cursor = self._page_args(context, query.data, 'admin_bookings_page', 'wii')
+        page = await self.db.get_bookings_page(cursor, backward, config.ADMIN_PAGE_SIZE)
+
+        if not page['items']:
+            text = "📚 Бронирований нет."
+        else:
+            text = "📚 Все бронирования (сначала поздние):\n\n"
+            for b in page['items']:
+                text += (
+                    f"📅 {b['start_time'].strftime('%d.%m.%Y %H:%M')}-{b['end_time'].strftime('%H:%M')} "
+                    f"— {b['room_name']}\n"
+                    f"👤 {b['full_name']} · {b['status']}\n\n"
+                )
+        await query.edit_message_text(
+            text,
+            reply_markup=Keyboards.get_admin_page_keyboard('admin_bookings_page', page['prev'], page['next'])
+        )
+        return ADMIN_MAIN
+
+    async def admin_show_all_users(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        if not await self.db.is_user_admin(update.effective_user.id):
+            return None
+        backward, cursor = self._page_args(context, query.data, 'admin_users_page', 'wwi')
+        page = await self.db.get_users_page(cursor, backward, config.ADMIN_PAGE_SIZE)
+
+        if not page['items']:
+            text = "🧑‍💼 Пользователей с бронированиями нет."
+        else:
+            text = "🧑‍💼 Пользователи с бронированиями (сначала новые):\n\n"
+            for u in page['items']:
+                username = f"@{u['username']}" if u.get('username') else "скрыт"
+                full_name = f"{u['first_name'] or ''} {u['last_name'] or ''}".strip() or "Неизвестный"
+                text += (
+                    f"👤 {full_name} ({username}) — броней: {u['booking_count']}\n"
+                    f"🏢 {u['booked_rooms'] or '-'}\n\n"
+                )
+        await query.edit_message_text(
+            text,
+            reply_markup=Keyboards.get_admin_page_keyboard('admin_users_page', page['prev'], page['next'])
+        )
+        return ADMIN_MAIN
+
+    # --- Закрытия здания и аудиторий ---
+    @staticmethod
+    def _format_blackout(b) -> str:
+        place = b.get('room_name') or 'Все здание'
+        text = f"📅 {b['start_time'].strftime('%d.%m.%Y %H:%M')} – {b['end_time'].strftime('%d.%m.%Y %H:%M')} · {place}"
+        if b.get('reason'):
+            text += f" · {b['reason']}"
+        return text
+
+    @staticmethod
+    def _parse_blackout_bound(text: str, is_end: bool = False) -> datetime:
+        """'ДД.ММ.ГГГГ ЧЧ:ММ' или 'ДД.ММ.ГГГГ' (день целиком; конец — включительно)"""
+        text = text.strip()
+        try:
+            return datetime.strptime(text, '%d.%m.%Y %H:%M')
+        except ValueError:
+            day = datetime.strptime(text, '%d.%m.%Y')
+            return day + timedelta(days=1) if is_end else day
+
+    async def admin_show_blackouts(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        if not await self.db.is_user_admin(update.effective_user.id):
+            return None
+        context.user_data.pop('awaiting_blackout', None)
+        blackouts = await self.db.get_blackouts()
+        if not blackouts:
+            text = "⛔ Запланированных закрытий нет."
+        else:
+            text = "⛔ Закрытия здания и аудиторий:\n\n" + "\n".join(self._format_blackout(b) for b in blackouts)
+        await query.edit_message_text(text, reply_markup=Keyboards.get_blackouts_keyboard(blackouts))
+        return ADMIN_MAIN
+
+    async def admin_blackout_add_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        if not await self.db.is_user_admin(update.effective_user.id):
+            return None
+        context.user_data['awaiting_blackout'] = True
+        await query.edit_message_text(
+            "➕ Новое закрытие\n\n"
+            "Отправьте период, аудиторию и причину через «;»:\n"
+            "ДД.ММ.ГГГГ[ ЧЧ:ММ] - ДД.ММ.ГГГГ[ ЧЧ:ММ]; номер аудитории или «все»; причина\n\n"
+            "Например: 01.01.2027 - 08.01.2027; все; Новогодние каникулы\n"
+            "Даты без времени закрываются целиком, дата окончания — включительно.",
+            reply_markup=Keyboards.get_back_to_admin_keyboard()
+        )
+        return ADMIN_MAIN
+
+    async def handle_blackout_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Разобрать «период; аудитория; причина» и добавить закрытие."""
+        if not await self.db.is_user_admin(update.effective_user.id):
+            context.user_data.pop('awaiting_blackout', None)
+            return
+        parts = [part.strip() for part in update.message.text.split(';')]
+        try:
+            period = re.split(r'\s+[-–]\s+', parts[0])
+            start = self._parse_blackout_bound(period[0])
+            end = self._parse_blackout_bound(period[-1], is_end=True)
+            if end <= start:
+                raise ValueError
+        except ValueError:
+            await update.message.reply_text(
+                "❌ Неверный формат. Пример: 01.01.2027 - 08.01.2027; все; Новогодние каникулы"
+            )
+            return
+        room_id = None
+        place = parts[1] if len(parts) > 1 else ''
+        if place and place.lower() not in ('все', 'здание'):
+            room = await self.db.get_room_by_number(place)
+            if not room:
+                await update.message.reply_text(f"❌ Аудитория {place} не найдена. Попробуйте еще раз:")
+                return
+            room_id = room['id']
+        reason = parts[2] if len(parts) > 2 else ''
+
+        blackout = await self.db.add_blackout(start, end, room_id, reason)
+        if not blackout:
+            await update.message.reply_text("❌ Не удалось добавить закрытие.", reply_markup=Keyboards.get_admin_menu())
+            return
+        context.user_data.pop('awaiting_blackout', None)
+        text = "✅ Закрытие добавлено:\n" + self._format_blackout(blackout)
+        if blackout['affected_bookings']:
+            text += (
+                f"\n⚠️ Пересекается с бронированиями: {blackout['affected_bookings']}. "
+                "Они не удалены — свяжитесь с их авторами через «Контакты пользователей»."
+            )
+        await update.message.reply_text(text, reply_markup=Keyboards.get_admin_menu())
+
+    async def admin_delete_blackout(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        if await self.db.is_user_admin(update.effective_user.id):
+            blackout_id, = self._callback_args(context, query.data, 'admin_blackout_del_', 'i')
+            await self.db.delete_blackout(blackout_id)
+        return await self.admin_show_blackouts(update, context)
+
+    # --- Рассылка ---
+    async def admin_broadcast_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        if not await self.db.is_user_admin(update.effective_user.id):
+            return None
+        context.user_data['awaiting_broadcast'] = True
+        await query.edit_message_text(
+            "📣 Рассылка\n\nОтправьте текст сообщения — он уйдет всем пользователям бота.",
+            reply_markup=Keyboards.get_back_to_admin_keyboard()
+        )
+        return ADMIN_MAIN
+
+    async def handle_broadcast_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Запустить рассылку текста в фоне и сообщить администратору итог."""
+        context.user_data.pop('awaiting_broadcast', None)
+        if not await self.db.is_user_admin(update.effective_user.id):
+            return
+        text = update.message.text
+        await update.message.reply_text("⏳ Рассылка запущена. Сообщу, когда закончу.")
+        context.application.create_task(
+            self._run_broadcast(context, update.effective_chat.id, text), update=update
+        )
+
+    async def _run_broadcast(self, context: ContextTypes.DEFAULT_TYPE, admin_chat_id: int, text: str):
+        try:
+            report = await broadcast(context.bot, self.db, text)
+        except Exception as e:
+            logging.error(f"❌ Ошибка рассылки: {e}")
+            await context.bot.send_message(admin_chat_id, "❌ Рассылка прервана из-за ошибки.")
+            return
+        logging.info(f"📣 Рассылка: {report}")
+        await context.bot.send_message(
+            admin_chat_id,
+            f"✅ Рассылка завершена: доставлено {report['delivered']}, "
+            f"заблокировали бота {report['blocked']}, ошибок {report['failed']}.",
+            reply_markup=Keyboards.get_admin_menu()
+        )
+
     # --- Удаление бронирований ---
     async def admin_delete_booking_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
@@ -733,13 +1084,13 @@ class Handlers:
         now = datetime.now()
         await query.edit_message_text(
             "📅 Удаление бронирования\n\nВыберите дату для просмотра броней:",
-            reply_markup=booking_calendar.create_calendar(year=now.year, month=now.month)
+            reply_markup=await self._calendar_markup(context, now.year, now.month)
         )
         return ADMIN_SELECT_DELETE_DATE
     
     async def admin_show_bookings_to_delete(self, update: Update, context: ContextTypes.DEFAULT_TYPE, selected_date):
         query = update.callback_query
-        bookings = self.db.get_bookings_for_date(selected_date)
+        bookings = await self.db.get_day_schedule(selected_date)
         context.user_data['admin_delete_date'] = selected_date
 
         if not bookings:
@@ -752,11 +1103,30 @@ class Handlers:
         await query.edit_message_text(text, reply_markup=keyboard)
         return ADMIN_MAIN
 
+    @classmethod
+    def _delete_booking_args(cls, context: ContextTypes.DEFAULT_TYPE, data: str):
+        """ID брони из 'admin_confirm_delete_<id>' или ключ вхождения из
+        'admin_confirm_delete_r<правило>_<минуты>'; None — данные некорректны"""
+        args = cls._callback_args(context, data, 'admin_confirm_delete_', 'i')
+        if len(args) == 1:
+            return args[0]
+        args = args or parse_callback(data, 'admin_confirm_delete_r', 'ii') or []
+        if len(args) == 2:
+            return f"r{args[0]}_{args[1]}"
+        return None
+
     async def admin_confirm_delete_booking(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
-        booking_id = int(query.data.split("_")[-1])
-        
-        success = self.db.delete_booking(booking_id)
+        if not await self.db.is_user_admin(update.effective_user.id):
+            await query.answer("⛔ Доступ запрещен")
+            return None
+        booking_id = self._delete_booking_args(context, query.data)
+        if booking_id is None:
+            await query.answer("❌ Некорректный запрос")
+            return None
+        await query.answer()
+
+        success = await self.db.delete_booking(booking_id)
         if success:
             text = "✅ Бронирование успешно удалено."
         else:
@@ -770,6 +1140,36 @@ class Handlers:
             await query.edit_message_text(text, reply_markup=Keyboards.get_back_to_admin_keyboard())
             return ADMIN_MAIN
 
+    # --- Удаление аудиторий ---
+    async def admin_delete_room(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        if not await self.db.is_user_admin(update.effective_user.id):
+            return None
+        room_id, = self._callback_args(context, query.data, 'admin_delete_room_', 'i')
+        room = await self.db.get_room_by_id(room_id)
+        if not room:
+            await query.edit_message_text("❌ Аудитория не найдена.", reply_markup=Keyboards.get_back_to_admin_keyboard())
+            return ADMIN_MAIN
+        await query.edit_message_text(
+            f"🗑 Удалить аудиторию {room['name']}?",
+            reply_markup=Keyboards.get_room_delete_confirm_keyboard(room_id)
+        )
+        return ADMIN_MAIN
+
+    async def admin_confirm_delete_room(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        if not await self.db.is_user_admin(update.effective_user.id):
+            return None
+        room_id, = self._callback_args(context, query.data, 'admin_confirm_delete_room_', 'i')
+        if await self.db.delete_room(room_id):
+            text = "✅ Аудитория удалена."
+        else:
+            text = "❌ Не удалось удалить аудиторию."
+        await query.edit_message_text(text, reply_markup=Keyboards.get_back_to_admin_keyboard())
+        return ADMIN_MAIN
+
     # --- Редактирование аудиторий ---
     async def admin_edit_room_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
@@ -784,19 +1184,18 @@ class Handlers:
     
     async def admin_edit_select_floor(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
-        floor = int(query.data.split("_")[-1])
-        rooms = self.db.get_rooms_by_floor(floor)
+        floor, page = self._floor_args(context, query.data, 'admin_edit_floor_')
         await query.edit_message_text(
             f"Этаж {floor}. Выберите аудиторию для редактирования:",
-            reply_markup=Keyboards.get_edit_room_select_keyboard(rooms)
+            reply_markup=Keyboards.get_edit_room_select_keyboard(floor, page) or Keyboards.get_back_to_admin_keyboard()
         )
         return ADMIN_EDIT_SELECT_ROOM
     
     async def admin_edit_select_room(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
-        room_id = int(query.data.split("_")[-1])
+        room_id, = self._callback_args(context, query.data, 'admin_edit_room_', 'i')
         context.user_data['admin_edit_room_id'] = room_id
-        room = self.db.get_room_by_id(room_id)
+        room = await self.db.get_room_by_id(room_id)
         
         text = f"Выбрана аудитория: *{room['name']}*\. Что вы хотите изменить?"
         await query.edit_message_text(
@@ -808,7 +1207,7 @@ class Handlers:
     
     async def admin_edit_select_field(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
-        field = query.data.split("_")[-1]
+        field, = self._callback_args(context, query.data, 'admin_edit_field_', 'w')
         context.user_data['admin_edit_field'] = field
         
         await query.edit_message_text(f"Введите новое значение для '{field}':")
@@ -822,7 +1221,7 @@ class Handlers:
         room_id = context.user_data['admin_edit_room_id']
         field = context.user_data['admin_edit_field']
 
-        success = self.db.update_room_field(room_id, field, new_value)
+        success = await self.db.update_room_field(room_id, field, new_value)
         if success:
             text = "✅ Данные аудитории успешно обновлены."
         else:
@@ -854,6 +1253,10 @@ class Handlers:
     async def show_help_and_cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await self.show_help(update, context)
         return ConversationHandler.END
+
+    async def start_free_search_and_cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        await self.start_free_search(update, context)
+        return ConversationHandler.END
         
     async def show_admin_panel_and_cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Прервать бронирование и показать админ-панель."""
@@ -1,49 +1,254 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
-from typing import List, Dict
-from database_sqlite import DatabaseManager
+from typing import Callable, List, Dict, Optional, Tuple
 from datetime import datetime
+import config
+
+
+# Меню этажей и аудиторий, которые строятся из справочника аудиторий:
+# префикс callback этажа, префикс callback аудитории (None — только этажи),
+# кнопки под списком этажей и кнопка возврата под списком аудиторий
+CATALOG_MENUS = {
+    'view': {
+        'floor': 'floor_',
+        'room': 'room_',
+        'floors_footer': [("🔍 Поиск по оборудованию", "search_rooms"), ("🔙 Назад", "back_to_main")],
+        'rooms_footer': ("🔙 Назад к этажам", "back_to_floors"),
+    },
+    'book': {
+        'floor': 'book_floor_',
+        'room': 'book_room_',
+        'floors_footer': [("🔙 Назад", "back_to_main")],
+        'rooms_footer': ("🔙 Назад к этажам", "back_to_booking_floors"),
+    },
+    'admin_add': {
+        'floor': 'admin_add_floor_',
+        'room': None,
+        'floors_footer': [("⬅️ Назад", "back_to_admin")],
+        'rooms_footer': None,
+    },
+    'admin_edit': {
+        'floor': 'admin_edit_floor_',
+        'room': 'admin_edit_room_',
+        'floors_footer': [("⬅️ Назад", "back_to_admin")],
+        'rooms_footer': ("⬅️ Назад", "back_to_admin"),
+    },
+}
+
+
+def _inline(rows: List[List[Tuple[str, str]]]) -> InlineKeyboardMarkup:
+    """Inline-клавиатура из строк вида [(текст, callback_data), ...]"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text, callback_data=data) for text, data in row] for row in rows
+    ])
+
+
+class KeyboardRegistry:
+    """Готовые клавиатуры, построенные заранее.
+
+    Статические меню регистрируются один раз при импорте модуля. Меню этажей
+    и аудиторий строятся из справочника аудиторий (RoomCatalog) и
+    перестраиваются целиком, только когда меняется версия справочника;
+    аудитории этажа разбиваются на страницы по page_size кнопок.
+    Разметка PTB неизменяема, поэтому один объект отдается всем
+    пользователям, а получение клавиатуры сводится к поиску в словаре.
+    """
+
+    def __init__(self, page_size: int = config.KEYBOARD_PAGE_SIZE):
+        self.page_size = max(1, page_size)
+        self._static = {}
+        self._catalog = None
+        self._catalog_version = None
+        self._menus = {}
+        self.builds = 0
+
+    def register(self, name: str, markup):
+        """Зарегистрировать готовую статическую клавиатуру"""
+        self._static[name] = markup
+
+    def get(self, name: str):
+        """Статическая клавиатура по имени"""
+        return self._static[name]
+
+    def bind(self, catalog):
+        """Подключить справочник аудиторий, из которого строятся меню"""
+        self._catalog = catalog
+        self._catalog_version = None
+        self._menus = {}
+
+    def _catalog_menus(self) -> Dict:
+        if self._catalog is None:
+            return self._menus
+        version = self._catalog.current_version()
+        if version != self._catalog_version:
+            self._menus = self._build_catalog_menus(self._catalog.floors(), self._catalog.all())
+            self._catalog_version = version
+            self.builds += 1
+        return self._menus
+
+    def _build_catalog_menus(self, floors: List[int], rooms: List[Dict]) -> Dict:
+        by_floor = {}
+        for room in rooms:
+            by_floor.setdefault(room['floor'], []).append(room)
+
+        menus = {}
+        for kind, spec in CATALOG_MENUS.items():
+            menus[(kind, 'floors')] = _inline(
+                [[(f"{floor} этаж", f"{spec['floor']}{floor}")] for floor in floors]
+                + [[button] for button in spec['floors_footer']]
+            )
+            if not spec['room']:
+                continue
+            for floor, floor_rooms in by_floor.items():
+                pages = [
+                    floor_rooms[start:start + self.page_size]
+                    for start in range(0, len(floor_rooms), self.page_size)
+                ]
+                for page, page_rooms in enumerate(pages):
+                    rows = [
+                        [(room.get('name') or f"Аудитория {room['id']}", f"{spec['room']}{room['id']}")]
+                        for room in page_rooms
+                    ]
+                    nav = []
+                    if page > 0:
+                        nav.append(("⬅️", f"{spec['floor']}{floor}_{page - 1}"))
+                    if len(pages) > 1:
+                        nav.append((f"{page + 1}/{len(pages)}", "noop"))
+                    if page < len(pages) - 1:
+                        nav.append(("➡️", f"{spec['floor']}{floor}_{page + 1}"))
+                    if nav:
+                        rows.append(nav)
+                    rows.append([spec['rooms_footer']])
+                    menus[(kind, 'rooms', floor, page)] = _inline(rows)
+
+        for room in rooms:
+            menus[('room_details', room['id'])] = _inline([
+                [("📅 Забронировать аудиторию", f"book_room_details_{room['id']}")],
+                [("⬅️ Назад к списку аудиторий", f"floor_{room['floor']}")],
+            ])
+        return menus
+
+    def floors(self, kind: str) -> InlineKeyboardMarkup:
+        """Меню этажей для раздела ('view', 'book', 'admin_add', 'admin_edit')"""
+        menu = self._catalog_menus().get((kind, 'floors'))
+        if menu is None:
+            spec = CATALOG_MENUS[kind]
+            menu = _inline([[button] for button in spec['floors_footer']])
+        return menu
+
+    def rooms(self, kind: str, floor: int, page: int = 0) -> Optional[InlineKeyboardMarkup]:
+        """Страница аудиторий этажа или None, если на этаже (странице) нет аудиторий"""
+        return self._catalog_menus().get((kind, 'rooms', floor, page))
+
+    def room_details(self, room_id: int) -> Optional[InlineKeyboardMarkup]:
+        """Клавиатура карточки аудитории"""
+        return self._catalog_menus().get(('room_details', room_id))
+
+
+# Общий реестр клавиатур процесса; Handlers подключает к нему справочник аудиторий
+registry = KeyboardRegistry()
+
+registry.register('main_menu', ReplyKeyboardMarkup([
+    ['🗂 Аудитории', '📅 Забронировать', '🔎 Найти свободную'],
+    ['📅 Мои брони', '📋 Активные брони'],
+    ['🛠 Админ-панель', 'ℹ️ Помощь']
+], resize_keyboard=True, one_time_keyboard=False))
+registry.register('booking_confirmation', _inline([
+    [("✅ Подтвердить", "confirm_booking")],
+    [("✏️ Переписать", "rewrite_booking")],
+    [("❌ Отклонить", "cancel_booking")],
+]))
+registry.register('recurrence', _inline([
+    [("🟢 Единоразово", "recurrence_none")],
+    [("🔁 Раз в неделю", "recurrence_weekly")],
+    [("🔁 Раз в 2 недели", "recurrence_biweekly")],
+    [("🗓 Раз в месяц (то же число)", "recurrence_monthly")],
+    [("🗓 Раз в месяц (тот же день недели)", "recurrence_monthly_weekday")],
+    [("🔙 Назад", "rewrite_booking")],
+]))
+registry.register('admin_menu', _inline([
+    [("✏️ Редактировать аудитории", 'admin_edit_rooms')],
+    [("👥 Контакты пользователей", 'admin_user_contacts')],
+    [("📅 Удалить бронирование", 'admin_booking_delete_menu')],
+    [("📚 Все бронирования", 'admin_all_bookings')],
+    [("🧑‍💼 Пользователи", 'admin_all_users')],
+    [("⛔ Закрытия и праздники", 'admin_blackouts')],
+    [("📣 Рассылка всем пользователям", 'admin_broadcast')],
+    [("🚪 Выйти из админ-панели", 'exit_admin')],
+]))
+registry.register('edit_field', _inline([
+    [("Название", "admin_edit_field_name")],
+    [("Описание", "admin_edit_field_description")],
+    [("Вместимость", "admin_edit_field_capacity")],
+    [("Оборудование", "admin_edit_field_equipment")],
+    [("⬅️ Назад", "back_to_admin")],
+]))
+registry.register('back_to_admin', _inline([[("🔙 Назад в админ-панель", "back_to_admin")]]))
+registry.register('cancel', _inline([[("🔙 Отмена", "cancel")]]))
+registry.register('rooms_management', _inline([
+    [("📋 Список аудиторий", "admin_list_rooms")],
+    [("➕ Добавить аудиторию", "admin_add_room")],
+    [("🔙 Назад в админ-панель", "back_to_admin")],
+]))
+registry.register('active_bookings', _inline([
+    [("🔄 Обновить", "active_bookings")],
+    [("🔙 Назад в главное меню", "back_to_main")],
+]))
+registry.register('active_bookings_date', _inline([
+    [("📅 Выбрать другую дату", "active_bookings")],
+    [("🔙 Назад в главное меню", "back_to_main")],
+]))
+registry.register('user_contacts', _inline([
+    [("📅 Выбрать дату", "admin_select_date_contacts")],
+    [("🔙 Назад в админ-панель", "back_to_admin")],
+]))
+registry.register('back_to_calendar', _inline([
+    [("📅 Выбрать другую дату", "back_to_calendar")],
+    [("Главное меню", "back_to_main")],
+]))
+
 
 class Keyboards:
+    @staticmethod
+    def bind_catalog(catalog):
+        """Строить меню этажей и аудиторий из справочника аудиторий"""
+        registry.bind(catalog)
+
     @staticmethod
     def get_main_menu() -> ReplyKeyboardMarkup:
         """Главное меню бота"""
-        keyboard = [
-            ['🗂 Аудитории', '📅 Забронировать'],
-            ['📅 Мои брони', '📋 Активные брони'],
-            ['🛠 Админ-панель', 'ℹ️ Помощь']
-        ]
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+        return registry.get('main_menu')
     
     @staticmethod
     def get_floors_keyboard() -> InlineKeyboardMarkup:
         """Клавиатура выбора этажа"""
-        keyboard = [
-            [InlineKeyboardButton("2 этаж", callback_data="floor_2")],
-            [InlineKeyboardButton("3 этаж", callback_data="floor_3")],
-            [InlineKeyboardButton("4 этаж", callback_data="floor_4")],
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_main")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return registry.floors('view')
+    
+    @staticmethod
+    def get_rooms_keyboard(floor: int, page: int = 0) -> Optional[InlineKeyboardMarkup]:
+        """Клавиатура выбора аудитории на этаже (None — на этаже нет аудиторий)"""
+        return registry.rooms('view', floor, page)
     
     @staticmethod
-    def get_rooms_keyboard(rooms: List[Dict], floor: int) -> InlineKeyboardMarkup:
-        """Клавиатура выбора аудитории на этаже"""
+    def get_room_search_results_keyboard(rooms: List[Dict]) -> InlineKeyboardMarkup:
+        """Клавиатура с результатами поиска аудиторий"""
         keyboard = []
         for room in rooms:
-            room_name = room.get('name', f'Аудитория {room.get("id", "?")}')
-            keyboard.append([InlineKeyboardButton(room_name, callback_data=f"room_{room['id']}")])
-        
+            keyboard.append([InlineKeyboardButton(
+                f"{room['name']} ({room.get('capacity') or '-'} чел.)", callback_data=f"room_{room['id']}"
+            )])
         keyboard.append([InlineKeyboardButton("🔙 Назад к этажам", callback_data="back_to_floors")])
         return InlineKeyboardMarkup(keyboard)
-    
+
     @staticmethod
     def get_room_details_keyboard(room_id: int) -> InlineKeyboardMarkup:
         """Клавиатура для детальной информации об аудитории"""
-        keyboard = [
-            [InlineKeyboardButton("📅 Забронировать аудиторию", callback_data=f"book_room_details_{room_id}")],
-            [InlineKeyboardButton("⬅️ Назад к списку аудиторий", callback_data="back_to_rooms")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        markup = registry.room_details(room_id)
+        if markup is None:
+            markup = _inline([
+                [("📅 Забронировать аудиторию", f"book_room_details_{room_id}")],
+                [("⬅️ Назад к этажам", "back_to_floors")],
+            ])
+        return markup
     
     @staticmethod
     def get_room_booking_details_keyboard(room_id: int) -> InlineKeyboardMarkup:
@@ -57,52 +262,42 @@ class Keyboards:
     @staticmethod
     def get_booking_confirmation_keyboard() -> InlineKeyboardMarkup:
         """Клавиатура подтверждения бронирования"""
-        keyboard = [
-            [InlineKeyboardButton("✅ Подтвердить", callback_data="confirm_booking")],
-            [InlineKeyboardButton("✏️ Переписать", callback_data="rewrite_booking")],
-            [InlineKeyboardButton("❌ Отклонить", callback_data="cancel_booking")]
-        ]
+        return registry.get('booking_confirmation')
+
+    @staticmethod
+    def get_free_slots_keyboard(results: List[Dict], duration: int) -> InlineKeyboardMarkup:
+        """Клавиатура с найденными свободными аудиториями (ближайшее время начала)"""
+        keyboard = []
+        for item in results[:20]:
+            start = item['first_start']
+            keyboard.append([InlineKeyboardButton(
+                f"{item['room']['name']} — {start.strftime('%H:%M')}",
+                callback_data=f"free_slot_{item['room']['id']}_{start.strftime('%Y%m%d')}_{start.strftime('%H%M')}_{duration}"
+            )])
+        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_main")])
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
     def get_recurrence_keyboard() -> InlineKeyboardMarkup:
         """Клавиатура выбора повторения бронирования"""
-        keyboard = [
-            [InlineKeyboardButton("🟢 Единоразово", callback_data="recurrence_none")],
-            [InlineKeyboardButton("🔁 Раз в неделю", callback_data="recurrence_weekly")],
-            [InlineKeyboardButton("🔁 Раз в 2 недели", callback_data="recurrence_biweekly")],
-            [InlineKeyboardButton("🗓 Раз в месяц", callback_data="recurrence_monthly")],
-            [InlineKeyboardButton("🔙 Назад", callback_data="rewrite_booking")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return registry.get('recurrence')
     
     @staticmethod
     def get_admin_menu():
         """Возвращает клавиатуру для админ-панели."""
-        keyboard = [
-            [InlineKeyboardButton("✏️ Редактировать аудитории", callback_data='admin_edit_rooms')],
-            [InlineKeyboardButton("👥 Контакты пользователей", callback_data='admin_user_contacts')],
-            [InlineKeyboardButton("📅 Удалить бронирование", callback_data='admin_booking_delete_menu')],
-            [InlineKeyboardButton("🚪 Выйти из админ-панели", callback_data='exit_admin')]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return registry.get('admin_menu')
 
     @staticmethod
     def get_add_room_keyboard():
         """Возвращает клавиатуру для выбора этажа при добавлении аудитории."""
-        floors = DatabaseManager().get_floors()
-        keyboard = []
-        for floor in floors:
-            keyboard.append([InlineKeyboardButton(f"{floor} этаж", callback_data=f"admin_add_floor_{floor}")])
-        keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_admin")])
-        return InlineKeyboardMarkup(keyboard)
+        return registry.floors('admin_add')
 
     @staticmethod
     def get_delete_booking_keyboard(bookings):
         """Возвращает клавиатуру для выбора брони для удаления."""
         keyboard = []
         for b in bookings:
-            start_time = datetime.fromisoformat(b['start_time']).strftime('%H:%M')
+            start_time = b['start_time'].strftime('%H:%M')
             room_name = b['room_name']
             button_text = f"❌ {room_name} ({start_time}) - {b['full_name']}"
             keyboard.append([InlineKeyboardButton(button_text, callback_data=f"admin_confirm_delete_{b['id']}")])
@@ -112,41 +307,50 @@ class Keyboards:
     @staticmethod
     def get_edit_room_floor_keyboard():
         """Возвращает клавиатуру для выбора этажа для редактирования."""
-        floors = DatabaseManager().get_floors()
-        keyboard = []
-        for floor in floors:
-            keyboard.append([InlineKeyboardButton(f"{floor} этаж", callback_data=f"admin_edit_floor_{floor}")])
-        keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_admin")])
-        return InlineKeyboardMarkup(keyboard)
+        return registry.floors('admin_edit')
 
     @staticmethod
-    def get_edit_room_select_keyboard(rooms):
+    def get_edit_room_select_keyboard(floor: int, page: int = 0):
         """Возвращает клавиатуру для выбора аудитории для редактирования."""
-        keyboard = []
-        for room in rooms:
-            keyboard.append([InlineKeyboardButton(room['name'], callback_data=f"admin_edit_room_{room['id']}")])
-        keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="back_to_admin")])
-        return InlineKeyboardMarkup(keyboard)
+        return registry.rooms('admin_edit', floor, page)
 
     @staticmethod
     def get_edit_field_keyboard(room_id):
         """Возвращает клавиатуру для выбора поля для редактирования."""
-        keyboard = [
-            [InlineKeyboardButton("Название", callback_data=f"admin_edit_field_name")],
-            [InlineKeyboardButton("Описание", callback_data=f"admin_edit_field_description")],
-            [InlineKeyboardButton("Вместимость", callback_data=f"admin_edit_field_capacity")],
-            [InlineKeyboardButton("Оборудование", callback_data=f"admin_edit_field_equipment")],
-            [InlineKeyboardButton("⬅️ Назад", callback_data="back_to_admin")]
-        ]
+        return registry.get('edit_field')
+
+    @staticmethod
+    def get_admin_page_keyboard(prefix: str, prev_cursor, next_cursor) -> InlineKeyboardMarkup:
+        """Клавиатура листания списка в админ-панели (курсор — ключ крайней записи)"""
+        row = []
+        if prev_cursor:
+            row.append(InlineKeyboardButton(
+                "⬅️", callback_data=f"{prefix}_prev_{'_'.join(str(value) for value in prev_cursor)}"
+            ))
+        if next_cursor:
+            row.append(InlineKeyboardButton(
+                "➡️", callback_data=f"{prefix}_next_{'_'.join(str(value) for value in next_cursor)}"
+            ))
+        keyboard = [row] if row else []
+        keyboard.append([InlineKeyboardButton("🔙 Назад в админ-панель", callback_data="back_to_admin")])
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
-    def get_back_to_admin_keyboard():
-        """Возвращает клавиатуру для возврата в главное меню админки."""
-        keyboard = [
-            [InlineKeyboardButton("⬅️ Назад в админ-панель", callback_data='back_to_admin')]
-        ]
+    def get_blackouts_keyboard(blackouts) -> InlineKeyboardMarkup:
+        """Клавиатура закрытий: удаление каждого и добавление нового"""
+        keyboard = []
+        for b in blackouts:
+            place = b.get('room_name') or 'здание'
+            button_text = f"🗑 {b['start_time'].strftime('%d.%m')}–{b['end_time'].strftime('%d.%m')} · {place}"
+            keyboard.append([InlineKeyboardButton(button_text, callback_data=f"admin_blackout_del_{b['id']}")])
+        keyboard.append([InlineKeyboardButton("➕ Добавить закрытие", callback_data="admin_blackout_add")])
+        keyboard.append([InlineKeyboardButton("🔙 Назад в админ-панель", callback_data="back_to_admin")])
         return InlineKeyboardMarkup(keyboard)
+
+    @staticmethod
+    def get_back_to_admin_keyboard() -> InlineKeyboardMarkup:
+        """Клавиатура для возврата в админ-панель"""
+        return registry.get('back_to_admin')
     
     @staticmethod
     def get_booking_management_keyboard(booking_id: int) -> InlineKeyboardMarkup:
@@ -162,20 +366,12 @@ class Keyboards:
     @staticmethod
     def get_cancel_keyboard() -> InlineKeyboardMarkup:
         """Клавиатура отмены"""
-        keyboard = [
-            [InlineKeyboardButton("🔙 Отмена", callback_data="cancel")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return registry.get('cancel')
     
     @staticmethod
     def get_rooms_management_keyboard() -> InlineKeyboardMarkup:
         """Клавиатура управления аудиториями"""
-        keyboard = [
-            [InlineKeyboardButton("📋 Список аудиторий", callback_data="admin_list_rooms")],
-            [InlineKeyboardButton("➕ Добавить аудиторию", callback_data="admin_add_room")],
-            [InlineKeyboardButton("🔙 Назад в админ-панель", callback_data="back_to_admin")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return registry.get('rooms_management')
     
     @staticmethod
     def get_room_management_keyboard(room_id: int) -> InlineKeyboardMarkup:
@@ -190,10 +386,7 @@ class Keyboards:
     @staticmethod
     def get_users_list_keyboard() -> InlineKeyboardMarkup:
         """Клавиатура списка пользователей"""
-        keyboard = [
-            [InlineKeyboardButton("🔙 Назад в админ-панель", callback_data="back_to_admin")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return registry.get('back_to_admin')
     
     @staticmethod
     def get_user_details_keyboard(user_id: int) -> InlineKeyboardMarkup:
@@ -213,68 +406,6 @@ class Keyboards:
         ]
         return InlineKeyboardMarkup(keyboard)
     
-    @staticmethod
-    def get_active_bookings_keyboard() -> InlineKeyboardMarkup:
-        """Клавиатура для активных бронирований"""
-        keyboard = [
-            [InlineKeyboardButton("🔄 Обновить", callback_data="active_bookings")],
-            [InlineKeyboardButton("🔙 Назад в главное меню", callback_data="back_to_main")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
-    
-    @staticmethod
-    def get_active_bookings_date_keyboard() -> InlineKeyboardMarkup:
-        """Клавиатура для активных бронирований на конкретную дату"""
-        keyboard = [
-            [InlineKeyboardButton("📅 Выбрать другую дату", callback_data="active_bookings")],
-            [InlineKeyboardButton("🔙 Назад в главное меню", callback_data="back_to_main")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
-    
-    @staticmethod
-    def get_booking_floors_keyboard() -> InlineKeyboardMarkup:
-        """Клавиатура выбора этажа для бронирования"""
-        keyboard = [
-            [InlineKeyboardButton("2 этаж", callback_data="book_floor_2")],
-            [InlineKeyboardButton("3 этаж", callback_data="book_floor_3")],
-            [InlineKeyboardButton("4 этаж", callback_data="book_floor_4")],
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_main")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
-    
-    @staticmethod
-    def get_booking_rooms_keyboard(rooms: List[Dict], floor: int) -> InlineKeyboardMarkup:
-        """Клавиатура выбора аудитории для бронирования"""
-        keyboard = []
-        for room in rooms:
-            room_name = room.get('name', f'Аудитория {room.get("id", "?")}')
-            keyboard.append([InlineKeyboardButton(room_name, callback_data=f"book_room_{room['id']}")])
-        
-        keyboard.append([InlineKeyboardButton("🔙 Назад к этажам", callback_data="back_to_floors")])
-        return InlineKeyboardMarkup(keyboard)
-    
-    @staticmethod
-    def get_edit_rooms_keyboard() -> InlineKeyboardMarkup:
-        """Клавиатура для редактирования аудиторий"""
-        keyboard = [
-            [InlineKeyboardButton("2️⃣ Второй этаж", callback_data="admin_edit_floor_2")],
-            [InlineKeyboardButton("3️⃣ Третий этаж", callback_data="admin_edit_floor_3")],
-            [InlineKeyboardButton("4️⃣ Четвертый этаж", callback_data="admin_edit_floor_4")],
-            [InlineKeyboardButton("🔙 Назад в админ-панель", callback_data="back_to_admin")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
-    
-    @staticmethod
-    def get_delete_rooms_keyboard() -> InlineKeyboardMarkup:
-        """Клавиатура для удаления аудиторий"""
-        keyboard = [
-            [InlineKeyboardButton("2️⃣ Второй этаж", callback_data="admin_delete_floor_2")],
-            [InlineKeyboardButton("3️⃣ Третий этаж", callback_data="admin_delete_floor_3")],
-            [InlineKeyboardButton("4️⃣ Четвертый этаж", callback_data="admin_delete_floor_4")],
-            [InlineKeyboardButton("🔙 Назад в админ-панель", callback_data="back_to_admin")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
-    
     @staticmethod
     def get_room_edit_keyboard(room_id: int) -> InlineKeyboardMarkup:
         """Клавиатура для редактирования конкретной аудитории"""
@@ -289,67 +420,40 @@ class Keyboards:
         return InlineKeyboardMarkup(keyboard)
     
     @staticmethod
-    def get_room_delete_confirm_keyboard(room_id: int) -> InlineKeyboardMarkup:
-        """Клавиатура подтверждения удаления аудитории"""
-        keyboard = [
-            [InlineKeyboardButton("✅ Да, удалить", callback_data=f"admin_confirm_delete_room_{room_id}")],
-            [InlineKeyboardButton("❌ Отмена", callback_data="admin_delete_room")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
-    
-    @staticmethod
-    def get_user_contacts_keyboard() -> InlineKeyboardMarkup:
-        """Клавиатура для просмотра контактов пользователей"""
-        keyboard = [
-            [InlineKeyboardButton("📅 Выбрать дату", callback_data="admin_select_date_contacts")],
-            [InlineKeyboardButton("🔙 Назад в админ-панель", callback_data="back_to_admin")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+    def get_active_bookings_keyboard() -> InlineKeyboardMarkup:
+        """Клавиатура для активных бронирований"""
+        return registry.get('active_bookings')
     
     @staticmethod
-    def get_back_to_admin_keyboard() -> InlineKeyboardMarkup:
-        """Клавиатура для возврата в админ-панель"""
-        keyboard = [
-            [InlineKeyboardButton("🔙 Назад в админ-панель", callback_data="back_to_admin")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+    def get_active_bookings_date_keyboard() -> InlineKeyboardMarkup:
+        """Клавиатура для активных бронирований на конкретную дату"""
+        return registry.get('active_bookings_date')
     
     @staticmethod
     def get_booking_floors_keyboard() -> InlineKeyboardMarkup:
         """Клавиатура выбора этажа для бронирования"""
-        keyboard = [
-            [InlineKeyboardButton("2 этаж", callback_data="book_floor_2")],
-            [InlineKeyboardButton("3 этаж", callback_data="book_floor_3")],
-            [InlineKeyboardButton("4 этаж", callback_data="book_floor_4")],
-            [InlineKeyboardButton("🔙 Назад", callback_data="back_to_main")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return registry.floors('book')
     
     @staticmethod
-    def get_booking_rooms_keyboard(rooms: List[Dict], floor: int) -> InlineKeyboardMarkup:
-        """Клавиатура выбора аудитории для бронирования"""
-        keyboard = []
-        for room in rooms:
-            room_name = room.get('name', f'Аудитория {room.get("id", "?")}')
-            keyboard.append([InlineKeyboardButton(room_name, callback_data=f"book_room_{room['id']}")])
-        
-        keyboard.append([InlineKeyboardButton("🔙 Назад к этажам", callback_data="back_to_booking_floors")])
-        return InlineKeyboardMarkup(keyboard)
+    def get_booking_rooms_keyboard(floor: int, page: int = 0) -> Optional[InlineKeyboardMarkup]:
+        """Клавиатура выбора аудитории для бронирования (None — на этаже нет аудиторий)"""
+        return registry.rooms('book', floor, page)
     
     @staticmethod
-    def get_room_booking_details_keyboard(room_id: int) -> InlineKeyboardMarkup:
-        """Клавиатура для детальной информации об аудитории при бронировании"""
+    def get_room_delete_confirm_keyboard(room_id: int) -> InlineKeyboardMarkup:
+        """Клавиатура подтверждения удаления аудитории"""
         keyboard = [
-            [InlineKeyboardButton("✅ Подтвердить бронирование", callback_data=f"book_room_{room_id}")],
-            [InlineKeyboardButton("🔙 Назад к аудиториям", callback_data="back_to_booking_rooms")]
+            [InlineKeyboardButton("✅ Да, удалить", callback_data=f"admin_confirm_delete_room_{room_id}")],
+            [InlineKeyboardButton("❌ Отмена", callback_data="admin_delete_room")]
         ]
         return InlineKeyboardMarkup(keyboard)
+    
+    @staticmethod
+    def get_user_contacts_keyboard() -> InlineKeyboardMarkup:
+        """Клавиатура для просмотра контактов пользователей"""
+        return registry.get('user_contacts')
 
     @staticmethod
     def get_back_to_calendar_keyboard() -> InlineKeyboardMarkup:
         """Клавиатура для возврата к календарю выбора даты."""
-        keyboard = [
-            [InlineKeyboardButton("📅 Выбрать другую дату", callback_data="back_to_calendar")],
-            [InlineKeyboardButton("Главное меню", callback_data="back_to_main")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
\ No newline at end of file
+        return registry.get('back_to_calendar')
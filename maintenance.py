@@ -0,0 +1,78 @@
+"""
+Плановое обслуживание базы данных: архивирование старых броней,
+обновление статистики и освобождение места
+"""
+
+import asyncio
+import logging
+import time as timer
+from datetime import datetime, time, timedelta
+from typing import Dict
+
+from telegram.ext import ContextTypes, JobQueue
+
+import config
+from database_sqlite import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceJob:
+    """Ежедневная задача обслуживания БД для JobQueue приложения.
+
+    Переносит бронирования старше ARCHIVE_RETENTION_DAYS в bookings_archive,
+    затем выполняет ANALYZE/PRAGMA optimize и incremental vacuum.
+    Работа идет в отдельном потоке, чтобы не блокировать цикл событий.
+    """
+
+    def __init__(self, db: DatabaseManager,
+                 retention_days: int = config.ARCHIVE_RETENTION_DAYS,
+                 batch_size: int = config.MAINTENANCE_BATCH_SIZE,
+                 vacuum_pages: int = config.MAINTENANCE_VACUUM_PAGES):
+        self.db = db
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.last_report = None
+
+    def run(self) -> Dict:
+        """Выполнить обслуживание и вернуть отчет"""
+        report = {}
+        started = timer.perf_counter()
+
+        step = timer.perf_counter()
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        report['archived'] = self.db.archive_bookings(cutoff, self.batch_size)
+        report['archive_seconds'] = timer.perf_counter() - step
+
+        step = timer.perf_counter()
+        self.db.optimize_database()
+        report['optimize_seconds'] = timer.perf_counter() - step
+
+        step = timer.perf_counter()
+        report['freed_pages'] = self.db.incremental_vacuum(self.vacuum_pages)
+        report['vacuum_seconds'] = timer.perf_counter() - step
+
+        report['total_seconds'] = timer.perf_counter() - started
+        self.last_report = report
+        return report
+
+    async def callback(self, context: ContextTypes.DEFAULT_TYPE):
+        """Колбэк JobQueue: обслуживание в пуле потоков и отчет в лог"""
+        try:
+            report = await asyncio.get_running_loop().run_in_executor(None, self.run)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обслуживания БД: {e}")
+            return
+        logger.info(
+            f"🧹 Обслуживание БД: в архив перенесено {report['archived']} броней "
+            f"за {report['archive_seconds']:.2f} с, ANALYZE/optimize {report['optimize_seconds']:.2f} с, "
+            f"освобождено страниц {report['freed_pages']} за {report['vacuum_seconds']:.2f} с, "
+            f"всего {report['total_seconds']:.2f} с"
+        )
+
+    def schedule(self, job_queue: JobQueue, at: str = config.MAINTENANCE_TIME):
+        """Запускать обслуживание ежедневно в указанное местное время (ЧЧ:ММ)"""
+        local_tz = datetime.now().astimezone().tzinfo
+        run_at = time.fromisoformat(at).replace(tzinfo=local_tz)
+        return job_queue.run_daily(self.callback, time=run_at, name='db_maintenance')
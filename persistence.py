@@ -0,0 +1,134 @@
+"""
+Сохранение состояния диалогов бота (user_data, chat_data, ConversationHandler) в SQLite
+"""
+
+import asyncio
+import json
+import logging
+import pickle
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import config
+from database_sqlite import AsyncDatabaseManager, DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Хранилище состояния бота построчно в той же базе SQLite.
+
+    Каждый пользователь, чат и диалог — отдельная строка, поэтому запись
+    не переписывает все состояние целиком, как PicklePersistence.
+
+    Запись отложенная: Application раз в update_interval секунд передает
+    измененные данные, они попадают в набор «грязных» записей (повторные
+    изменения одного ключа схлопываются) и фиксируются одной транзакцией.
+    Данные пользователя/чата читаются лениво, при первом обновлении от него
+    после запуска; состояния диалогов загружаются целиком при старте.
+    bot_data и callback_data бот не использует и не сохраняет.
+    """
+
+    def __init__(self, db: DatabaseManager, update_interval: float = config.PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, callback_data=False),
+            update_interval=update_interval
+        )
+        # Отдельный поток: запись состояния не конкурирует с запросами обработчиков
+        self.db = AsyncDatabaseManager(db, max_workers=1)
+        self._loaded = {'user': set(), 'chat': set()}
+        self._dirty_data: Dict[Tuple[str, int], Optional[bytes]] = {}
+        self._dirty_states: Dict[Tuple[str, str], Optional[bytes]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    @staticmethod
+    def _dump(value) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _mark_dirty(self, dirty: Dict, key, value):
+        dirty[key] = value
+        # Все update_* одного прохода Application выполняются до запуска задачи,
+        # поэтому они попадают в одну транзакцию
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def _refresh(self, kind: str, item_id: int, data: Dict):
+        if item_id in self._loaded[kind]:
+            return
+        blob = await self.db.load_bot_state(kind, item_id)
+        self._loaded[kind].add(item_id)
+        # Несохраненные изменения новее строки в БД
+        if blob is not None and (kind, item_id) not in self._dirty_data:
+            for key, value in pickle.loads(blob).items():
+                data.setdefault(key, value)
+
+    # --- Загрузка ---
+    async def get_user_data(self) -> Dict[int, Dict]:
+        # Данные пользователей подгружаются в refresh_user_data
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        states = await self.db.load_conversation_states(name)
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in states.items()}
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict):
+        await self._refresh('user', user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict):
+        await self._refresh('chat', chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data: Dict):
+        pass
+
+    # --- Изменения ---
+    async def update_user_data(self, user_id: int, data: Dict):
+        self._loaded['user'].add(user_id)
+        self._mark_dirty(self._dirty_data, ('user', user_id), self._dump(data))
+
+    async def update_chat_data(self, chat_id: int, data: Dict):
+        self._loaded['chat'].add(chat_id)
+        self._mark_dirty(self._dirty_data, ('chat', chat_id), self._dump(data))
+
+    async def drop_user_data(self, user_id: int):
+        self._mark_dirty(self._dirty_data, ('user', user_id), None)
+
+    async def drop_chat_data(self, chat_id: int):
+        self._mark_dirty(self._dirty_data, ('chat', chat_id), None)
+
+    async def update_conversation(self, name: str, key: Tuple[int, ...], new_state: Optional[object]):
+        state = None if new_state is None else self._dump(new_state)
+        self._mark_dirty(self._dirty_states, (name, json.dumps(key)), state)
+
+    async def update_bot_data(self, data: Dict):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def flush(self):
+        """Записать накопленные изменения одной транзакцией"""
+        async with self._flush_lock:
+            if not self._dirty_data and not self._dirty_states:
+                return
+            data, self._dirty_data = self._dirty_data, {}
+            states, self._dirty_states = self._dirty_states, {}
+            if await self.db.save_bot_state(data, states):
+                logger.debug(f"💾 Сохранено состояние: записей {len(data)}, диалогов {len(states)}")
+                return
+            # Не удалось — вернем изменения в очередь, не затирая более новые
+            for key, value in data.items():
+                self._dirty_data.setdefault(key, value)
+            for key, value in states.items():
+                self._dirty_states.setdefault(key, value)
+            logger.error("❌ Состояние диалогов не сохранено, повтор при следующей записи")
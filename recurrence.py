@@ -0,0 +1,249 @@
+"""
+Правила повторяющихся бронирований и их ленивое развертывание
+"""
+
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# weekly/biweekly — каждые 7/14 дней,
+# monthly — то же число месяца (месяцы без этого числа пропускаются),
+# monthly_weekday — тот же по счету день недели месяца (например, 2-й вторник)
+FREQUENCIES = ('weekly', 'biweekly', 'monthly', 'monthly_weekday')
+
+# За 400 лет григорианский календарь повторяется целиком, вместе с днями недели,
+# поэтому у двух бессрочных правил вхождения совпадают либо в этом цикле, либо никогда
+CALENDAR_CYCLE_DAYS = 146097
+
+
+class RecurrenceRule:
+    """Повторяющееся бронирование, хранимое одной строкой.
+
+    Вхождения не материализуются: они вычисляются по первому вхождению,
+    частоте и ограничениям until (дата последнего допустимого вхождения)
+    и count (число вхождений). Даты в exceptions пропускаются.
+    """
+
+    def __init__(self, rule_id: Optional[int], room_id: int, user_id: int, first: datetime,
+                 duration: int, freq: str, until: Optional[date] = None, count: Optional[int] = None,
+                 exceptions: Iterable[date] = (), full_name: str = '', purpose: str = ''):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Неизвестная частота повторения: {freq}")
+        self.id = rule_id
+        self.room_id = room_id
+        self.user_id = user_id
+        self.first = first
+        self.duration = duration
+        self.freq = freq
+        self.until = until
+        self.count = count
+        self.exceptions = set(exceptions)
+        self.full_name = full_name
+        self.purpose = purpose
+
+    def _month_candidate(self, year: int, month: int) -> Optional[date]:
+        """Дата вхождения в месяце или None, если в месяце нет такого дня"""
+        days_in_month = calendar.monthrange(year, month)[1]
+        first_day = self.first.date()
+        if self.freq == 'monthly':
+            day = first_day.day
+        else:
+            # тот же по счету день недели: 1-й, 2-й, ... 5-й
+            nth = (first_day.day - 1) // 7
+            day = 1 + (first_day.weekday() - date(year, month, 1).weekday()) % 7 + nth * 7
+        return date(year, month, day) if day <= days_in_month else None
+
+    def _raw_dates(self, since: date) -> Iterator[Tuple[int, date]]:
+        """(порядковый номер, дата) вхождений не раньше since без учета исключений"""
+        first_day = self.first.date()
+        if self.freq in ('weekly', 'biweekly'):
+            step = 7 if self.freq == 'weekly' else 14
+            # сразу переходим к первому вхождению окна
+            index = max(0, -(-(since - first_day).days // step))
+            while True:
+                yield index, first_day + timedelta(days=index * step)
+                index += 1
+        else:
+            # номер нужен для count, поэтому месяцы считаем от первого вхождения
+            index = 0
+            month_index = first_day.year * 12 + first_day.month - 1
+            while True:
+                candidate = self._month_candidate(month_index // 12, month_index % 12 + 1)
+                if candidate:
+                    if candidate >= since:
+                        yield index, candidate
+                    index += 1
+                month_index += 1
+
+    def dates_between(self, first: date, last: date) -> List[date]:
+        """Даты вхождений в интервале [first, last]"""
+        first = max(first, self.first.date())
+        if self.until:
+            last = min(last, self.until)
+        dates = []
+        if first > last:
+            return dates
+        for index, day in self._raw_dates(first):
+            if day > last or (self.count is not None and index >= self.count):
+                break
+            if day not in self.exceptions:
+                dates.append(day)
+        return dates
+
+    def iter_dates(self, since: date) -> Iterator[date]:
+        """Даты вхождений не раньше since по возрастанию (у бессрочного правила — без конца)"""
+        for index, day in self._raw_dates(max(since, self.first.date())):
+            if (self.until and day > self.until) or (self.count is not None and index >= self.count):
+                return
+            if day not in self.exceptions:
+                yield day
+
+    def last_date(self) -> Optional[date]:
+        """Дата, после которой вхождений нет, или None у бессрочного правила"""
+        last = self.until
+        if self.count is not None:
+            for index, day in self._raw_dates(self.first.date()):
+                if index >= self.count - 1:
+                    last = min(last, day) if last else day
+                    break
+        return last
+
+    def collisions(self, other: 'RecurrenceRule', since: date, last: date,
+                   limit: Optional[int] = None) -> List[date]:
+        """Даты в интервале [since, last], когда вхождения двух правил пересекаются по времени"""
+        # Время и длительность вхождений постоянны: хватает проверить один день
+        start, end = self.occurrence(since)
+        other_start, other_end = other.occurrence(since)
+        if not (start < other_end and other_start < end):
+            return []
+        result = []
+        mine, theirs = self.iter_dates(since), other.iter_dates(since)
+        day, other_day = next(mine, None), next(theirs, None)
+        while day and other_day and day <= last and other_day <= last:
+            if day == other_day:
+                result.append(day)
+                if limit and len(result) >= limit:
+                    break
+                day, other_day = next(mine, None), next(theirs, None)
+            elif day < other_day:
+                day = next(mine, None)
+            else:
+                other_day = next(theirs, None)
+        return result
+
+    def occurs_on(self, day: date) -> bool:
+        """Есть ли вхождение в указанный день"""
+        return bool(self.dates_between(day, day))
+
+    def occurrence(self, day: date) -> Tuple[datetime, datetime]:
+        """Начало и конец вхождения в указанный день"""
+        start = datetime.combine(day, self.first.time())
+        return start, start + timedelta(minutes=self.duration)
+
+
+class RecurrenceBook:
+    """Активные правила повторения в памяти с кэшем вхождений по дням.
+
+    Правила загружаются одним запросом при первом обращении. Вхождения
+    разворачиваются только для запрошенного дня и кэшируются (не более
+    cache_days дней); любое изменение правил сбрасывает кэш.
+    DatabaseManager обновляет справочник после фиксации транзакций.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[RecurrenceRule]], cache_days: int = 256):
+        self._loader = loader
+        self.cache_days = cache_days
+        self._lock = threading.RLock()
+        self._rules = None
+        self._days = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _ensure_loaded(self) -> Dict[int, RecurrenceRule]:
+        # Загружаем под блокировкой, чтобы не потерять add(), пришедший во время чтения
+        with self._lock:
+            if self._rules is None:
+                self._rules = {rule.id: rule for rule in self._loader() or []}
+            return self._rules
+
+    def reload(self):
+        """Сбросить правила: они будут перечитаны при следующем обращении"""
+        with self._lock:
+            self._rules = None
+            self._days.clear()
+
+    def add(self, rule: RecurrenceRule):
+        """Учесть новое правило"""
+        with self._lock:
+            if self._rules is not None:
+                self._rules[rule.id] = rule
+            self._days.clear()
+
+    def remove(self, rule_id: int):
+        """Убрать правило (серия отменена)"""
+        with self._lock:
+            if self._rules is not None:
+                self._rules.pop(rule_id, None)
+            self._days.clear()
+
+    def add_exception(self, rule_id: int, day: date):
+        """Исключить одно вхождение правила"""
+        with self._lock:
+            rule = self._rules.get(rule_id) if self._rules is not None else None
+            if rule:
+                rule.exceptions.add(day)
+            self._days.clear()
+
+    def get(self, rule_id: int) -> Optional[RecurrenceRule]:
+        """Правило по ID"""
+        return self._ensure_loaded().get(rule_id)
+
+    def rules(self, user_id: Optional[int] = None) -> List[RecurrenceRule]:
+        """Активные правила (при необходимости — одного пользователя)"""
+        with self._lock:
+            return [
+                rule for rule in self._ensure_loaded().values()
+                if user_id is None or rule.user_id == user_id
+            ]
+
+    def day(self, day: date) -> List[Tuple[RecurrenceRule, datetime, datetime]]:
+        """Вхождения всех правил за день, по времени начала"""
+        with self._lock:
+            occurrences = self._days.get(day)
+            if occurrences is not None:
+                self._days.move_to_end(day)
+                self.hits += 1
+                return occurrences
+            self.misses += 1
+            occurrences = sorted(
+                ((rule, *rule.occurrence(day)) for rule in self._ensure_loaded().values() if rule.occurs_on(day)),
+                key=lambda item: (item[1], item[0].room_id)
+            )
+            self._days[day] = occurrences
+            while len(self._days) > self.cache_days:
+                self._days.popitem(last=False)
+            return occurrences
+
+    def conflicts(self, room_id: int, start: datetime,
+                  end: datetime) -> List[Tuple[RecurrenceRule, datetime, datetime]]:
+        """Вхождения в аудитории, пересекающиеся с [start, end)"""
+        result = []
+        day = start.date()
+        while datetime.combine(day, time.min) < end:
+            result.extend(
+                item for item in self.day(day)
+                if item[0].room_id == room_id and item[1] < end and item[2] > start
+            )
+            day += timedelta(days=1)
+        return result
+
+    def stats(self) -> Dict:
+        """Счетчики попаданий/промахов кэша вхождений"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'days': len(self._days),
+            'rules': len(self._rules) if self._rules is not None else 0,
+        }
@@ -0,0 +1,188 @@
+"""
+Напоминания пользователям о предстоящих бронированиях
+"""
+
+import asyncio
+import heapq
+import logging
+import time as timer
+from typing import Dict, List, Optional, Tuple
+
+from telegram.error import Forbidden, TelegramError
+from telegram.ext import ExtBot
+
+import config
+from database_sqlite import AsyncDatabaseManager, DatabaseManager
+from delivery import PRIORITY_NOTIFY
+
+logger = logging.getLogger(__name__)
+
+
+def _now_minutes() -> int:
+    return int(timer.time()) // 60
+
+
+class ReminderScheduler:
+    """Напоминания за lead_minutes до начала брони одной задачей.
+
+    В памяти только ближайшее окно: min-куча (минута напоминания, ID, бронь)
+    для броней, чьи напоминания приходятся на следующие window_minutes,
+    не больше batch_size записей. Окно читается запросом по индексу
+    idx_bookings_start; когда оно исчерпано, читается следующее. Задача
+    спит до ближайшего напоминания или до конца окна, поэтому память
+    и число пробуждений не зависят от общего числа будущих броней,
+    а JobQueue не получает задачу на каждую бронь.
+
+    Изменения броней приходят через DatabaseManager.booking_listeners:
+    изменение внутри загруженного окна перечитывает окно, за его
+    пределами ничего не меняет (бронь попадет в одно из следующих окон).
+    """
+
+    def __init__(self, bot: ExtBot, db: DatabaseManager,
+                 lead_minutes: int = config.REMINDER_MINUTES,
+                 window_minutes: int = config.REMINDER_WINDOW_MINUTES,
+                 batch_size: int = config.REMINDER_BATCH_SIZE):
+        self.bot = bot
+        # Отдельный поток: чтение окна не занимает потоки обработчиков
+        self.db = AsyncDatabaseManager(db, max_workers=1)
+        self.lead_minutes = lead_minutes
+        self.window_minutes = max(window_minutes, 1)
+        self.batch_size = max(batch_size, 1)
+        self._heap: List[Tuple[int, str, Dict]] = []
+        # Напоминания раньше _cursor уже обработаны; куча покрывает [_cursor, _horizon)
+        self._cursor = 0
+        self._horizon = 0
+        self._reload = True
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sending = set()
+        self.sent = 0
+        self.failed = 0
+        self.loads = 0
+        self.wakeups = 0
+
+    async def start(self):
+        """Запустить планировщик (при REMINDER_MINUTES = 0 напоминания отключены)"""
+        if self._task is not None or self.lead_minutes <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._cursor = _now_minutes()
+        self._reload = True
+        self.db.sync.booking_listeners.append(self._on_bookings_changed)
+        self._task = self._loop.create_task(self._run())
+        logger.info(f"⏰ Напоминания о бронях за {self.lead_minutes} мин. включены")
+
+    async def stop(self):
+        """Остановить планировщик и неотправленные напоминания"""
+        if self._task is None:
+            return
+        self.db.sync.booking_listeners.remove(self._on_bookings_changed)
+        for task in (self._task, *self._sending):
+            task.cancel()
+        await asyncio.gather(self._task, *self._sending, return_exceptions=True)
+        self._task = None
+        self._heap.clear()
+        self.db.shutdown()
+
+    def stats(self) -> Dict:
+        """Размер кучи, границы окна и счетчики"""
+        return {
+            'queued': len(self._heap),
+            'cursor': self._cursor,
+            'horizon': self._horizon,
+            'sent': self.sent,
+            'failed': self.failed,
+            'loads': self.loads,
+            'wakeups': self.wakeups,
+        }
+
+    # --- Изменения броней ---
+    def _on_bookings_changed(self, start_min: Optional[int]):
+        # Вызывается после коммита в потоке, который выполнял запись
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._changed, start_min)
+
+    def _changed(self, start_min: Optional[int]):
+        if start_min is None or start_min - self.lead_minutes < self._horizon:
+            self._reload = True
+            self._wakeup.set()
+
+    # --- Окно ---
+    async def _load(self):
+        """Перечитать кучу: напоминания с _cursor на window_minutes вперед"""
+        # Сбрасываем флаг до чтения: изменение во время запроса вызовет новое чтение
+        self._reload = False
+        from_min = self._cursor + self.lead_minutes
+        to_min = from_min + self.window_minutes
+        limit = self.batch_size
+        while True:
+            bookings = await self.db.get_upcoming_bookings(from_min, to_min, limit)
+            if len(bookings) < limit:
+                horizon = to_min
+                break
+            # Окно не поместилось: берем брони до начала последней, остальное — следующим окном
+            last = bookings[-1]['start_min']
+            if bookings[0]['start_min'] < last:
+                bookings = [booking for booking in bookings if booking['start_min'] < last]
+                horizon = last
+                break
+            # Все прочитанные брони начинаются в одну минуту — читаем ее целиком
+            limit *= 2
+        self._heap = [(booking['start_min'] - self.lead_minutes, str(booking['id']), booking) for booking in bookings]
+        heapq.heapify(self._heap)
+        self._horizon = horizon - self.lead_minutes
+        self.loads += 1
+
+    async def _run(self):
+        while True:
+            try:
+                now_min = _now_minutes()
+                if self._reload or (not self._heap and now_min >= self._horizon):
+                    await self._load()
+                while self._heap and self._heap[0][0] <= now_min:
+                    self._send(heapq.heappop(self._heap)[2], now_min)
+                # Не дальше границы окна: пропущенное из-за задержки цикла попадет в следующее окно
+                self._cursor = max(self._cursor, min(now_min + 1, self._horizon))
+                if self._reload:
+                    continue
+                wake_min = self._heap[0][0] if self._heap else self._horizon
+                delay = max(0.0, wake_min * 60 - timer.time())
+            except Exception as e:
+                logger.error(f"❌ Ошибка планировщика напоминаний: {e}")
+                delay = 60.0
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeups += 1
+
+    # --- Отправка ---
+    def _send(self, booking: Dict, now_min: int):
+        minutes = booking['start_min'] - now_min
+        if minutes <= 0:
+            # Бронь уже началась (бот был остановлен) — напоминать поздно
+            return
+        task = self._loop.create_task(self._deliver(booking, minutes))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _deliver(self, booking: Dict, minutes: int):
+        text = (
+            f"⏰ Напоминание: через {minutes} мин. начинается ваша бронь\n\n"
+            f"🏢 Аудитория: {booking['room_name']}\n"
+            f"🎯 Цель: {booking['purpose']}\n"
+            f"📅 Дата: {booking['start_time'].strftime('%d.%m.%Y')}\n"
+            f"🕐 Время: {booking['start_time'].strftime('%H:%M')} - {booking['end_time'].strftime('%H:%M')}"
+        )
+        try:
+            await self.bot.send_message(booking['user_id'], text, rate_limit_args=PRIORITY_NOTIFY)
+            self.sent += 1
+        except Forbidden:
+            # Пользователь заблокировал бота
+            self.failed += 1
+        except TelegramError as e:
+            self.failed += 1
+            logger.warning(f"⚠️ Напоминание о брони {booking['id']} не отправлено: {e}")
@@ -0,0 +1,143 @@
+"""
+Маршрутизация обновлений по точному тексту кнопок меню и префиксу callback_data
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from telegram import MessageEntity, Update
+from telegram.ext import BaseHandler
+
+# Типы аргументов в сигнатуре маршрута: i — целое, w — слово без '_',
+# s — строка до конца данных (только последним, может содержать '_');
+# аргументы после '?' необязательны
+_ARG_TYPES = {'i': int, 'w': str, 's': str}
+_ROUTE = object()  # ключ узла префиксного дерева, под которым лежит маршрут
+
+
+def _parse_args(rest: str, required: str, optional: str) -> Optional[List]:
+    codes = required + optional
+    if not codes:
+        return [] if not rest else None
+    if not rest:
+        return [] if not required else None
+    # Строковый аргумент забирает весь остаток вместе с '_'
+    parts = rest.split('_', len(codes) - 1) if codes[-1] == 's' else rest.split('_')
+    if not len(required) <= len(parts) <= len(codes):
+        return None
+    try:
+        return [_ARG_TYPES[code](part) for code, part in zip(codes, parts)]
+    except ValueError:
+        return None
+
+
+def parse_callback(data: str, prefix: str, signature: str = '') -> Optional[List]:
+    """Аргументы callback_data одного маршрута (None — данные не подходят)"""
+    if not data.startswith(prefix):
+        return None
+    required, _, optional = signature.partition('?')
+    return _parse_args(data[len(prefix):], required, optional)
+
+
+class CallbackCodec:
+    """Разбор callback_data вида <префикс><арг>_<арг>... за один проход.
+
+    Префиксы хранятся в префиксном дереве (trie): поиск маршрута — проход
+    по символам callback_data, без перебора регулярных выражений. Из всех
+    подошедших префиксов выбирается самый длинный, чей остаток разбирается
+    по сигнатуре маршрута.
+    """
+
+    def __init__(self):
+        self._trie = {}
+
+    def register(self, prefix: str, value, signature: str = ''):
+        """Зарегистрировать маршрут.
+
+        signature — типы аргументов после префикса, например 'i' или 'i?i'
+        (этаж и необязательная страница). Пустая сигнатура — точное совпадение.
+        """
+        required, _, optional = signature.partition('?')
+        if any(code not in _ARG_TYPES for code in required + optional) or 's' in (required + optional)[:-1]:
+            raise ValueError(f"Неверная сигнатура маршрута {prefix!r}: {signature!r}")
+        node = self._trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[_ROUTE] = (value, prefix, required, optional)
+
+    def decode(self, data: str) -> Optional[Tuple[object, str, List]]:
+        """(значение маршрута, префикс, аргументы) или None, если маршрута нет"""
+        candidates = []
+        node = self._trie
+        if _ROUTE in node:
+            candidates.append((0, node[_ROUTE]))
+        for position, char in enumerate(data, 1):
+            node = node.get(char)
+            if node is None:
+                break
+            if _ROUTE in node:
+                candidates.append((position, node[_ROUTE]))
+        for position, (value, prefix, required, optional) in reversed(candidates):
+            args = _parse_args(data[position:], required, optional)
+            if args is not None:
+                return value, prefix, args
+        return None
+
+
+class Router(BaseHandler):
+    """Один обработчик вместо цепочки MessageHandler/CallbackQueryHandler.
+
+    Тексты кнопок главного меню ищутся в словаре, callback_data — через
+    CallbackCodec. Найденный обработчик сохраняется в context.route_callback,
+    разобранные аргументы callback передаются ему в context.args.
+    Обновления без маршрута уходят в text_fallback (текст, не команда)
+    и callback_fallback (остальные callback-запросы).
+    """
+
+    __slots__ = ('texts', 'codec', 'text_fallback', 'callback_fallback')
+
+    def __init__(self, text_fallback: Optional[Callable] = None,
+                 callback_fallback: Optional[Callable] = None):
+        super().__init__(self._dispatch)
+        self.texts: Dict[str, Callable] = {}
+        self.codec = CallbackCodec()
+        self.text_fallback = text_fallback
+        self.callback_fallback = callback_fallback
+
+    def on_text(self, text: str, callback: Callable):
+        """Маршрут для точного текста сообщения (кнопки меню)"""
+        self.texts[text] = callback
+
+    def on_callback(self, prefix: str, callback: Callable, signature: str = ''):
+        """Маршрут для callback_data с префиксом prefix и аргументами по signature"""
+        self.codec.register(prefix, callback, signature)
+
+    def check_update(self, update: object):
+        if not isinstance(update, Update):
+            return None
+        query = update.callback_query
+        if query is not None:
+            if not isinstance(query.data, str):
+                return None
+            match = self.codec.decode(query.data)
+            if match:
+                return match[0], match[2]
+            return (self.callback_fallback, []) if self.callback_fallback else None
+
+        message = update.effective_message
+        if message is None or message.text is None:
+            return None
+        callback = self.texts.get(message.text)
+        if callback:
+            return callback, []
+        # Команды обрабатывают CommandHandler'ы
+        if message.entities and message.entities[0].type == MessageEntity.BOT_COMMAND \
+                and message.entities[0].offset == 0:
+            return None
+        return (self.text_fallback, []) if self.text_fallback else None
+
+    def collect_additional_context(self, context, update, application, check_result):
+        context.route_callback, context.args = check_result
+
+    async def _dispatch(self, update, context):
+        """Вызвать обработчик маршрута, найденный в check_update"""
+        return await context.route_callback(update, context)
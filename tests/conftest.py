@@ -0,0 +1,91 @@
+"""
+Общие фикстуры тестов: временная база SQLite и поддельные Bot/Update
+"""
+
+import os
+
+# config.py требует токен при импорте; тесты не обращаются к Telegram
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:TEST')
+
+import itertools
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from telegram import Update
+
+from database_sqlite import DatabaseManager
+
+_update_ids = itertools.count(1)
+
+
+class FakeBot:
+    """Бот без сети: запоминает вызовы методов Bot API (имя, аргументы)"""
+
+    defaults = None
+
+    def __init__(self):
+        self.calls = []
+        self.id = 1
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return True
+
+        return call
+
+
+def make_message_update(bot: FakeBot, user_id: int, text: str, first_name: str = 'Тест') -> Update:
+    """Текстовое сообщение пользователя в личном чате"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': first_name}
+    return Update.de_json({
+        'update_id': next(_update_ids),
+        'message': {
+            'message_id': next(_update_ids),
+            'date': int(datetime.now().timestamp()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': user,
+            'text': text,
+        },
+    }, bot)
+
+
+def make_callback_update(bot: FakeBot, user_id: int, data: str) -> Update:
+    """Нажатие inline-кнопки с callback_data"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': 'Тест'}
+    return Update.de_json({
+        'update_id': next(_update_ids),
+        'callback_query': {
+            'id': str(next(_update_ids)),
+            'from': user,
+            'chat_instance': '1',
+            'data': data,
+            'message': {
+                'message_id': next(_update_ids),
+                'date': int(datetime.now().timestamp()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'text': 'меню',
+            },
+        },
+    }, bot)
+
+
+def make_context(bot: FakeBot, args=None) -> SimpleNamespace:
+    """Минимальный CallbackContext для вызова обработчика напрямую"""
+    return SimpleNamespace(bot=bot, args=args, user_data={}, chat_data={})
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(str(tmp_path / 'test.db'))
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def bot():
+    return FakeBot()
@@ -0,0 +1,43 @@
+"""
+Запросы к БД не блокируют цикл событий (AsyncDatabaseManager)
+"""
+
+import asyncio
+import time
+
+from handlers import Handlers
+from tests.conftest import make_context, make_message_update
+
+
+def test_slow_query_does_not_block_event_loop(db, bot, monkeypatch):
+    get_or_create_user = db.get_or_create_user
+
+    def slow_get_or_create_user(user):
+        time.sleep(0.5)
+        return get_or_create_user(user)
+
+    monkeypatch.setattr(db, 'get_or_create_user', slow_get_or_create_user)
+    handlers = Handlers(db)
+
+    async def scenario():
+        handler = asyncio.create_task(
+            handlers.start(make_message_update(bot, 1001, '/start'), make_context(bot))
+        )
+        # Пока обработчик ждет БД, цикл событий продолжает будить другие задачи
+        max_lag = 0.0
+        while not handler.done():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.perf_counter() - started - 0.01)
+        await handler
+        return max_lag
+
+    assert asyncio.run(scenario()) < 0.1
+    assert [name for name, _, _ in bot.calls] == ['send_message']
+    assert db.get_user_by_id(1001)['first_name'] == 'Тест'
+
+
+def test_async_facade_returns_sync_results(db):
+    async_db = Handlers(db).db
+    assert asyncio.run(async_db.get_all_rooms()) == db.get_all_rooms()
+    assert async_db.sync is db
@@ -0,0 +1,35 @@
+"""
+book_slot: проверка пересечений и вставка атомарны при параллельных вызовах
+"""
+
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+THREADS = 200
+START = datetime(2030, 5, 20, 12, 0)
+
+
+def test_parallel_book_slot_creates_one_booking(db):
+    room_id = db.get_all_rooms()[0]['id']
+    barrier = threading.Barrier(THREADS)
+    results = [None] * THREADS
+
+    def book(number: int):
+        user = SimpleNamespace(id=5000 + number, username=None, first_name='Имя', last_name=str(number))
+        barrier.wait()
+        # Сдвинутые интервалы тоже пересекаются с любым другим
+        start = START + timedelta(minutes=number % 30)
+        results[number] = db.book_slot(user, room_id, 'ФИО', 'цель', start, start + timedelta(hours=1))
+
+    threads = [threading.Thread(target=book, args=(number,)) for number in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    statuses = [result['status'] for result in results]
+    assert statuses.count('created') == 1
+    assert statuses.count('conflict') == THREADS - 1
+    with db._pool.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM bookings WHERE room_id = ?", (room_id,)).fetchone()[0] == 1
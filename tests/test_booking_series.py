@@ -0,0 +1,57 @@
+"""
+Серия повторяющихся бронирований создается одной транзакцией
+"""
+
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+USER = SimpleNamespace(id=4001, username='series', first_name='Имя', last_name='Фамилия')
+FIRST = datetime(2030, 3, 4, 10, 0)
+
+
+def weekly(weeks: int):
+    return [(FIRST + timedelta(weeks=n), FIRST + timedelta(weeks=n, hours=1)) for n in range(weeks)]
+
+
+@pytest.fixture
+def room_id(db):
+    return db.get_all_rooms()[0]['id']
+
+
+def count_rows(db, table: str) -> int:
+    with db._pool.reader() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_series_skips_busy_dates(db, room_id):
+    busy = FIRST + timedelta(weeks=2)
+    assert db.create_booking(USER, room_id, 'ФИО', 'разовая', busy, busy + timedelta(hours=1))
+
+    result = db.create_booking_series(USER, room_id, 'ФИО', 'серия', weekly(5), 'weekly',
+                                      recurrence_until=weekly(5)[-1][1])
+
+    assert result['skipped'] == [busy.date()]
+    assert len(result['created']) == 4
+    rule = db.recurrences.get(result['rule_id'])
+    assert rule.last_date() == date(2030, 4, 1)
+    assert not rule.occurs_on(busy.date())
+
+
+def test_series_is_created_atomically(db, room_id):
+    busy = FIRST + timedelta(weeks=1)
+    assert db.create_booking(USER, room_id, 'ФИО', 'разовая', busy, busy + timedelta(hours=1))
+    # Запись исключения (занятой даты) падает уже после вставки правила
+    with db._pool.writer() as conn:
+        conn.execute('''
+            CREATE TRIGGER fail_exceptions BEFORE INSERT ON booking_rule_exceptions
+            BEGIN SELECT RAISE(ABORT, 'fail'); END
+        ''')
+
+    result = db.create_booking_series(USER, room_id, 'ФИО', 'серия', weekly(4), 'weekly')
+
+    assert result['rule_id'] is None and result['created'] == []
+    assert count_rows(db, 'booking_rules') == 0
+    assert db.recurrences.rules() == []
+    assert db.check_room_availability(room_id, FIRST, FIRST + timedelta(hours=1))
@@ -0,0 +1,65 @@
+"""
+Кэш клавиатур календаря: повторное использование и сброс при изменениях
+"""
+
+import re
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from calendar_widget import TelegramCalendar
+
+YEAR, MONTH = 2030, 3
+USER = SimpleNamespace(id=6001, username='calendar', first_name='Имя', last_name='Фамилия')
+
+
+def day_button(markup, day: int):
+    """Кнопка дня месяца (текст — иконка и число)"""
+    for row in markup.inline_keyboard:
+        for button in row:
+            match = re.fullmatch(r'\D*(\d+)', button.text)
+            if match and int(match.group(1)) == day:
+                return button
+    raise AssertionError(f"Нет кнопки для дня {day}")
+
+
+def test_same_month_is_served_from_cache():
+    calendar = TelegramCalendar()
+    first = calendar.create_calendar(YEAR, MONTH)
+    assert calendar.create_calendar(YEAR, MONTH) is first
+    assert calendar.cache_stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+def test_cache_follows_occupancy_marks(db):
+    calendar = TelegramCalendar()
+    room_id = db.get_all_rooms()[0]['id']
+    empty = calendar.create_calendar(YEAR, MONTH, day_marks=db.get_month_occupancy(YEAR, MONTH, room_id))
+    assert day_button(empty, 14).text == '14'
+
+    start = datetime(YEAR, MONTH, 14, 10)
+    booking = db.create_booking(USER, room_id, 'ФИО', 'цель', start, start + timedelta(hours=1))
+    busy = calendar.create_calendar(YEAR, MONTH, day_marks=db.get_month_occupancy(YEAR, MONTH, room_id))
+    assert busy is not empty
+    assert day_button(busy, 14).text == f'{calendar.partial_icon}14'
+
+    assert db.delete_booking(booking['id'])
+    freed = calendar.create_calendar(YEAR, MONTH, day_marks=db.get_month_occupancy(YEAR, MONTH, room_id))
+    assert freed is empty
+
+
+def test_cache_follows_locked_dates():
+    calendar = TelegramCalendar()
+    before = calendar.create_calendar(YEAR, MONTH)
+
+    calendar.set_locked_dates([date(YEAR, MONTH, 20)])
+    locked = calendar.create_calendar(YEAR, MONTH)
+    assert locked is not before
+    button = day_button(locked, 20)
+    assert (button.text, button.callback_data) == (f'{calendar.close_icon}20', 'cal_none')
+
+    # Тот же набор дат не сбрасывает кэш
+    calendar.set_locked_dates([date(YEAR, MONTH, 20)])
+    assert calendar.create_calendar(YEAR, MONTH) is locked
+
+    calendar.set_locked_dates([])
+    unlocked = calendar.create_calendar(YEAR, MONTH)
+    assert day_button(unlocked, 20).callback_data == f'cal_select_{YEAR}_{MONTH}_20'
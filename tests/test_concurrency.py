@@ -0,0 +1,90 @@
+"""
+Параллельная обработка обновлений с сохранением порядка для каждого пользователя
+"""
+
+import asyncio
+import random
+
+from concurrency import KeyedUpdateProcessor
+from tests.conftest import make_callback_update, make_message_update
+
+
+def test_updates_of_one_user_keep_order(bot):
+    processor = KeyedUpdateProcessor(max_workers=8, max_pending=1000, max_pending_per_key=100)
+    handled = {}
+    running = {'now': 0, 'max': 0}
+    rng = random.Random(7)
+
+    async def handle(user_id: int, number: int):
+        running['now'] += 1
+        running['max'] = max(running['max'], running['now'])
+        await asyncio.sleep(rng.random() * 0.005)
+        handled.setdefault(user_id, []).append(number)
+        running['now'] -= 1
+
+    async def scenario():
+        tasks = [
+            asyncio.create_task(processor.process_update(make_message_update(bot, user_id, str(number)),
+                                                         handle(user_id, number)))
+            for number in range(20) for user_id in range(1, 11)
+        ]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert handled == {user_id: list(range(20)) for user_id in range(1, 11)}
+    # Разные пользователи обрабатываются параллельно, но не больше max_workers сразу
+    assert 1 < running['max'] <= 8
+    assert processor.stats()['active_keys'] == 0
+
+
+def test_flooding_user_is_capped(bot):
+    processor = KeyedUpdateProcessor(max_workers=4, max_pending=1000, max_pending_per_key=5)
+    handled = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def handle(user_id: int, number: int):
+            await gate.wait()
+            handled.append((user_id, number))
+
+        tasks = [
+            asyncio.create_task(processor.process_update(make_message_update(bot, 1, str(number)), handle(1, number)))
+            for number in range(50)
+        ]
+        tasks.append(asyncio.create_task(processor.process_update(make_message_update(bot, 2, '0'), handle(2, 0))))
+        await asyncio.sleep(0.05)
+        assert processor.stats()['queued'] == 6
+        gate.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert [number for user_id, number in handled if user_id == 1] == [0, 1, 2, 3, 4]
+    assert (2, 0) in handled
+    assert processor.stats()['dropped'] == 45
+
+
+def test_dropped_updates_are_answered(bot):
+    processor = KeyedUpdateProcessor(max_workers=4, max_pending=1000, max_pending_per_key=1)
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def handle():
+            await gate.wait()
+
+        first = asyncio.create_task(processor.process_update(make_message_update(bot, 1, '0'), handle()))
+        await asyncio.sleep(0)
+        for number in range(3):
+            await processor.process_update(make_message_update(bot, 1, str(number)), handle())
+        for number in range(3):
+            await processor.process_update(make_callback_update(bot, 1, f'book_room_{number}'), handle())
+        gate.set()
+        await first
+
+    asyncio.run(scenario())
+    names = [name for name, _, _ in bot.calls]
+    # Каждое нажатие кнопки получает ответ, на серию сообщений — одно уведомление
+    assert names.count('answer_callback_query') == 3
+    assert names.count('send_message') == 1
+    assert processor.stats()['dropped'] == 6
@@ -0,0 +1,88 @@
+"""
+Экраны расписания на день строятся одним запросом (get_day_schedule)
+"""
+
+import asyncio
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from handlers import Handlers
+from tests.conftest import make_callback_update, make_context
+
+DAY = date(2030, 3, 14)
+RULES = 3
+
+
+@pytest.fixture
+def schedule_db(db):
+    rooms = db.get_all_rooms()[:RULES + 3]
+    for number, room in enumerate(rooms):
+        user = SimpleNamespace(id=2000 + number, username=f'user{number}', first_name='Имя', last_name=str(number))
+        start = datetime.combine(DAY, time(9 + number))
+        if number < 3:
+            assert db.create_booking(user, room['id'], 'ФИО', f'цель {number}', start, start + timedelta(hours=1))
+        else:
+            # Вхождения еженедельных правил, начатых неделей раньше
+            first = start - timedelta(days=7)
+            assert db.create_recurring_booking(user, room['id'], 'ФИО', f'цель {number}', first,
+                                               first + timedelta(hours=1), freq='weekly', count=4)['rule_id']
+    # Справочник правил повторения загружается лениво — прогреваем его заранее
+    assert len(db.get_day_schedule(DAY)) == RULES + 3
+    return db
+
+
+def count_selects(db):
+    """Список SELECT-запросов, выполненных любым подключением пула"""
+    statements = []
+
+    def trace(sql):
+        if sql.lstrip().upper().startswith('SELECT'):
+            statements.append(sql)
+
+    pool = db._pool
+    for conn in [pool._writer, *list(pool._readers.queue)]:
+        conn.set_trace_callback(trace)
+    return statements
+
+
+@pytest.mark.parametrize('screen', [
+    'show_active_bookings_for_date',
+    'admin_show_contacts_for_date',
+    'admin_show_bookings_to_delete',
+])
+def test_day_screen_issues_one_query(schedule_db, bot, screen):
+    handlers = Handlers(schedule_db)
+    statements = count_selects(schedule_db)
+    update = make_callback_update(bot, 2000, 'cal_day')
+
+    asyncio.run(getattr(handlers, screen)(update, make_context(bot), DAY))
+
+    assert len(statements) == 1
+    name, _, kwargs = bot.calls[-1]
+    assert name == 'edit_message_text'
+    text = kwargs['text'] + str(kwargs.get('reply_markup'))
+    for number in range(RULES + 3):
+        assert f'{9 + number:02d}:00' in text
+
+
+def test_occurrence_users_load_in_one_query(schedule_db):
+    for number in range(3, RULES + 3):
+        schedule_db.invalidate_user(2000 + number)
+    statements = count_selects(schedule_db)
+
+    bookings = schedule_db.get_day_schedule(DAY)
+
+    # Запрос броней и один запрос пользователей всех вхождений
+    assert len(statements) == 2
+    assert ' IN (' in statements[1]
+    assert sorted(b['last_name'] for b in bookings) == [str(number) for number in range(RULES + 3)]
+
+    for number in range(3, RULES + 3):
+        schedule_db.invalidate_user(2000 + number)
+    statements.clear()
+    room_id = schedule_db.get_all_rooms()[3]['id']
+    [booking] = schedule_db.get_room_bookings_by_date(room_id, DAY)
+    assert booking['last_name'] == '3'
+    assert len(statements) == 2
@@ -0,0 +1,41 @@
+"""
+Пул подключений SQLite: режим WAL и повторное использование подключений
+"""
+
+from database_sqlite import ConnectionPool, DatabaseManager
+
+
+def test_connections_use_wal(db):
+    pool = db._pool
+    with pool.writer() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    readers = list(pool._readers.queue)
+    assert readers
+    for conn in readers:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+
+def test_readers_are_reused(db, monkeypatch):
+    pool = db._pool
+    readers = set(map(id, pool._readers.queue))
+    opened = []
+    monkeypatch.setattr(pool, '_connect', lambda: opened.append(1))
+
+    for _ in range(100):
+        with pool.reader() as conn:
+            assert id(conn) in readers
+        db.get_all_rooms()
+        db.get_booking_by_id(1)
+
+    assert opened == []
+    assert set(map(id, pool._readers.queue)) == readers
+
+
+def test_managers_share_pool(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    first, second = DatabaseManager(path), DatabaseManager(path)
+    try:
+        assert first._pool is second._pool is ConnectionPool.shared(path)
+    finally:
+        first.close()
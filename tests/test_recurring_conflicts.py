@@ -0,0 +1,71 @@
+"""
+Пересечения повторяющихся бронирований за пределами окна развертывания
+"""
+
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import config
+
+USER = SimpleNamespace(id=3001, username='rules', first_name='Имя', last_name='Фамилия')
+FIRST_MONDAY = datetime(2030, 1, 7, 10, 0)
+
+
+@pytest.fixture
+def room_id(db, monkeypatch):
+    # Короткое окно: вхождения после 06.02.2030 уже не развертываются
+    monkeypatch.setattr(config, 'AVAILABILITY_WINDOW_DAYS', 30)
+    return db.get_all_rooms()[0]['id']
+
+
+def test_open_rule_skips_booking_past_window(db, room_id):
+    busy = datetime(2030, 6, 3, 10, 30)
+    assert db.create_booking(USER, room_id, 'ФИО', 'разовая', busy, busy + timedelta(hours=1))
+
+    result = db.create_recurring_booking(USER, room_id, 'ФИО', 'еженедельная', FIRST_MONDAY,
+                                         FIRST_MONDAY + timedelta(hours=1), freq='weekly')
+
+    assert result['rule_id'] and result['until'] is None
+    assert date(2030, 6, 3) in result['skipped']
+    rule = db.recurrences.get(result['rule_id'])
+    assert not rule.occurs_on(date(2030, 6, 3))
+    assert rule.occurs_on(date(2031, 6, 2))
+
+
+def test_open_rules_colliding_past_window_end_rule(db, room_id):
+    # 1-е число месяца, которое впервые после окна выпадает на понедельник, — 01.04.2030
+    monthly = datetime(2030, 2, 1, 10, 0)
+    first = db.create_recurring_booking(USER, room_id, 'ФИО', 'ежемесячная', monthly,
+                                        monthly + timedelta(hours=1), freq='monthly')
+    assert first['rule_id']
+
+    result = db.create_recurring_booking(USER, room_id, 'ФИО', 'еженедельная', FIRST_MONDAY,
+                                         FIRST_MONDAY + timedelta(hours=1), freq='weekly')
+
+    assert result['until'] == date(2030, 3, 31)
+    assert db.recurrences.get(result['rule_id']).last_date() == date(2030, 3, 31)
+
+
+def test_finite_rule_collisions_past_window_become_exceptions(db, room_id):
+    monthly = datetime(2030, 2, 1, 10, 30)
+    finite = db.create_recurring_booking(USER, room_id, 'ФИО', 'ежемесячная', monthly,
+                                         monthly + timedelta(hours=1), freq='monthly',
+                                         until=date(2030, 12, 31))
+    assert finite['rule_id']
+
+    result = db.create_recurring_booking(USER, room_id, 'ФИО', 'еженедельная', FIRST_MONDAY,
+                                         FIRST_MONDAY + timedelta(hours=1), freq='weekly')
+
+    assert result['until'] is None
+    assert {date(2030, 4, 1), date(2030, 7, 1)} <= set(result['skipped'])
+
+
+def test_create_booking_rejects_rule_occurrence(db, room_id):
+    result = db.create_recurring_booking(USER, room_id, 'ФИО', 'еженедельная', FIRST_MONDAY,
+                                         FIRST_MONDAY + timedelta(hours=1), freq='weekly')
+    assert result['rule_id']
+    # Вхождение далеко за окном развертывания
+    start = datetime.combine(date(2032, 1, 5), time(10, 30))
+    assert db.create_booking(USER, room_id, 'ФИО', 'разовая', start, start + timedelta(hours=1)) == {}
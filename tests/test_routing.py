@@ -0,0 +1,69 @@
+"""
+Маршрутизация callback_data через Router и удаление броней из админки
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from handlers import Handlers
+from routing import Router
+from tests.conftest import make_callback_update, make_context
+
+
+def test_router_dispatches_through_handler_callback(bot):
+    router = Router()
+    calls = []
+
+    async def show_floor(update, context):
+        calls.append(context.args)
+        return 'shown'
+
+    router.on_callback('floor_', show_floor, 'i?i')
+    update = make_callback_update(bot, 1, 'floor_3_2')
+    context = make_context(bot)
+    check_result = router.check_update(update)
+
+    # Стандартный BaseHandler.handle_update вызывает self.callback
+    assert asyncio.run(router.handle_update(update, None, check_result, context)) == 'shown'
+    assert calls == [[3, 2]]
+
+
+def test_room_and_booking_deletion_routes_do_not_overlap():
+    router = Router()
+    router.on_callback('admin_confirm_delete_', 'booking', 'i')
+    router.on_callback('admin_confirm_delete_r', 'occurrence', 'ii')
+    router.on_callback('admin_confirm_delete_room_', 'room', 'i')
+
+    assert router.codec.decode('admin_confirm_delete_15')[::2] == ('booking', [15])
+    assert router.codec.decode('admin_confirm_delete_r12_345')[::2] == ('occurrence', [12, 345])
+    assert router.codec.decode('admin_confirm_delete_room_5')[::2] == ('room', [5])
+    assert router.codec.decode('admin_confirm_delete_room_x') is None
+
+
+def test_only_admin_can_delete_booking(db, bot):
+    user = SimpleNamespace(id=3000, username='u', first_name='Имя', last_name='')
+    start = datetime(2030, 3, 14, 10)
+    booking = db.create_booking(user, db.get_all_rooms()[0]['id'], 'ФИО', 'цель', start, start + timedelta(hours=1))
+    handlers = Handlers(db)
+    data = f"admin_confirm_delete_{booking['id']}"
+
+    asyncio.run(handlers.admin_confirm_delete_booking(make_callback_update(bot, 3000, data), make_context(bot)))
+    assert db.get_booking_by_id(booking['id'])
+    assert bot.calls[-1][0] == 'answer_callback_query'
+
+    db._execute_query("UPDATE users SET is_admin = TRUE WHERE id = ?", (3000,))
+    db.invalidate_user(3000)
+    asyncio.run(handlers.admin_confirm_delete_booking(make_callback_update(bot, 3000, data), make_context(bot)))
+    assert not db.get_booking_by_id(booking['id'])
+
+
+def test_malformed_delete_payload_is_answered(db, bot):
+    db._execute_query("INSERT INTO users (id, first_name, is_admin) VALUES (3001, 'Админ', TRUE)")
+    handlers = Handlers(db)
+    update = make_callback_update(bot, 3001, 'admin_confirm_delete_oops')
+
+    asyncio.run(handlers.admin_confirm_delete_booking(update, make_context(bot)))
+    name, _, kwargs = bot.calls[-1]
+    assert name == 'answer_callback_query'
+    assert 'Некорректный' in kwargs['text']
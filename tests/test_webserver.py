@@ -0,0 +1,112 @@
+"""
+Встроенный HTTP-сервер: вебхук Telegram, /healthz и /readyz
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from tests.conftest import FakeBot
+from webserver import BotServer
+
+SECRET = 'test-secret'
+
+
+async def request(port: int, method: str, path: str, body: bytes = b'', headers=None):
+    """Один HTTP-запрос; (код ответа, JSON тела)"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    head = f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\nConnection: close\r\n"
+    for name, value in (headers or {}).items():
+        head += f"{name}: {value}\r\n"
+    writer.write(head.encode('latin-1') + b"\r\n" + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status_line, _, payload = response.partition(b'\r\n')
+    return int(status_line.split()[1]), json.loads(payload.split(b'\r\n\r\n', 1)[1])
+
+
+def run_with_server(db, scenario):
+    application = SimpleNamespace(update_queue=asyncio.Queue(), bot=FakeBot(), running=True)
+
+    async def main():
+        server = BotServer(application, db, host='127.0.0.1', port=0, webhook_path='/telegram', secret=SECRET)
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        try:
+            return await scenario(server, port, application)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def update_body(update_id: int) -> bytes:
+    return json.dumps({
+        'update_id': update_id,
+        'message': {
+            'message_id': 1, 'date': 0, 'text': '/start',
+            'chat': {'id': 5, 'type': 'private'},
+            'from': {'id': 5, 'is_bot': False, 'first_name': 'Тест'},
+        },
+    }).encode('utf-8')
+
+
+def test_webhook_post_enqueues_update(db):
+    async def scenario(server, port, application):
+        server.webhook_enabled = True
+        status, payload = await request(port, 'POST', '/telegram', update_body(42),
+                                        {'X-Telegram-Bot-Api-Secret-Token': SECRET})
+        assert (status, payload) == (200, {'ok': True})
+        update = application.update_queue.get_nowait()
+        assert update.update_id == 42 and update.message.text == '/start'
+        assert server.updates_received == 1
+
+    run_with_server(db, scenario)
+
+
+@pytest.mark.parametrize('headers, body, expected', [
+    ({}, update_body(1), 403),
+    ({'X-Telegram-Bot-Api-Secret-Token': 'wrong'}, update_body(1), 403),
+    ({'X-Telegram-Bot-Api-Secret-Token': SECRET}, b'not json', 400),
+])
+def test_webhook_rejects_bad_requests(db, headers, body, expected):
+    async def scenario(server, port, application):
+        server.webhook_enabled = True
+        status, _ = await request(port, 'POST', '/telegram', body, headers)
+        assert status == expected
+        assert application.update_queue.empty()
+
+    run_with_server(db, scenario)
+
+
+def test_webhook_path_is_closed_in_polling_mode(db):
+    async def scenario(server, port, application):
+        status, _ = await request(port, 'POST', '/telegram', update_body(1),
+                                  {'X-Telegram-Bot-Api-Secret-Token': SECRET})
+        assert status == 404
+
+    run_with_server(db, scenario)
+
+
+def test_healthz_reports_database_and_loop(db):
+    async def scenario(server, port, application):
+        status, payload = await request(port, 'GET', '/healthz')
+        assert status == 200
+        assert payload['status'] == 'ok' and payload['database'] is True
+
+    run_with_server(db, scenario)
+
+
+def test_readyz_follows_ready_flag(db):
+    async def scenario(server, port, application):
+        status, payload = await request(port, 'GET', '/readyz')
+        assert status == 503 and payload['ready'] is False
+        server.ready = True
+        status, payload = await request(port, 'GET', '/readyz')
+        assert status == 200
+        assert payload == {'ready': True, 'mode': 'polling', 'updates_received': 0}
+
+    run_with_server(db, scenario)
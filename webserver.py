@@ -0,0 +1,189 @@
+"""
+Встроенный HTTP-сервер бота на asyncio: вебхук Telegram, /healthz и /readyz
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+from http import HTTPStatus
+from typing import Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import Application
+
+import config
+from database_sqlite import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024  # обновление Telegram заметно меньше
+KEEP_ALIVE_TIMEOUT = 75  # секунды простоя соединения до закрытия
+DB_CHECK_TIMEOUT = 2  # секунды на проверку БД в /healthz
+
+
+class BotServer:
+    """HTTP-сервер в том же цикле событий, что и Application.
+
+    POST на webhook_path принимает обновления Telegram (с проверкой
+    секретного заголовка) и кладет их в application.update_queue.
+    /healthz проверяет доступность БД и задержку цикла событий,
+    /readyz — что бот запущен и получает обновления (ready выставляет
+    вызывающий код после включения вебхука или polling).
+    """
+
+    def __init__(self, application: Application, db: DatabaseManager,
+                 host: str = config.HTTP_HOST, port: int = config.HTTP_PORT,
+                 webhook_path: str = config.WEBHOOK_PATH, secret: str = config.WEBHOOK_SECRET,
+                 max_loop_lag: float = config.HEALTH_MAX_LOOP_LAG):
+        self.application = application
+        self.db = db
+        self.host = host
+        self.port = port
+        self.webhook_path = webhook_path
+        self.secret = secret
+        self.max_loop_lag = max_loop_lag
+        self.webhook_enabled = False
+        self.ready = False
+        self.loop_lag = 0.0
+        self.updates_received = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Начать принимать соединения"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self._lag_task = asyncio.create_task(self._monitor_loop_lag())
+        logger.info(f"🌐 HTTP-сервер слушает {self.host}:{self.port}")
+
+    async def stop(self):
+        """Закрыть сервер и открытые соединения"""
+        self.ready = False
+        if self._lag_task:
+            self._lag_task.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _monitor_loop_lag(self, interval: float = 0.5):
+        # Насколько позже запланированного просыпается таймер — столько ждут обновления
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag = max(0.0, loop.time() - started - interval)
+
+    # --- HTTP ---
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                if isinstance(request, HTTPStatus):
+                    await self._respond(writer, request, {'error': request.phrase}, keep_alive=False)
+                    break
+                method, path, headers, body = request
+                status, payload = await self._dispatch(method, path, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except Exception as e:
+            logger.error(f"❌ Ошибка HTTP-соединения: {e}")
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        """(метод, путь, заголовки, тело); None — соединение закрыто, HTTPStatus — ошибка запроса"""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            return HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
+        request_line, *header_lines = head.decode('latin-1').split('\r\n')
+        parts = request_line.split(' ')
+        if len(parts) != 3:
+            return HTTPStatus.BAD_REQUEST
+        method, target, _ = parts
+        headers = {}
+        for line in header_lines:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST
+        if length > MAX_BODY_SIZE:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        body = await reader.readexactly(length) if length else b''
+        return method, target.split('?', 1)[0], headers, body
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, payload: Dict, keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    async def _dispatch(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[HTTPStatus, Dict]:
+        if path == '/healthz' and method == 'GET':
+            return await self._healthz()
+        if path == '/readyz' and method == 'GET':
+            return self._readyz()
+        if path == self.webhook_path and self.webhook_enabled:
+            if method != 'POST':
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'POST only'}
+            return await self._webhook(headers, body)
+        return HTTPStatus.NOT_FOUND, {'error': 'not found'}
+
+    # --- Обработчики ---
+    async def _webhook(self, headers: Dict[str, str], body: bytes) -> Tuple[HTTPStatus, Dict]:
+        if self.secret and not hmac.compare_digest(
+            headers.get('x-telegram-bot-api-secret-token', '').encode('latin-1'), self.secret.encode('utf-8')
+        ):
+            return HTTPStatus.FORBIDDEN, {'error': 'bad secret token'}
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"⚠️ Некорректное обновление в вебхуке: {e}")
+            return HTTPStatus.BAD_REQUEST, {'error': 'bad update'}
+        if update is None:
+            return HTTPStatus.BAD_REQUEST, {'error': 'empty update'}
+        # Отвечаем сразу: обработка идет в Application, Telegram не ждет ее окончания
+        await self.application.update_queue.put(update)
+        self.updates_received += 1
+        return HTTPStatus.OK, {'ok': True}
+
+    async def _healthz(self) -> Tuple[HTTPStatus, Dict]:
+        loop = asyncio.get_running_loop()
+        try:
+            database = await asyncio.wait_for(loop.run_in_executor(None, self.db.ping), DB_CHECK_TIMEOUT)
+        except asyncio.TimeoutError:
+            database = False
+        healthy = database and self.loop_lag <= self.max_loop_lag
+        return (HTTPStatus.OK if healthy else HTTPStatus.SERVICE_UNAVAILABLE), {
+            'status': 'ok' if healthy else 'fail',
+            'database': database,
+            'loop_lag_ms': round(self.loop_lag * 1000, 1),
+        }
+
+    def _readyz(self) -> Tuple[HTTPStatus, Dict]:
+        ready = self.ready and self.application.running
+        return (HTTPStatus.OK if ready else HTTPStatus.SERVICE_UNAVAILABLE), {
+            'ready': ready,
+            'mode': 'webhook' if self.webhook_enabled else 'polling',
+            'updates_received': self.updates_received,
+        }